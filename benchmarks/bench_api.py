@@ -0,0 +1,106 @@
+"""
+End-to-end latency and throughput of every public function of lines, stops, offices and others against a local
+stand-in server serving CRTM payloads with a configurable latency.
+
+Usage: python -m benchmarks.bench_api [calls per function] [concurrency] [server latency in ms] [recorded dir]
+
+Recorded bodies are read from a directory where each file is named after its endpoint, i.e. GetStopsTimes.php.json.
+get_ttp_card_info and get_ttp_card_info_many use the SOAP card service, which the stand-in server doesn't serve.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sys
+import time
+
+from benchmarks.payloads import Payloads
+from benchmarks.stand_in_server import StandInServer
+from citram_api.api.lines import lines
+from citram_api.api.offices import offices
+from citram_api.api.others import others
+from citram_api.api.stops import stops
+from citram_api.constants.hosts import Urls
+from citram_api.utils.transport import Transport, get_transport, set_transport
+
+
+CALLS = [
+    ('lines.get_lines_by_mode', lambda: lines.get_lines_by_mode(8)),
+    ('lines.get_lines_by_municipality', lambda: lines.get_lines_by_municipality(4350, 8)),
+    ('lines.iter_lines_by_mode', lambda: list(lines.iter_lines_by_mode(8))),
+    ('lines.iter_lines_by_municipality', lambda: list(lines.iter_lines_by_municipality(4350, 8))),
+    ('lines.get_lines_by_line_code', lambda: lines.get_lines_by_line_code('8__591___')),
+    ('lines.get_line_info', lambda: lines.get_line_info('8__591___')),
+    ('lines.iter_line_stops', lambda: list(lines.iter_line_stops('8__591___'))),
+    ('lines.get_lines_timeplanning', lambda: lines.get_lines_timeplanning('8__591___')),
+    ('lines.get_line_location', lambda: lines.get_line_location(8, '8__591____1__IT_1', '8__591___', '8_10000', 1)),
+    ('lines.get_incidents_affectations', lambda: lines.get_incidents_affectations(8, '8__591___')),
+    ('stops.get_stops_by_cod_stop', lambda: stops.get_stops_by_cod_stop('4_276')),
+    ('stops.get_stops_by_custom_search', lambda: stops.get_stops_by_custom_search('castellana')),
+    ('stops.get_stops_by_zip_code', lambda: stops.get_stops_by_zip_code(28004)),
+    ('stops.get_stops_by_municipality', lambda: stops.get_stops_by_municipality(4350)),
+    ('stops.iter_stops_by_zip_code', lambda: list(stops.iter_stops_by_zip_code(28004))),
+    ('stops.iter_stops_by_municipality', lambda: list(stops.iter_stops_by_municipality(4350))),
+    ('stops.get_stop_info', lambda: stops.get_stop_info('4_276')),
+    ('stops.get_stop_times', lambda: stops.get_stop_times('4_276', 'P', '4_276')),
+    ('stops.get_nearest_stops', lambda: stops.get_nearest_stops(40.453053, -3.688344, 500.0)),
+    ('offices.get_offices_by_type', lambda: offices.get_offices_by_type('gestion')),
+    ('offices.get_offices_by_postcode', lambda: offices.get_offices_by_postcode(28003)),
+    ('offices.get_offices_by_municipality', lambda: offices.get_offices_by_municipality(4350)),
+    ('others.get_municipalities', others.get_municipalities),
+    ('others.get_transport_modes', others.get_transport_modes),
+]
+
+
+def _percentile(values, percentile):
+    values = sorted(values)
+
+    return values[min(len(values) - 1, int(len(values) * percentile / 100))]
+
+
+def _timed(call):
+    started_at = time.monotonic()
+    call()
+
+    return time.monotonic() - started_at
+
+
+def run(calls=50, concurrency=8, latency_ms=5, recorded_dir=None):
+    results = []
+    previous = get_transport()
+
+    with StandInServer(Payloads(recorded_dir), delay=lambda path: latency_ms / 1000.0) as server:
+        # Conditional requests stay disabled, so every call decodes its body like a call to CRTM.
+        set_transport(Transport(pool_maxsize=concurrency, conditional_endpoints=(),
+                                url_overrides={Urls.CITRAM_WIDGET_SERVICE.value: server.url}))
+
+        try:
+            for name, call in CALLS:
+                call()  # Warm up the connections and the payloads of the server.
+
+                latencies = [_timed(call) for _ in range(calls)]
+
+                started_at = time.monotonic()
+
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    list(executor.map(lambda _: call(), range(calls)))
+
+                elapsed = time.monotonic() - started_at
+
+                results.append({'benchmark': 'api', 'function': name, 'calls': calls, 'concurrency': concurrency,
+                                'server_latency_ms': latency_ms,
+                                'latency_ms': {'mean': sum(latencies) / len(latencies) * 1000,
+                                               'p50': _percentile(latencies, 50) * 1000,
+                                               'p99': _percentile(latencies, 99) * 1000},
+                                'requests_per_second': calls / elapsed})
+        finally:
+            set_transport(previous)
+
+    return results
+
+
+def main(*args):
+    for result in run(*args):
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main(*((int(arg) if i < 3 else arg) for i, arg in enumerate(sys.argv[1:])))
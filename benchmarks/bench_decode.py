@@ -0,0 +1,51 @@
+"""
+Time to decode get_line_info and get_stops_by_municipality bodies with every installed JSON decoder, compared with
+decoding the body to text first as requests' Response.json does.
+
+Usage: python -m benchmarks.bench_decode [repetitions] [recorded body files...]
+
+Without files, synthetic bodies shaped like the responses of both endpoints are used. Recorded bodies can be saved
+with i.e. ``curl -o line_info.json '<url of get_line_info>'``.
+"""
+import json
+import os
+import sys
+import timeit
+
+from benchmarks.payloads import line_info_payload, stops_payload
+from citram_api.utils.json_decoder import _load_decoder, available_decoders
+
+
+def _text_json(body):
+    return json.loads(body.decode('utf-8'))
+
+
+def run(repetitions=20, *paths):
+    if paths:
+        payloads = {os.path.basename(path): open(path, 'rb').read() for path in paths}
+    else:
+        payloads = {'get_line_info': line_info_payload(), 'get_stops_by_municipality': stops_payload(5000)}
+
+    decoders = [('text+json', _text_json)] + [(name, _load_decoder(name)) for name in available_decoders()]
+    results = []
+
+    for payload_name, body in payloads.items():
+        milliseconds = {}
+
+        for decoder_name, decode in decoders:
+            seconds = min(timeit.repeat(lambda: decode(body), number=repetitions, repeat=3)) / repetitions
+            milliseconds[decoder_name] = seconds * 1000
+
+        results.append({'benchmark': 'decode', 'payload': payload_name, 'bytes': len(body),
+                        'milliseconds': milliseconds})
+
+    return results
+
+
+def main(*args):
+    for result in run(*args):
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main(*((int(arg) if i == 0 else arg) for i, arg in enumerate(sys.argv[1:])))
@@ -0,0 +1,62 @@
+"""
+Latency percentiles of requests to a stand-in server where 5% of the responses are slow, without hedging, with
+hedging, and with a deadline and retries.
+
+Usage: python -m benchmarks.bench_hedging [number of requests]
+"""
+import json
+import sys
+import time
+
+from benchmarks.stand_in_server import StandInServer, tail_delay
+from citram_api.utils.custom_exceptions import DeadlineExceededException
+from citram_api.utils.transport import Transport
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+
+    return {'p{}'.format(p): latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000
+            for p in (50, 95, 99)}
+
+
+def _run(transport, url, number_of_requests):
+    latencies, failures = [], 0
+
+    for i in range(number_of_requests):
+        started_at = time.monotonic()
+
+        try:
+            transport.get_json('{}/GetStopsTimes.php?codStop=8_{}'.format(url, i))
+        except DeadlineExceededException:
+            failures += 1
+
+        latencies.append(time.monotonic() - started_at)
+
+    transport.close()
+
+    return dict(_percentiles(latencies), failures=failures, **transport.stats())
+
+
+def run(number_of_requests=400):
+    transports = {'plain': lambda: Transport(),
+                  'hedged_p90': lambda: Transport(hedge_percentile=90, hedge_delay=0.05),
+                  'deadline_retries': lambda: Transport(deadline=0.5, retries=2, read_timeout=0.1)}
+    results = []
+
+    for name, create in transports.items():
+        with StandInServer(b'{"stopTimes": {}}', tail_delay(base=0.01, slow=0.5, slow_ratio=0.05)) as server:
+            milliseconds = _run(create(), server.url, number_of_requests)
+
+        results.append({'benchmark': 'hedging', 'transport': name, 'milliseconds': milliseconds})
+
+    return results
+
+
+def main(*args):
+    for result in run(*args):
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
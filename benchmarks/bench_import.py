@@ -0,0 +1,33 @@
+"""
+Import time of citram_api.constants.constants, measured in fresh interpreters.
+
+Usage: python -m benchmarks.bench_import [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+
+
+_SCRIPT = ('import time; started_at = time.perf_counter(); import citram_api.constants.constants; '
+           'print(time.perf_counter() - started_at)')
+
+
+def run(runs=10, module='citram_api.constants.constants'):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    script = _SCRIPT.replace('citram_api.constants.constants', module)
+    seconds = sorted(float(subprocess.check_output([sys.executable, '-c', script], env=env))
+                     for _ in range(runs))
+
+    return [{'benchmark': 'import', 'module': module, 'runs': runs,
+             'milliseconds': {'min': seconds[0] * 1000, 'median': seconds[len(seconds) // 2] * 1000}}]
+
+
+def main(*args):
+    for result in run(*args):
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
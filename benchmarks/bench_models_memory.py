@@ -0,0 +1,44 @@
+"""
+Memory used by a stop catalog as the dictionaries returned by the library and as citram_api.models objects.
+
+Usage: python -m benchmarks.bench_models_memory [number of stops]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from benchmarks.payloads import stops_payload
+from citram_api.models.models import stops_from_response
+
+
+def _measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return result, size
+
+
+def run(number_of_stops=20000):
+    payload = stops_payload(number_of_stops)
+
+    response, dict_bytes = _measure(lambda: json.loads(payload))
+    del response
+
+    models, model_bytes = _measure(lambda: stops_from_response(json.loads(payload)))
+
+    return [{'benchmark': 'models_memory', 'stops': len(models), 'dict_bytes': dict_bytes,
+             'model_bytes': model_bytes, 'ratio': dict_bytes / model_bytes}]
+
+
+def main(*args):
+    for result in run(*args):
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,192 @@
+"""
+Bodies of CRTM responses used by the benchmarks. They are synthetic, shaped like the examples in the docstrings of
+citram_api.api and sized like real responses, unless recorded bodies are given.
+"""
+import json
+import os
+import random
+from urllib.parse import parse_qs, urlsplit
+
+from citram_api.utils.transport import endpoint_name
+
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'citram_api', 'constants',
+                         'data')
+
+
+def _line(cod_mode, number):
+    return {'codLine': '{}__{}___'.format(cod_mode, number), 'shortDescription': str(number),
+            'description': '{}-SOL/SEVILLA-CHAMARTIN'.format(number), 'codMode': str(cod_mode),
+            'updateDate': '2017-11-08T12:43:20+01:00', 'updateKmlDate': '2017-11-08T12:37:23+01:00',
+            'nightService': 0, 'active': True, 'shortItinerary': {}, 'companyCode': ''}
+
+
+def _dumps(value):
+    return json.dumps(value).encode('utf-8')
+
+
+def stops_payload(number_of_stops, seed=0):
+    """
+    Body of a GetStops.php / GetNearestStopsByLocation.php like response with the given number of stops, each one
+    embedding the Line objects of its lines.
+    """
+    rnd = random.Random(seed)
+    stops = []
+
+    for i in range(number_of_stops):
+        cod_mode = rnd.choice([4, 6, 8, 9])
+        stops.append({'codStop': '{}_{}'.format(cod_mode, i), 'shortCodStop': str(i), 'codMode': str(cod_mode),
+                      'name': 'Castellana-San Germán {}'.format(i), 'address': 'Pº de la Castellana, {}'.format(i),
+                      'postCode': '280{:02d}'.format(rnd.randint(1, 60)), 'codMunicipality': '4350',
+                      'coordinates': {'longitude': -3.69 + rnd.random() / 10, 'latitude': 40.45 + rnd.random() / 10},
+                      'lines': {'Line': [_line(cod_mode, rnd.randint(1, 200)) for _ in range(rnd.randint(1, 6))]},
+                      'access': 2, 'park': 0, 'nightLinesService': 0})
+
+    return _dumps({'stops': {'Stop': stops}})
+
+
+def line_info_payload(number_of_stops=60):
+    """
+    Body of a GetLinesInformation.php like response for a long bus line with two itineraries.
+    """
+    line = _line(8, 591)
+    itineraries = []
+
+    for direction in (1, 2):
+        stops = [{'codStop': '8_{}'.format(direction * 10000 + i), 'shortCodStop': str(direction * 10000 + i),
+                  'codMode': '8', 'name': 'AV. DE LA CONSTITUCIÓN-CTRA. M-506 {}'.format(i),
+                  'address': 'Avda. de la Constitución, {}'.format(i), 'postCode': '28943',
+                  'codMunicipality': '4289', 'coordinates': {'longitude': -3.79 + i / 1000, 'latitude': 40.28},
+                  'lines': {'Line': [line, _line(8, 460 + i % 5)]}, 'access': 1, 'park': 0, 'nightLinesService': 0}
+                 for i in range(number_of_stops)]
+        itineraries.append({'codItinerary': '8__591____{}__IT_1'.format(direction),
+                            'name': 'Fuenlabrada - Madrid (Aluche)', 'direction': direction,
+                            'kml': 'http://www.citram.es:8080/kml/itinerarios/8__591___{}.kmz'.format(direction),
+                            'stops': {'StopInformation': stops}})
+
+    info = dict(line, codMunicipalities={'string': ['4289', '4350']}, itinerary={'Itinerary': itineraries},
+                lineTimePlanning={'codLine': line['codLine'], 'codItinerary': '', 'type': '', 'startService': '',
+                                  'endService': '', 'updateDate': '0001-01-01T00:00:00'})
+
+    return _dumps({'lines': {'LineInformation': info}})
+
+
+def lines_payload(number_of_lines=400):
+    """
+    Body of a GetLines.php like response.
+    """
+    lines = []
+
+    for number in range(1, number_of_lines + 1):
+        line = _line(8, number)
+        line['codMunicipalities'] = {'string': ['4289', '4350']}
+        line['shortItinerary'] = {'Itinerary': [{'codItinerary': '8__{}____{}__IT_1'.format(number, direction),
+                                                 'name': 'Fuenlabrada - Madrid', 'direction': direction}
+                                                for direction in (1, 2)]}
+        lines.append(line)
+
+    return _dumps({'lines': {'Line': lines}})
+
+
+def stop_times_payload(number_of_times=6):
+    """
+    Body of a GetStopsTimes.php like response.
+    """
+    stop = {'codStop': '4_276', 'shortCodStop': '276', 'name': 'LAS TABLAS', 'park': 0, 'nightLinesService': 0}
+    times = [{'line': _line(4, 10), 'direction': 1, 'destination': 'PUERTA DEL SUR',
+              'destinationStop': dict(stop, codStop='4_205', name='PUERTA DEL SUR'),
+              'time': '2020-01-02T01:{:02d}:39+01:00'.format(40 + i), 'codVehicle': '', 'codIssue': ''}
+             for i in range(number_of_times)]
+
+    return _dumps({'stopTimes': {'actualDate': '2020-01-02T01:35:27+01:00', 'stop': stop, 'times': {'Time': times},
+                                 'linesStatus': {'LineStatus': {'line': {'codLine': '4__10___',
+                                                                         'shortDescription': '10'},
+                                                                'SAEStatus': True}}}})
+
+
+def offices_payload(number_of_offices=60):
+    """
+    Body of a GetOffices.php like response.
+    """
+    offices = [{'codOffice': '01_{:06d}'.format(i), 'name': 'Oficina de Gestión {}'.format(i),
+                'address': 'Plaza de la Moncloa, {}. 28008 Madrid'.format(i),
+                'openTime': 'Horario de atención al público: Lunes a viernes de 7 a 22 h',
+                'coordinates': {'longitude': -3.7 + i / 1000, 'latitude': 40.43}, 'type': 'gestion'}
+               for i in range(number_of_offices)]
+
+    return _dumps({'offices': {'Office': offices}})
+
+
+def line_location_payload(number_of_vehicles=5):
+    """
+    Body of a GetLineLocation.php like response.
+    """
+    vehicles = [{'codVehicle': str(1000 + i), 'coordinates': {'longitude': -3.7 + i / 100, 'latitude': 40.4},
+                 'direction': 1} for i in range(number_of_vehicles)]
+
+    return _dumps({'lineLocation': {'vehiclesLocation': {'VehicleLocation': vehicles}}})
+
+
+def _bundled(file_name):
+    with open(os.path.join(_DATA_DIR, file_name), 'rb') as f:
+        return f.read()
+
+
+def _stops_by_query(query):
+    if 'codMunicipality' in query:
+        return stops_payload(3000)
+
+    if 'postcode' in query:
+        return stops_payload(300)
+
+    if 'customSearch' in query:
+        return stops_payload(20)
+
+    return stops_payload(1)
+
+
+_BUILDERS = {
+    'GetModes.php': lambda query: _bundled('transport_modes.json'),
+    'GetMunicipalities.php': lambda query: _bundled('municipalities.json'),
+    'GetLines.php': lambda query: lines_payload(400 if 'mode' in query else 40),
+    'GetLinesInformation.php': lambda query: line_info_payload(),
+    'GetLinesTimePlanning.php': lambda query: _dumps({'lines': {'LineTimePlanning': {'codLine': '8__591___'}}}),
+    'GetLineLocation.php': lambda query: line_location_payload(),
+    'GetIncidentsAffectations.php': lambda query: _dumps({'incidents': {}}),
+    'GetStops.php': _stops_by_query,
+    'GetNearestStopsByLocation.php': lambda query: stops_payload(30),
+    'GetStopsTimes.php': lambda query: stop_times_payload(),
+    'GetOffices.php': lambda query: offices_payload(),
+}
+
+
+class Payloads(object):
+    """
+    Bodies by requested path, built once. Recorded bodies in a directory, named after the endpoint
+    (i.e. GetStopsTimes.php.json), take precedence over the synthetic ones.
+
+    :param str recorded_dir: Directory with recorded bodies. Optional, default: None.
+    """
+
+    def __init__(self, recorded_dir=None):
+        self.recorded_dir = recorded_dir
+        self._bodies = {}
+
+    def __call__(self, path):
+        endpoint = endpoint_name(path.split('?', 1)[0])
+        query = frozenset(parse_qs(urlsplit(path).query))
+        key = (endpoint, query)
+        body = self._bodies.get(key)
+
+        if body is None:
+            recorded = os.path.join(self.recorded_dir, endpoint + '.json') if self.recorded_dir else None
+
+            if recorded is not None and os.path.isfile(recorded):
+                with open(recorded, 'rb') as f:
+                    body = f.read()
+            else:
+                body = _BUILDERS.get(endpoint, lambda query: b'{}')(query)
+
+            body = self._bodies[key] = body
+
+        return body
@@ -0,0 +1,73 @@
+"""
+Runs the benchmarks and writes their results, along with the environment they ran in, as a JSON document that can be
+compared with the one of another run.
+
+Usage: python -m benchmarks.run [--output results.json] [--only api import ...] [--calls 50] [--latency-ms 5]
+                                [--recorded-dir dir]
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from benchmarks import bench_api, bench_decode, bench_hedging, bench_import, bench_models_memory
+
+
+BENCHMARKS = ('api', 'import', 'decode', 'models_memory', 'hedging')
+
+
+def _git_commit():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=root,
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _metadata():
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'git_commit': _git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat()}
+
+
+def run(only=BENCHMARKS, calls=50, concurrency=8, latency_ms=5, recorded_dir=None):
+    runners = {'api': lambda: bench_api.run(calls, concurrency, latency_ms, recorded_dir),
+               'import': lambda: bench_import.run(),
+               'decode': lambda: bench_decode.run(),
+               'models_memory': lambda: bench_models_memory.run(),
+               'hedging': lambda: bench_hedging.run()}
+    results = []
+
+    for name in only:
+        results.extend(runners[name]())
+
+    return {'metadata': _metadata(), 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the citram_api benchmarks.')
+    parser.add_argument('--output', help='File to write the results to, default: standard output.')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--calls', type=int, default=50, help='Calls per public function.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=int, default=5, help='Latency of the stand-in server.')
+    parser.add_argument('--recorded-dir', help='Directory with recorded bodies, named after their endpoint.')
+    args = parser.parse_args(argv)
+
+    document = run(args.only, args.calls, args.concurrency, args.latency_ms, args.recorded_dir)
+    text = json.dumps(document, indent=2)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
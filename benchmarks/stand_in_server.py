@@ -0,0 +1,102 @@
+"""
+Local HTTP server standing in for the CRTM API in benchmarks. It answers every GET with a JSON body chosen by path
+after a delay chosen per request, so slow and stalled responses can be reproduced.
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import hashlib
+import random
+import socketserver
+import threading
+import time
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop requests they don't need anymore, i.e. the slower of two hedged requests.
+        pass
+
+
+def tail_delay(base=0.01, slow=1.0, slow_ratio=0.05, seed=0):
+    """
+    Delay function where most requests take base seconds and a fraction of them take slow seconds.
+    """
+    rnd = random.Random(seed)
+    lock = threading.Lock()
+
+    def delay(path):
+        with lock:
+            return slow if rnd.random() < slow_ratio else base
+
+    return delay
+
+
+class StandInServer(object):
+    """
+    :param body: Body of every response as bytes, or a function that takes the requested path (with the query) and
+                 returns the body. Optional, default: an empty JSON object.
+    :param delay: Function that takes the requested path and returns the seconds to wait before answering.
+                  Optional, default: no delay.
+    :param bool etag: Whether responses have an ETag and conditional requests are answered with 304.
+                      Optional, default: False.
+    """
+
+    def __init__(self, body=b'{}', delay=None, etag=False):
+        self.body = body if callable(body) else (lambda path: body)
+        self.delay = delay or (lambda path: 0)
+        self.etag = etag
+        self.requests = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.delay(self.path))
+
+                body = server.body(self.path)
+                etag = '"{}"'.format(hashlib.sha1(body).hexdigest()) if server.etag else None
+
+                if etag is not None and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+
+                    return
+
+                self.send_response(200)
+
+                if etag is not None:
+                    self.send_header('ETag', etag)
+
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address
+
+        return 'http://{}:{}'.format(host, port)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
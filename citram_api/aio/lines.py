@@ -0,0 +1,51 @@
+from citram_api.aio.utils import common_request
+from citram_api.api.lines import lines
+
+
+async def get_lines_by_mode(mode_cod):
+    """
+    Awaitable version of :func:`citram_api.api.lines.lines.get_lines_by_mode`.
+    """
+    return await common_request(lines._get_lines_by_mode_url(mode_cod))
+
+
+async def get_lines_by_municipality(cod_municipality, cod_mode=None):
+    """
+    Awaitable version of :func:`citram_api.api.lines.lines.get_lines_by_municipality`.
+    """
+    return await common_request(lines._get_lines_by_municipality_url(cod_municipality, cod_mode))
+
+
+async def get_lines_by_line_code(cod_line):
+    """
+    Awaitable version of :func:`citram_api.api.lines.lines.get_lines_by_line_code`.
+    """
+    return await common_request(lines._get_lines_by_line_code_url(cod_line))
+
+
+async def get_line_info(cod_line):
+    """
+    Awaitable version of :func:`citram_api.api.lines.lines.get_line_info`.
+    """
+    return await common_request(lines._get_line_info_url(cod_line))
+
+
+async def get_lines_timeplanning(cod_line):
+    """
+    Awaitable version of :func:`citram_api.api.lines.lines.get_lines_timeplanning`.
+    """
+    return await common_request(lines._get_lines_timeplanning_url(cod_line))
+
+
+async def get_line_location(mode_cod, cod_itinerary, cod_line, cod_stop, direction):
+    """
+    Awaitable version of :func:`citram_api.api.lines.lines.get_line_location`.
+    """
+    return await common_request(lines._get_line_location_url(mode_cod, cod_itinerary, cod_line, cod_stop, direction))
+
+
+async def get_incidents_affectations(mode_cod, cod_line):
+    """
+    Awaitable version of :func:`citram_api.api.lines.lines.get_incidents_affectations`.
+    """
+    return await common_request(lines._get_incidents_affectations_url(mode_cod, cod_line))
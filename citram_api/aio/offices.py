@@ -0,0 +1,23 @@
+from citram_api.aio.utils import common_request
+from citram_api.api.offices import offices
+
+
+async def get_offices_by_type(offices_type):
+    """
+    Awaitable version of :func:`citram_api.api.offices.offices.get_offices_by_type`.
+    """
+    return await common_request(offices._get_offices_by_type_url(offices_type))
+
+
+async def get_offices_by_postcode(post_code, offices_type=None):
+    """
+    Awaitable version of :func:`citram_api.api.offices.offices.get_offices_by_postcode`.
+    """
+    return await common_request(offices._get_offices_by_postcode_url(post_code, offices_type))
+
+
+async def get_offices_by_municipality(cod_municipality, offices_type=None):
+    """
+    Awaitable version of :func:`citram_api.api.offices.offices.get_offices_by_municipality`.
+    """
+    return await common_request(offices._get_offices_by_municipality_url(cod_municipality, offices_type))
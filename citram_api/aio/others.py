@@ -0,0 +1,40 @@
+import asyncio
+import functools
+
+from citram_api.aio.utils import common_request
+from citram_api.api.others import others
+
+
+async def get_municipalities():
+    """
+    Awaitable version of :func:`citram_api.api.others.others.get_municipalities`.
+    """
+    return await common_request(others._get_municipalities_url())
+
+
+async def get_ttp_card_info(ttp_number):
+    """
+    Awaitable version of :func:`citram_api.api.others.others.get_ttp_card_info`. The SOAP call runs in the
+    default executor of the event loop.
+    """
+    loop = asyncio.get_event_loop()
+
+    return await loop.run_in_executor(None, functools.partial(others.get_ttp_card_info, ttp_number))
+
+
+async def get_ttp_card_info_many(ttp_numbers, max_workers=8):
+    """
+    Awaitable version of :func:`citram_api.api.others.others.get_ttp_card_info_many`. The SOAP calls run in the
+    default executor of the event loop.
+    """
+    loop = asyncio.get_event_loop()
+
+    return await loop.run_in_executor(None, functools.partial(others.get_ttp_card_info_many, ttp_numbers,
+                                                              max_workers))
+
+
+async def get_transport_modes():
+    """
+    Awaitable version of :func:`citram_api.api.others.others.get_transport_modes`.
+    """
+    return await common_request(others._get_transport_modes_url())
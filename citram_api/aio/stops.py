@@ -0,0 +1,51 @@
+from citram_api.aio.utils import common_request
+from citram_api.api.stops import stops
+
+
+async def get_stops_by_cod_stop(cod_stop):
+    """
+    Awaitable version of :func:`citram_api.api.stops.stops.get_stops_by_cod_stop`.
+    """
+    return await common_request(stops._get_stops_by_cod_stop_url(cod_stop))
+
+
+async def get_stops_by_custom_search(custom_search):
+    """
+    Awaitable version of :func:`citram_api.api.stops.stops.get_stops_by_custom_search`.
+    """
+    return await common_request(stops._get_stops_by_custom_search_url(custom_search))
+
+
+async def get_stops_by_zip_code(postcode):
+    """
+    Awaitable version of :func:`citram_api.api.stops.stops.get_stops_by_zip_code`.
+    """
+    return await common_request(stops._get_stops_by_zip_code_url(postcode))
+
+
+async def get_stops_by_municipality(cod_municipality):
+    """
+    Awaitable version of :func:`citram_api.api.stops.stops.get_stops_by_municipality`.
+    """
+    return await common_request(stops._get_stops_by_municipality_url(cod_municipality))
+
+
+async def get_stop_info(cod_stop):
+    """
+    Awaitable version of :func:`citram_api.api.stops.stops.get_stop_info`.
+    """
+    return await common_request(stops._get_stop_info_url(cod_stop))
+
+
+async def get_stop_times(cod_stop, stop_type, stop_times_by_iti, order_by=2):
+    """
+    Awaitable version of :func:`citram_api.api.stops.stops.get_stop_times`.
+    """
+    return await common_request(stops._get_stop_times_url(cod_stop, stop_type, stop_times_by_iti, order_by))
+
+
+async def get_nearest_stops(latitude, longitude, distance, method=2):
+    """
+    Awaitable version of :func:`citram_api.api.stops.stops.get_nearest_stops`.
+    """
+    return await common_request(stops._get_nearest_stops_url(latitude, longitude, distance, method))
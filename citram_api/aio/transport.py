@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from citram_api.utils.json_decoder import loads
+from citram_api.utils.transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, _override_url
+
+
+class AsyncTransport(object):
+    """
+    Pooled asyncio HTTP transport used by the citram_api.aio functions. It needs aiohttp, which can be installed
+    with ``pip install citram-python-api[aio]``.
+
+    Connections are kept alive and shared by every coroutine running in the same event loop. A transport used from
+    a different event loop opens its own connection pool there, and closes the one of the previous loop.
+
+    :param int limit: Maximum number of simultaneous connections. Optional, default: 100.
+    :param int limit_per_host: Maximum number of simultaneous connections to the same host. Optional, default: 32.
+    :param float connect_timeout: Seconds to wait for a connection to be established. Optional, default: 3.05.
+    :param float read_timeout: Seconds to wait between bytes received from the server. Optional, default: 15.
+    :param float keepalive_timeout: Seconds an idle connection is kept open. Optional, default: 30.
+    :param dict headers: Extra headers sent with every request. Optional, default: None.
+    :param dict url_overrides: Url prefixes replaced before requesting, i.e. to point the library to a local server:
+                               {Urls.CITRAM_WIDGET_SERVICE.value: 'http://127.0.0.1:8000'}. Optional, default: None.
+    :param Archive archive: utils.replay.Archive the responses are recorded to, or replayed from if it was loaded
+                            from a file. Optional, default: None.
+    """
+
+    def __init__(self, limit=100, limit_per_host=32, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, keepalive_timeout=30, headers=None, url_overrides=None,
+                 archive=None):
+        if aiohttp is None:
+            raise ImportError('citram_api.aio needs aiohttp. Install it with: pip install citram-python-api[aio]')
+
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keepalive_timeout = keepalive_timeout
+        self.headers = dict(headers or {})
+        self.url_overrides = dict(url_overrides or {})
+        self.archive = archive
+
+        self._session = None
+        self._loop = None
+
+    @property
+    def session(self):
+        """
+        Session bound to the running event loop. It is created the first time it is needed in each loop.
+
+        :return aiohttp.ClientSession: The session to use from the running event loop.
+        """
+        loop = asyncio.get_event_loop()
+
+        if self._session is None or self._session.closed or self._loop is not loop:
+            if self._session is not None and not self._session.closed:
+                _close_on_its_loop(self._session, self._loop)
+
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout,
+                                            sock_read=self.read_timeout)
+
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+            self._loop = loop
+
+        return self._session
+
+    async def get(self, url):
+        """
+        Performs a GET request through the pooled connections.
+
+        :param str url: Url to request.
+        :return tuple: Status code and raw body of the response.
+        """
+        url = _override_url(url, self.url_overrides)
+        archive = self.archive
+
+        if archive is not None and archive.replaying:
+            status, _, body = archive.response('GET', url)
+            delay = archive.delay(url)
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            return status, body
+
+        async with self.session.get(url) as res:
+            body = await res.read()
+
+            if archive is not None:
+                archive.add('GET', url, None, res.status, res.headers, body)
+
+            return res.status, body
+
+    async def get_json(self, url, record=None):
+        """
+        Performs a GET request and decodes the JSON body of the response.
+
+        :param str url: Url to request.
+        :param RequestRecord record: Record where the status code, size and decode time are stored (see
+                                     utils.instrumentation). Optional, default: None.
+        :return dict: The decoded body.
+        """
+        status, body = await self.get(url)
+
+        if record is None:
+            return loads(body)
+
+        record.status = status
+        record.bytes = len(body)
+        started_at = time.monotonic()
+        data = loads(body)
+        record.decode_time = time.monotonic() - started_at
+
+        return data
+
+    async def close(self):
+        """
+        Closes the connection pool of the running event loop.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+        self._session = None
+        self._loop = None
+
+
+def _close_on_its_loop(session, loop):
+    # A session can only be closed on the event loop it was created in.
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+    elif not loop.is_closed():
+        # It is closed as soon as that loop runs again.
+        loop.create_task(session.close())
+
+    # The connections of a closed loop can't be closed anymore, they are released with the session.
+
+
+_transport = None
+
+
+def get_async_transport():
+    """
+    Returns the transport shared by all the citram_api.aio functions. It is created on first use.
+
+    :return AsyncTransport: The shared transport.
+    """
+    global _transport
+
+    if _transport is None:
+        _transport = AsyncTransport()
+
+    return _transport
+
+
+def set_async_transport(transport):
+    """
+    Replaces the transport shared by all the citram_api.aio functions. Close the previous one with
+    ``await transport.close()`` if it was used.
+
+    :param AsyncTransport transport: The new transport.
+    """
+    global _transport
+
+    _transport = transport
+
+
+def configure_async_transport(**kwargs):
+    """
+    Creates a new shared async transport with the given settings. See AsyncTransport for the accepted arguments.
+
+    :return AsyncTransport: The new shared transport.
+    """
+    transport = AsyncTransport(**kwargs)
+    set_async_transport(transport)
+
+    return transport
@@ -0,0 +1,141 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from citram_api.aio.transport import get_async_transport
+from citram_api.utils.catalog_cache import get_catalog_cache
+from citram_api.utils.instrumentation import HIT, MISS, RequestRecord, has_hooks
+from citram_api.utils.realtime_cache import get_realtime_cache
+from citram_api.utils.scheduler import current_priority, get_scheduler
+
+
+DEFAULT_CONCURRENCY = 20
+
+# Threads waiting for the scheduler, one pool by priority so realtime waits never queue behind bulk ones.
+SCHEDULER_THREADS = 32
+
+# Threads reading and writing the catalog cache.
+CATALOG_CACHE_THREADS = 4
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _executor(key, max_workers, thread_name_prefix):
+    # Blocking work of the aio functions runs in pools of its own, so it doesn't take the default executor, which
+    # runs the SOAP card queries.
+    executor = _executors.get(key)
+
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(key)
+
+            if executor is None:
+                executor = _executors[key] = ThreadPoolExecutor(max_workers=max_workers,
+                                                                thread_name_prefix=thread_name_prefix)
+
+    return executor
+
+
+def _scheduler_executor(level):
+    return _executor(('scheduler', level), SCHEDULER_THREADS, 'citram-aio-scheduler')
+
+
+def _catalog_cache_executor():
+    return _executor('catalog_cache', CATALOG_CACHE_THREADS, 'citram-aio-catalog-cache')
+
+
+async def common_request(url):
+    if not has_hooks():
+        return await _cached_request(url, None)
+
+    record = RequestRecord(url)
+
+    try:
+        data = await _cached_request(url, record)
+    except Exception as e:
+        record.finish(e)
+        raise
+
+    record.finish()
+
+    return data
+
+
+async def _cached_request(url, record):
+    realtime_cache = get_realtime_cache()
+
+    if realtime_cache is not None and realtime_cache.handles(url):
+        def fetch():
+            if record is not None:
+                record.cache = MISS
+
+            return _request(url, record)
+
+        data = await realtime_cache.get_or_fetch_async(url, fetch)
+
+        if record is not None and record.cache is None:
+            record.cache = HIT
+
+        return data
+
+    return await _request(url, record)
+
+
+async def _request(url, record=None):
+    catalog_cache = get_catalog_cache()
+    loop = asyncio.get_event_loop()
+
+    if catalog_cache is not None and catalog_cache.ttl(url) is None:
+        catalog_cache = None
+
+    if catalog_cache is not None:
+        # The cache reads and writes a SQLite database, which would block the event loop.
+        data = await loop.run_in_executor(_catalog_cache_executor(), catalog_cache.get, url)
+
+        if record is not None:
+            record.cache = MISS if data is None else HIT
+
+        if data is not None:
+            return data
+
+    scheduler = get_scheduler()
+
+    if scheduler is not None:
+        # The scheduler blocks while waiting, so it is waited for out of the event loop.
+        level = current_priority()
+        await loop.run_in_executor(_scheduler_executor(level), scheduler.acquire, url, level)
+
+    data = await get_async_transport().get_json(url, record=record)
+
+    if catalog_cache is not None:
+        await loop.run_in_executor(_catalog_cache_executor(), catalog_cache.put, url, data)
+
+    return data
+
+
+async def gather(*aws, limit=DEFAULT_CONCURRENCY, return_exceptions=False):
+    """
+    Like asyncio.gather, but never awaits more than limit of the given awaitables at the same time. Results keep
+    the order of the arguments.
+
+    Example:
+
+    .. code-block:: python
+
+        stops = ['4_276', '4_284', '4_192']
+        results = await gather(*(get_stop_info(cod_stop) for cod_stop in stops), limit=10)
+
+    :param aws: Coroutines to run.
+    :param int limit: Maximum number of coroutines running at once. Optional, default: 20.
+    :param bool return_exceptions: Return exceptions as results instead of raising the first one.
+                                   Optional, default: False.
+    :return list: The results of the awaitables, in the same order.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=return_exceptions)
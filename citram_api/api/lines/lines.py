@@ -1,6 +1,6 @@
 from citram_api.constants.hosts import Urls
 from citram_api.utils.custom_exceptions import NotEnoughParametersException
-from citram_api.utils.utils import common_request
+from citram_api.utils.utils import common_request, stream_request
 
 
 def get_lines_by_mode(mode_cod):
@@ -57,6 +57,10 @@ def get_lines_by_mode(mode_cod):
         }
 
     """
+    return common_request(_get_lines_by_mode_url(mode_cod))
+
+
+def _get_lines_by_mode_url(mode_cod):
     if mode_cod is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetLines.php?mode={mode}'
@@ -64,7 +68,7 @@ def get_lines_by_mode(mode_cod):
     else:
         raise NotEnoughParametersException('You must specify a transport mode.')
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_lines_by_municipality(cod_municipality, cod_mode=None):
@@ -202,6 +206,10 @@ def get_lines_by_municipality(cod_municipality, cod_mode=None):
             }
         }
     """
+    return common_request(_get_lines_by_municipality_url(cod_municipality, cod_mode))
+
+
+def _get_lines_by_municipality_url(cod_municipality, cod_mode=None):
     if cod_municipality is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetLines.php?codMunicipality={codMunicipality}'
@@ -212,7 +220,38 @@ def get_lines_by_municipality(cod_municipality, cod_mode=None):
     else:
         raise NotEnoughParametersException('You must specify a municipality code.')
 
-    return common_request(url_formatted)
+    return url_formatted
+
+
+def iter_lines_by_mode(mode_cod):
+    """
+    Like get_lines_by_mode, but the response is parsed while it is received and the lines are yielded one by one,
+    so the whole response is never held in memory.
+
+    Example:
+
+    .. code-block:: python
+
+        for line in iter_lines_by_mode(TransportModes.AUTOBUSES_INTERURBANOS.value):
+            print(line['codLine'], line['description'])
+
+    :param int mode_cod: Id of a public transport. Use constants.TransportModes to easily select transport modes ids.
+    :return: Generator of lines, like the items of get_lines_by_mode(mode_cod)['lines']['Line'].
+    """
+    return stream_request(_get_lines_by_mode_url(mode_cod), 'Line')
+
+
+def iter_lines_by_municipality(cod_municipality, cod_mode=None):
+    """
+    Like get_lines_by_municipality, but the response is parsed while it is received and the lines are yielded one
+    by one, so the whole response is never held in memory.
+
+    :param int cod_municipality: Id of a municipality. Use constants.Municipalities to easily select transport modes ids.
+    :param int cod_mode: If specified, the results will be filtered, returning only lines of that transport mode.
+                         Optional, default: None (No transport mode filtering).
+    :return: Generator of lines, like the items of get_lines_by_municipality(cod_municipality)['lines']['Line'].
+    """
+    return stream_request(_get_lines_by_municipality_url(cod_municipality, cod_mode), 'Line')
 
 
 def get_lines_by_line_code(cod_line):
@@ -265,6 +304,10 @@ def get_lines_by_line_code(cod_line):
         }
 
     """
+    return common_request(_get_lines_by_line_code_url(cod_line))
+
+
+def _get_lines_by_line_code_url(cod_line):
     if cod_line is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetLines.php?codLine={codLine}'
@@ -272,7 +315,7 @@ def get_lines_by_line_code(cod_line):
     else:
         raise NotEnoughParametersException('You must specify a line code.')
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_line_info(cod_line):
@@ -355,11 +398,33 @@ def get_line_info(cod_line):
             }
         }
     """
+    return common_request(_get_line_info_url(cod_line))
+
+
+def _get_line_info_url(cod_line):
     url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                      '/GetLinesInformation.php?activeItinerary=1&codLine={codLine}'
                      .format(codLine=cod_line))
 
-    return common_request(url_formatted)
+    return url_formatted
+
+
+def iter_line_stops(cod_line):
+    """
+    Streams the response of get_line_info and yields the stops of its itineraries one by one, so the whole
+    response is never held in memory. The stops come itinerary by itinerary, in the order of each itinerary.
+
+    Example:
+
+    .. code-block:: python
+
+        for stop in iter_line_stops(create_line_cod(TransportModes.AUTOBUSES_INTERURBANOS.value, 591)):
+            print(stop['codStop'], stop['name'])
+
+    :param str cod_line: Line id. Use utils.create_line_cod to create this id easily.
+    :return: Generator of stops, like the items of the StopInformation lists of get_line_info(cod_line).
+    """
+    return stream_request(_get_line_info_url(cod_line), 'StopInformation')
 
 
 def get_lines_timeplanning(cod_line):
@@ -375,11 +440,15 @@ def get_lines_timeplanning(cod_line):
     :param str cod_line: Line id. Use utils.create_line_cod to create this id easily.
     :return: Timeplanning of the line id specified.
     """
+    return common_request(_get_lines_timeplanning_url(cod_line))
+
+
+def _get_lines_timeplanning_url(cod_line):
     url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                      '/GetLinesTimePlanning.php?activeItinerary=1&codLine={codLine}'
                      .format(codLine=cod_line))
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_line_location(mode_cod, cod_itinerary, cod_line, cod_stop, direction):
@@ -406,13 +475,16 @@ def get_line_location(mode_cod, cod_itinerary, cod_line, cod_stop, direction):
     :param int direction: Direction of a itinerary.
     :return:
     """
+    return common_request(_get_line_location_url(mode_cod, cod_itinerary, cod_line, cod_stop, direction))
+
 
+def _get_line_location_url(mode_cod, cod_itinerary, cod_line, cod_stop, direction):
     url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                      '/GetLineLocation.php?mode={mode}&codItinerary={codItinerary}&codLine={codLine}&codStop={codStop}&direction={direction}'
                      .format(mode=str(mode_cod), codItinerary=cod_itinerary, codLine=cod_line, codStop=cod_stop,
                              direction=str(direction)))
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_incidents_affectations(mode_cod, cod_line):
@@ -425,8 +497,12 @@ def get_incidents_affectations(mode_cod, cod_line):
     :param str cod_line: Line id. Use utils.create_line_cod to create this id easily.
     :return dict: The current incidents going on in that line.
     """
+    return common_request(_get_incidents_affectations_url(mode_cod, cod_line))
+
+
+def _get_incidents_affectations_url(mode_cod, cod_line):
     url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                      '/GetIncidentsAffectations.php?mode={mode}&codLine={codLine}'
                      .format(mode=str(mode_cod), codLine=cod_line))
 
-    return common_request(url_formatted)
+    return url_formatted
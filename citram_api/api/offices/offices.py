@@ -67,6 +67,10 @@ def get_offices_by_type(offices_type):
             }
         }
     """
+    return common_request(_get_offices_by_type_url(offices_type))
+
+
+def _get_offices_by_type_url(offices_type):
     if offices_type is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetOffices.php?type={offices_type}'
@@ -74,7 +78,7 @@ def get_offices_by_type(offices_type):
     else:
         raise NotEnoughParametersException('You must specify an office type.')
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_offices_by_postcode(post_code, offices_type=None):
@@ -95,6 +99,10 @@ def get_offices_by_postcode(post_code, offices_type=None):
                              Optional, default: None (no filtering).
     :return dict: A dictionary with a list of offices from the zip code specified.
     """
+    return common_request(_get_offices_by_postcode_url(post_code, offices_type))
+
+
+def _get_offices_by_postcode_url(post_code, offices_type=None):
     if post_code is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetOffices.php?postcode={postcode}'
@@ -104,7 +112,7 @@ def get_offices_by_postcode(post_code, offices_type=None):
     else:
         raise NotEnoughParametersException('You must specify a zip code.')
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_offices_by_municipality(cod_municipality, offices_type=None):
@@ -124,6 +132,10 @@ def get_offices_by_municipality(cod_municipality, offices_type=None):
                              Optional, default: None (no filtering).
     :return dict: A dictionary with a list of offices in that municipality.
     """
+    return common_request(_get_offices_by_municipality_url(cod_municipality, offices_type))
+
+
+def _get_offices_by_municipality_url(cod_municipality, offices_type=None):
     if cod_municipality is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetOffices.php?codmunicipality={codmunicipality}'
@@ -133,4 +145,4 @@ def get_offices_by_municipality(cod_municipality, offices_type=None):
     else:
         raise NotEnoughParametersException('You must specify a municipality code.')
 
-    return common_request(url_formatted)
+    return url_formatted
@@ -1,10 +1,30 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+import sqlite3
+import threading
+
 import xmltodict
 from zeep import Client
+from zeep.cache import SqliteCache
 from zeep.helpers import serialize_object
+from zeep.transports import Transport as ZeepTransport
 
 from citram_api.constants.hosts import Urls
 from citram_api.utils.custom_exceptions import NotEnoughParametersException
-from citram_api.utils.utils import common_request
+from citram_api.utils.transport import get_transport
+from citram_api.utils.utils import common_request, get_cache_dir
+
+
+WSDL_CACHE_TIMEOUT = 7 * 24 * 3600
+
+# Threads running the card queries of get_ttp_card_info_many, shared by every call.
+CARD_QUERY_THREADS = 32
+
+_card_client = None
+_card_client_transport = None
+_card_client_lock = threading.Lock()
+_card_executor = None
+_card_executor_lock = threading.Lock()
 
 
 def get_municipalities():
@@ -41,9 +61,13 @@ def get_municipalities():
             }
         }
     """
+    return common_request(_get_municipalities_url())
+
+
+def _get_municipalities_url():
     url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value + '/GetMunicipalities.php')
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_ttp_card_info(ttp_number):
@@ -59,7 +83,7 @@ def get_ttp_card_info(ttp_number):
     in that card, expiring dates, purchase dates, title types (young, normal, old, ...), among others.
     """
     if ttp_number is not None:
-        client = Client(Urls.CITRAM_CARD_SERVICE.value)
+        client = _get_card_client()
 
         result = client.service.ConsultaSaldo1(sNumeroTTP=ttp_number)
 
@@ -71,6 +95,136 @@ def get_ttp_card_info(ttp_number):
         raise NotEnoughParametersException('You must specify a transport card number.')
 
 
+def get_ttp_card_info_many(ttp_numbers, max_workers=8):
+    """
+    Get information from several transport card numbers at once. The queries run concurrently and share the same
+    SOAP client and connections, each thread with a session of its own.
+
+    Example:
+
+    .. code-block:: python
+
+        get_ttp_card_info_many(['0010000000000', '0010000000001'], max_workers=4)
+
+    :param list ttp_numbers: Transport card numbers. See get_ttp_card_info to know how to build them.
+    :param int max_workers: Maximum number of queries of this call running at the same time (all the calls share
+                            CARD_QUERY_THREADS threads). Optional, default: 8.
+    :return list: The information of each card, like get_ttp_card_info returns it, in the same order as ttp_numbers.
+    """
+    ttp_numbers = list(ttp_numbers)
+
+    if any(ttp_number is None for ttp_number in ttp_numbers):
+        raise NotEnoughParametersException('You must specify a transport card number.')
+
+    if not ttp_numbers:
+        return []
+
+    # The client is created before starting the workers so the WSDL is only loaded once.
+    _get_card_client()
+
+    executor = _get_card_executor()
+    results = [None] * len(ttp_numbers)
+    pending = {}
+
+    for position, ttp_number in enumerate(ttp_numbers):
+        if len(pending) >= max_workers:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                results[pending.pop(future)] = future.result()
+
+        pending[executor.submit(get_ttp_card_info, ttp_number)] = position
+
+    for future, position in pending.items():
+        results[position] = future.result()
+
+    return results
+
+
+def _get_card_executor():
+    global _card_executor
+
+    if _card_executor is None:
+        with _card_executor_lock:
+            if _card_executor is None:
+                _card_executor = ThreadPoolExecutor(max_workers=CARD_QUERY_THREADS, thread_name_prefix='citram-card')
+
+    return _card_executor
+
+
+def _get_card_client():
+    global _card_client, _card_client_transport
+
+    transport = get_transport()
+
+    # The client is bound to the session of a transport, so it is created again when the shared transport changes.
+    if _card_client is None or _card_client_transport is not transport:
+        with _card_client_lock:
+            if _card_client is None or _card_client_transport is not transport:
+                _card_client = _create_card_client(transport)
+                _card_client_transport = transport
+
+    return _card_client
+
+
+def _create_card_client(transport):
+    cache_path = os.path.join(get_cache_dir(), 'wsdl.sqlite')
+    cache = None
+
+    # While recording or replaying, the WSDL goes through the transport like the SOAP exchange itself.
+    if transport.archive is None:
+        try:
+            os.makedirs(get_cache_dir(), exist_ok=True)
+            cache = SqliteCache(path=cache_path, timeout=WSDL_CACHE_TIMEOUT)
+        except (OSError, sqlite3.Error):
+            cache = None
+
+    zeep_transport = _ThreadSessionZeepTransport(transport, cache=cache, timeout=transport.read_timeout,
+                                                 operation_timeout=transport.read_timeout)
+
+    return Client(Urls.CITRAM_CARD_SERVICE.value, transport=zeep_transport)
+
+
+class _ThreadSessionZeepTransport(ZeepTransport):
+    """
+    zeep transport that gives every thread a session of its own on the connection pools of a Transport, so a single
+    client (and its parsed WSDL) can be shared by concurrent card queries.
+    """
+
+    def __init__(self, transport, cache=None, timeout=300, operation_timeout=None):
+        self._transport = transport
+        self._local = threading.local()
+        self._configured_session = None
+
+        super().__init__(cache=cache, timeout=timeout, operation_timeout=operation_timeout,
+                         session=transport.new_session())
+
+    def _thread_session(self):
+        session = getattr(self._local, 'session', None)
+
+        if session is None:
+            session = self._local.session = self._transport.new_session()
+
+            # The same configuration zeep gave to the first session: its User-Agent and the adapters zeep mounts
+            # (i.e. file:// for local WSDLs).
+            session.headers.update(self._configured_session.headers)
+
+            for prefix, adapter in self._configured_session.adapters.items():
+                if prefix not in session.adapters:
+                    session.mount(prefix, adapter)
+
+        return session
+
+    @property
+    def session(self):
+        return self._thread_session()
+
+    @session.setter
+    def session(self, session):
+        # zeep sets the session once, on the thread creating the client, and then configures it.
+        self._configured_session = self._local.session = session
+
+
 def get_transport_modes():
     """
     Returns the transport modes available and their id.
@@ -112,6 +266,10 @@ def get_transport_modes():
             }
         }
     """
+    return common_request(_get_transport_modes_url())
+
+
+def _get_transport_modes_url():
     url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value + '/GetModes.php')
 
-    return common_request(url_formatted)
+    return url_formatted
@@ -1,8 +1,6 @@
-import requests
-
 from citram_api.constants.hosts import Urls
 from citram_api.utils.custom_exceptions import NotEnoughParametersException
-from citram_api.utils.utils import common_request
+from citram_api.utils.utils import common_request, stream_request
 
 
 def get_stops_by_cod_stop(cod_stop):
@@ -45,6 +43,10 @@ def get_stops_by_cod_stop(cod_stop):
             }
         }
     """
+    return common_request(_get_stops_by_cod_stop_url(cod_stop))
+
+
+def _get_stops_by_cod_stop_url(cod_stop):
     if cod_stop is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetStops.php?codStop={codStop}'
@@ -52,7 +54,7 @@ def get_stops_by_cod_stop(cod_stop):
     else:
         raise NotEnoughParametersException('You must specify a stop code.')
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_stops_by_custom_search(custom_search):
@@ -114,6 +116,10 @@ def get_stops_by_custom_search(custom_search):
             }
         }
     """
+    return common_request(_get_stops_by_custom_search_url(custom_search))
+
+
+def _get_stops_by_custom_search_url(custom_search):
     if custom_search is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetStops.php?customSearch={customSearch}'
@@ -121,7 +127,7 @@ def get_stops_by_custom_search(custom_search):
     else:
         raise NotEnoughParametersException('Introduce a valid string as a search.')
 
-    return common_request(url_formatted)
+    return url_formatted
 
 
 def get_stops_by_zip_code(postcode):
@@ -242,6 +248,10 @@ def get_stops_by_zip_code(postcode):
             }
         }
     """
+    return common_request(_get_stops_by_zip_code_url(postcode))
+
+
+def _get_stops_by_zip_code_url(postcode):
     if postcode is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetStops.php?postcode={postcode}'
@@ -249,9 +259,7 @@ def get_stops_by_zip_code(postcode):
     else:
         raise NotEnoughParametersException('You must specify a zip code.')
 
-    res = requests.get(url_formatted)
-
-    return res.json()
+    return url_formatted
 
 
 def get_stops_by_municipality(cod_municipality):
@@ -317,6 +325,10 @@ def get_stops_by_municipality(cod_municipality):
             }
         }
     """
+    return common_request(_get_stops_by_municipality_url(cod_municipality))
+
+
+def _get_stops_by_municipality_url(cod_municipality):
     if cod_municipality is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetStops.php?codMunicipality={codMunicipality}'
@@ -324,9 +336,43 @@ def get_stops_by_municipality(cod_municipality):
     else:
         raise NotEnoughParametersException('You must specify a municipality code.')
 
-    res = requests.get(url_formatted)
+    return url_formatted
+
 
-    return res.json()
+def iter_stops_by_zip_code(postcode):
+    """
+    Like get_stops_by_zip_code, but the response is parsed while it is received and the stops are yielded one by
+    one, so the whole response is never held in memory.
+
+    Example:
+
+    .. code-block:: python
+
+        for stop in iter_stops_by_zip_code(28004):
+            print(stop['codStop'], stop['name'])
+
+    :param int postcode: Zip code of the area to look for stops.
+    :return: Generator of stops, like the items of get_stops_by_zip_code(postcode)['stops']['Stop'].
+    """
+    return stream_request(_get_stops_by_zip_code_url(postcode), 'Stop')
+
+
+def iter_stops_by_municipality(cod_municipality):
+    """
+    Like get_stops_by_municipality, but the response is parsed while it is received and the stops are yielded one
+    by one, so the whole response is never held in memory.
+
+    Example:
+
+    .. code-block:: python
+
+        for stop in iter_stops_by_municipality(Municipalities.MADRID.value):
+            print(stop['codStop'], stop['name'])
+
+    :param int cod_municipality: Id of a municipality. Use constants.Municipalities to easily select municipality ids.
+    :return: Generator of stops, like the items of get_stops_by_municipality(cod_municipality)['stops']['Stop'].
+    """
+    return stream_request(_get_stops_by_municipality_url(cod_municipality), 'Stop')
 
 
 def get_stop_info(cod_stop):
@@ -371,6 +417,10 @@ def get_stop_info(cod_stop):
             }
         }
     """
+    return common_request(_get_stop_info_url(cod_stop))
+
+
+def _get_stop_info_url(cod_stop):
     if cod_stop is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetStops.php?codStop={codStop}'
@@ -378,9 +428,7 @@ def get_stop_info(cod_stop):
     else:
         raise NotEnoughParametersException('You must specify a stop code.')
 
-    res = requests.get(url_formatted)
-
-    return res.json()
+    return url_formatted
 
 
 def get_stop_times(cod_stop, stop_type, stop_times_by_iti, order_by=2):
@@ -508,6 +556,10 @@ def get_stop_times(cod_stop, stop_type, stop_times_by_iti, order_by=2):
             }
         }
     """
+    return common_request(_get_stop_times_url(cod_stop, stop_type, stop_times_by_iti, order_by))
+
+
+def _get_stop_times_url(cod_stop, stop_type, stop_times_by_iti, order_by=2):
     if cod_stop is not None and stop_type is not None and order_by is not None and stop_times_by_iti is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetStopsTimes.php?codStop={codStop}&type={stop_type}&orderBy={orderBy}&stopTimesByIti={stopTimesByIti}'
@@ -516,9 +568,7 @@ def get_stop_times(cod_stop, stop_type, stop_times_by_iti, order_by=2):
     else:
         raise NotEnoughParametersException('You must specify all the needed parameters.')
 
-    res = requests.get(url_formatted)
-
-    return res.json()
+    return url_formatted
 
 
 def get_nearest_stops(latitude, longitude, distance, method=2):
@@ -690,6 +740,10 @@ def get_nearest_stops(latitude, longitude, distance, method=2):
             }
         }
     """
+    return common_request(_get_nearest_stops_url(latitude, longitude, distance, method))
+
+
+def _get_nearest_stops_url(latitude, longitude, distance, method=2):
     if latitude is not None and longitude is not None and method is not None and distance is not None:
         url_formatted = (Urls.CITRAM_WIDGET_SERVICE.value +
                          '/GetNearestStopsByLocation.php?latitude={latitude}&longitude={longitude}&mode=&method={method}&precision={precision}'
@@ -698,4 +752,4 @@ def get_nearest_stops(latitude, longitude, distance, method=2):
     else:
         raise NotEnoughParametersException('You must specify all the needed parameters.')
 
-    return common_request(url_formatted)
+    return url_formatted
@@ -1,20 +1,53 @@
 import enum
 from enum import Enum
+import functools
+import json
+import os
 import re
-import unicodedata
+import threading
 
-from citram_api.api.others.others import get_transport_modes, get_municipalities
+from citram_api.utils.utils import fold, get_cache_dir
+
+
+_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+_TRANSPORT_MODES_SNAPSHOT = 'transport_modes.json'
+_MUNICIPALITIES_SNAPSHOT = 'municipalities.json'
+
+
+def _load_snapshot(file_name):
+    """
+    Snapshot stored by refresh_constants, or the one bundled with the package.
+    """
+    cached_path = os.path.join(get_cache_dir(), file_name)
+
+    if os.path.isfile(cached_path):
+        try:
+            with open(cached_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    with open(os.path.join(_SNAPSHOT_DIR, file_name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_snapshot(file_name, data):
+    cache_dir = get_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_path = os.path.join(cache_dir, file_name + '.tmp')
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    os.replace(tmp_path, os.path.join(cache_dir, file_name))
 
 
 def _create_dynamic_enum(func, key_1, key_2, name_key, value_key):
     aux = {}
 
     for mode in func()[key_1][key_2]:
-        name = mode[name_key].replace(' ', '_').replace(',', '').upper()
-
-        nfkd_form = unicodedata.normalize('NFKD', name)
-        name = nfkd_form.encode('ASCII', 'ignore').decode('UTF-8')
-
+        name = fold(mode[name_key].replace(' ', '_').replace(',', ''))
         name = re.sub('[^A-Z_]+', '_', name)
 
         aux[name] = int(mode[value_key])
@@ -22,11 +55,74 @@ def _create_dynamic_enum(func, key_1, key_2, name_key, value_key):
     return aux
 
 
-TransportModes = enum.Enum('TransportModes', _create_dynamic_enum(get_transport_modes, 'modes', 'Mode',
-                                                                  'name', 'codMode'))
+def _create_transport_modes(func):
+    return enum.Enum('TransportModes', _create_dynamic_enum(func, 'modes', 'Mode', 'name', 'codMode'),
+                     module=__name__)
+
+
+def _create_municipalities(func):
+    return enum.Enum('Municipalities', _create_dynamic_enum(func, 'municipalities', 'Municipality',
+                                                            'name', 'codMunicipality'),
+                     module=__name__)
+
+
+# Both enums are built from the snapshots bundled with the package (or the newer ones stored by refresh_constants),
+# so importing this module doesn't make any request.
+TransportModes = _create_transport_modes(functools.partial(_load_snapshot, _TRANSPORT_MODES_SNAPSHOT))
+
+_municipalities_lock = threading.Lock()
+
+
+def __getattr__(name):
+    # Municipalities is only built on first use, as most programs don't need its 179 members.
+    global Municipalities
+
+    if name != 'Municipalities':
+        raise AttributeError('module {} has no attribute {}'.format(__name__, name))
+
+    with _municipalities_lock:
+        if 'Municipalities' not in globals():
+            Municipalities = _create_municipalities(functools.partial(_load_snapshot, _MUNICIPALITIES_SNAPSHOT))
+
+    return Municipalities
+
+
+def refresh_constants():
+    """
+    Requests the current transport modes and municipalities to CRTM, stores them in the cache directory
+    (see utils.get_cache_dir) and rebuilds TransportModes and Municipalities. The stored snapshot is used from then
+    on, also by new processes.
+
+    Names imported before the refresh (i.e. from citram_api.constants.constants import TransportModes) keep pointing
+    to the previous enums.
+
+    Example:
+
+    .. code-block:: python
+
+        from citram_api.constants import constants
+
+        constants.refresh_constants()
+        constants.Municipalities.FUENLABRADA.value
+
+    :return tuple: The new TransportModes and Municipalities enums.
+    """
+    global TransportModes, Municipalities
+
+    from citram_api.api.others.others import get_transport_modes, get_municipalities
+
+    transport_modes = get_transport_modes()
+    municipalities = get_municipalities()
+
+    # Taken so a concurrent first use of Municipalities can't replace the refreshed enum with the old snapshot.
+    with _municipalities_lock:
+        TransportModes = _create_transport_modes(lambda: transport_modes)
+        Municipalities = _create_municipalities(lambda: municipalities)
+
+        _save_snapshot(_TRANSPORT_MODES_SNAPSHOT, transport_modes)
+        _save_snapshot(_MUNICIPALITIES_SNAPSHOT, municipalities)
 
-Municipalities = enum.Enum('Municipalities', _create_dynamic_enum(get_municipalities, 'municipalities', 'Municipality',
-                                                                  'name', 'codMunicipality'))
+        return TransportModes, Municipalities
 
 
 class OfficeTypes(Enum):
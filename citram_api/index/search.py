@@ -0,0 +1,324 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+import heapq
+import re
+import threading
+
+from citram_api.index.spatial import _get_stops_of_municipalities
+from citram_api.utils.utils import fold
+
+
+# Weight of a match in each field of a stop. Codes and post codes are matched as a whole.
+FIELD_WEIGHTS = (('name', 1.0), ('shortCodStop', 1.0), ('postCode', 0.8), ('address', 0.5))
+
+EXACT_SCORE = 1.0
+MIN_PREFIX_SCORE = 0.6
+MAX_PREFIX_SCORE = 0.9
+MAX_FUZZY_SCORE = 0.5
+MIN_SIMILARITY = 0.4
+
+# Prefixes whose shortest expansions are remembered, the most recently used ones.
+MAX_CACHED_EXPANSIONS = 4096
+
+# Rough number of words of a stop, to estimate the cost of matching a word through the words of some stops.
+_WORDS_PER_STOP = 10
+
+_WORD_SEPARATOR = re.compile('[^A-Z0-9]+')
+
+
+def _words(text):
+    return [word for word in _WORD_SEPARATOR.split(fold(str(text))) if word]
+
+
+def _trigrams(word):
+    padded = ' {} '.format(word)
+
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StopSearchIndex(object):
+    """
+    Local search index of stops by name, address, short code and post code, to answer custom searches (i.e. an
+    autocomplete box) without requesting them to CRTM.
+
+    Texts are folded (upper case, without accents) and split in words. Every word of the query must match a word of
+    the stop: exactly, as a prefix (so the last word can be incomplete while typing) or, for words of three letters
+    or more that match nothing else, approximately, by the trigrams both words share (so typos are forgiven).
+    Stops are ranked by the quality of their matches, weighted by the field matched (see FIELD_WEIGHTS).
+
+    Example:
+
+    .. code-block:: python
+
+        index = StopSearchIndex.from_municipalities()
+        index.get_stops_by_custom_search('tres agu', modes=[TransportModes.METRO.value])
+
+    :param list stops: Stop records, like the ones returned by the stops functions. Repeated stops are only indexed
+                       once.
+    :param int max_expansions: Maximum number of words a prefix or a misspelled word is expanded to. The shortest
+                               words are preferred. Optional, default: 50.
+    """
+
+    def __init__(self, stops, max_expansions=50):
+        self.max_expansions = max_expansions
+
+        unique_stops = {}
+
+        for stop in stops:
+            unique_stops.setdefault(stop.get('codStop'), stop)
+
+        self.stops = list(unique_stops.values())
+        self._modes = [str(stop.get('codMode')) for stop in self.stops]
+        self._municipalities = [str(stop.get('codMunicipality')) for stop in self.stops]
+        self._name_lengths = array('i', (len(stop.get('name') or '') for stop in self.stops))
+
+        weights_by_word = {}
+
+        for position, stop in enumerate(self.stops):
+            for field, weight in FIELD_WEIGHTS:
+                value = stop.get(field)
+
+                if value is None or value == '':
+                    continue
+
+                words = _words(value) if field in ('name', 'address') else [fold(str(value))]
+
+                for word in words:
+                    postings = weights_by_word.setdefault(word, {})
+
+                    if postings.get(position, 0) < weight:
+                        postings[position] = weight
+
+        self._words = sorted(weights_by_word)
+        self._postings = []
+        self._stop_words = [{} for _ in self.stops]
+        self._trigram_words = {}
+        self._expansions = OrderedDict()
+        self._expansions_lock = threading.Lock()
+        name_lengths = self._name_lengths
+
+        for word_id, word in enumerate(self._words):
+            # Postings are kept in ranking order, so a query of one word can stop after the first results.
+            postings = sorted(weights_by_word[word].items(),
+                              key=lambda item: (-item[1], name_lengths[item[0]], item[0]))
+            self._postings.append((array('i', (position for position, _ in postings)),
+                                   array('d', (weight for _, weight in postings))))
+
+            for position, weight in postings:
+                self._stop_words[position][word_id] = weight
+
+            for trigram in _trigrams(word):
+                self._trigram_words.setdefault(trigram, []).append(word_id)
+
+    def __len__(self):
+        return len(self.stops)
+
+    @classmethod
+    def from_municipalities(cls, cod_municipalities=None, max_workers=8, max_expansions=50):
+        """
+        Builds the index with the stops of every municipality, requesting them concurrently. Enabling the catalog
+        cache (see utils.catalog_cache) avoids downloading them again on every process start.
+
+        :param list cod_municipalities: Municipality ids. Optional, default: None (every municipality in
+                                        constants.Municipalities).
+        :param int max_workers: Maximum number of requests running at the same time. Optional, default: 8.
+        :param int max_expansions: See StopSearchIndex. Optional, default: 50.
+        :return StopSearchIndex: The index.
+        """
+        return cls(_get_stops_of_municipalities(cod_municipalities, max_workers), max_expansions=max_expansions)
+
+    def _shortest_expansions(self, word, prefixed):
+        with self._expansions_lock:
+            shortest = self._expansions.get(word)
+
+            if shortest is not None:
+                self._expansions.move_to_end(word)
+
+                return shortest
+
+        words = self._words
+        shortest = heapq.nsmallest(self.max_expansions, prefixed, key=lambda word_id: len(words[word_id]))
+
+        with self._expansions_lock:
+            self._expansions[word] = shortest
+
+            while len(self._expansions) > MAX_CACHED_EXPANSIONS:
+                self._expansions.popitem(last=False)
+
+        return shortest
+
+    def _candidates(self, word):
+        """
+        Words of the index matching a word of a query, with the score of the match.
+        """
+        words = self._words
+        candidates = {}
+        start = bisect_left(words, word)
+        end = bisect_left(words, word + '\x7f', start)
+
+        if start < end and words[start] == word:
+            candidates[start] = EXACT_SCORE
+            start += 1
+
+        prefixed = range(start, end)
+
+        if len(prefixed) > self.max_expansions:
+            # Short prefixes match many words, so their shortest ones are only chosen once.
+            prefixed = self._shortest_expansions(word, prefixed)
+
+        for word_id in prefixed:
+            # The more of the word is typed, the better the match.
+            candidates[word_id] = (MIN_PREFIX_SCORE +
+                                   (MAX_PREFIX_SCORE - MIN_PREFIX_SCORE) * len(word) / len(words[word_id]))
+
+        if not candidates and len(word) >= 3:
+            trigrams = _trigrams(word)
+            shared = {}
+
+            for trigram in trigrams:
+                for word_id in self._trigram_words.get(trigram, ()):
+                    shared[word_id] = shared.get(word_id, 0) + 1
+
+            similar = []
+
+            for word_id, count in shared.items():
+                # Dice coefficient of the trigrams of both words. A word of n letters has about n trigrams.
+                similarity = 2.0 * count / (len(trigrams) + len(words[word_id]))
+
+                if similarity >= MIN_SIMILARITY:
+                    similar.append((similarity, word_id))
+
+            for similarity, word_id in heapq.nlargest(self.max_expansions, similar):
+                candidates[word_id] = MAX_FUZZY_SCORE * similarity
+
+        return candidates
+
+    def _scores(self, candidates, allowed):
+        scores = {}
+
+        for word_id, word_score in candidates.items():
+            positions, weights = self._postings[word_id]
+
+            for position, weight in zip(positions, weights):
+                if allowed is not None and not allowed(position):
+                    continue
+
+                score = word_score * weight
+
+                if scores.get(position, 0) < score:
+                    scores[position] = score
+
+        return scores
+
+    def _scores_of_stops(self, candidates, positions):
+        scores = {}
+
+        for position in positions:
+            best = 0
+
+            for word_id, weight in self._stop_words[position].items():
+                word_score = candidates.get(word_id)
+
+                if word_score is not None and word_score * weight > best:
+                    best = word_score * weight
+
+            if best > 0:
+                scores[position] = best
+
+        return scores
+
+    def _best(self, candidates, allowed, limit):
+        """
+        Best stops matching a single word. The postings of every candidate word are merged in ranking order until
+        there are enough stops.
+        """
+        postings, name_lengths = self._postings, self._name_lengths
+        heap = [(-word_score * postings[word_id][1][0], name_lengths[postings[word_id][0][0]], postings[word_id][0][0],
+                 word_id, 0) for word_id, word_score in candidates.items()]
+        heapq.heapify(heap)
+        seen, results = set(), []
+
+        while heap and len(results) < limit:
+            score, _, position, word_id, i = heapq.heappop(heap)
+            positions, weights = postings[word_id]
+
+            if i + 1 < len(positions):
+                heapq.heappush(heap, (-candidates[word_id] * weights[i + 1], name_lengths[positions[i + 1]],
+                                      positions[i + 1], word_id, i + 1))
+
+            if position not in seen and (allowed is None or allowed(position)):
+                seen.add(position)
+                results.append((position, -score))
+
+        return results
+
+    def search(self, query, limit=10, modes=None, cod_municipalities=None):
+        """
+        Stops matching a text, best matches first.
+
+        :param str query: Text to search, i.e. 'tres aguas', 'castellana 10' or '28046'.
+        :param int limit: Maximum number of stops to return. Optional, default: 10.
+        :param list modes: If set, only stops of these transport modes are returned. Optional, default: None.
+        :param list cod_municipalities: If set, only stops of these municipalities are returned. Optional,
+                                        default: None.
+        :return list: Tuples of score and stop record.
+        """
+        words = _words(query or '')
+
+        if not words or limit <= 0:
+            return []
+
+        modes = None if modes is None else {str(mode) for mode in modes}
+        cod_municipalities = None if cod_municipalities is None else {str(cod) for cod in cod_municipalities}
+        allowed = None
+
+        if modes is not None or cod_municipalities is not None:
+            def allowed(position):
+                return ((modes is None or self._modes[position] in modes) and
+                        (cod_municipalities is None or self._municipalities[position] in cod_municipalities))
+
+        candidates = [self._candidates(word) for word in words]
+
+        if not all(candidates):
+            return []
+
+        if len(candidates) == 1:
+            best = self._best(candidates[0], allowed, limit)
+        else:
+            # The word with the fewest postings scores its stops. Every other word is matched either through its
+            # postings or through the words of those stops, whichever is less work.
+            costs = [sum(len(self._postings[word_id][0]) for word_id in word_candidates)
+                     for word_candidates in candidates]
+            order = sorted(range(len(candidates)), key=costs.__getitem__)
+            scores = self._scores(candidates[order[0]], allowed)
+
+            for i in order[1:]:
+                if costs[i] < len(scores) * _WORDS_PER_STOP:
+                    word_scores = self._scores(candidates[i], scores.__contains__)
+                else:
+                    word_scores = self._scores_of_stops(candidates[i], scores)
+
+                scores = {position: score + word_scores[position]
+                          for position, score in scores.items() if position in word_scores}
+
+            name_lengths = self._name_lengths
+            best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], name_lengths[item[0]], item[0]))
+
+        return [(score, self.stops[position]) for position, score in best]
+
+    def get_stops_by_custom_search(self, custom_search, limit=10, modes=None, cod_municipalities=None):
+        """
+        Stops matching a text, best matches first. It is the local counterpart of stops.get_stops_by_custom_search.
+
+        :param str custom_search: Text to search.
+        :param int limit: Maximum number of stops to return. Optional, default: 10.
+        :param list modes: If set, only stops of these transport modes are returned. Optional, default: None.
+        :param list cod_municipalities: If set, only stops of these municipalities are returned. Optional,
+                                        default: None.
+        :return dict: The stops found, with the same shape as stops.get_stops_by_custom_search:
+                      {'stops': {'Stop': [...]}}
+        """
+        results = self.search(custom_search, limit=limit, modes=modes, cod_municipalities=cod_municipalities)
+
+        return {'stops': {'Stop': [stop for _, stop in results]}}
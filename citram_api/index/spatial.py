@@ -0,0 +1,520 @@
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import math
+import threading
+import time
+
+from citram_api.api.offices.offices import get_offices_by_type
+from citram_api.api.stops.stops import get_stops_by_municipality
+from citram_api.utils.scheduler import BULK, priority
+from citram_api.utils.utils import as_list
+
+
+METERS_PER_DEGREE = 111320.0
+
+# Latitude of Madrid, used to project coordinates to meters. The error it introduces is negligible within the
+# area covered by CRTM.
+DEFAULT_REFERENCE_LATITUDE = 40.4168
+
+
+def _coordinates(record):
+    coordinates = record.get('coordinates') or {}
+
+    try:
+        return float(coordinates['latitude']), float(coordinates['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class GridIndex(object):
+    """
+    Spatial index of records with coordinates (i.e. stops or offices) for radius and k-nearest queries.
+
+    Coordinates are projected to meters around a reference latitude and bucketed in a grid of square cells, so a
+    query only measures the records of the cells around the given point. Records without valid coordinates are
+    left out.
+
+    :param list records: Records with a 'coordinates' dict holding 'latitude' and 'longitude'.
+    :param float cell_size: Side of the grid cells in meters. Optional, default: 250.
+    :param float reference_latitude: Latitude used for the projection. Optional, default: Madrid's.
+    """
+
+    def __init__(self, records, cell_size=250.0, reference_latitude=DEFAULT_REFERENCE_LATITUDE):
+        self.cell_size = float(cell_size)
+        self._x_scale = METERS_PER_DEGREE * math.cos(math.radians(reference_latitude))
+
+        self.records = []
+        self._xs = array('d')
+        self._ys = array('d')
+        self._cells = {}
+
+        for record in records:
+            coordinates = _coordinates(record)
+
+            if coordinates is None:
+                continue
+
+            x, y = self._project(*coordinates)
+            position = len(self.records)
+
+            self.records.append(record)
+            self._xs.append(x)
+            self._ys.append(y)
+            self._cells.setdefault(self._cell(x, y), []).append(position)
+
+        if self._cells:
+            self._bounds = (min(i for i, _ in self._cells), max(i for i, _ in self._cells),
+                            min(j for _, j in self._cells), max(j for _, j in self._cells))
+
+    def __len__(self):
+        return len(self.records)
+
+    def _project(self, latitude, longitude):
+        return longitude * self._x_scale, latitude * METERS_PER_DEGREE
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _ring(self, cell, radius):
+        i, j = cell
+
+        if radius == 0:
+            yield cell
+            return
+
+        for di in range(-radius, radius + 1):
+            yield i + di, j - radius
+            yield i + di, j + radius
+
+        for dj in range(-radius + 1, radius):
+            yield i - radius, j + dj
+            yield i + radius, j + dj
+
+    def within(self, latitude, longitude, distance, predicate=None):
+        """
+        Records within a distance of a point, nearest first.
+
+        :param float latitude: Latitude.
+        :param float longitude: Longitude.
+        :param float distance: Maximum distance in meters.
+        :param predicate: Function receiving a record and returning whether it can be part of the results.
+                          Optional, default: None (every record).
+        :return list: Tuples of distance in meters and record.
+        """
+        x, y = self._project(latitude, longitude)
+        i_0, j_0 = self._cell(x - distance, y - distance)
+        i_1, j_1 = self._cell(x + distance, y + distance)
+        max_squared = distance * distance
+
+        xs, ys, records = self._xs, self._ys, self.records
+        results = []
+
+        for i in range(i_0, i_1 + 1):
+            for j in range(j_0, j_1 + 1):
+                for position in self._cells.get((i, j), ()):
+                    dx = xs[position] - x
+                    dy = ys[position] - y
+                    squared = dx * dx + dy * dy
+
+                    if squared <= max_squared and (predicate is None or predicate(records[position])):
+                        results.append((squared, position))
+
+        results.sort()
+
+        return [(math.sqrt(squared), records[position]) for squared, position in results]
+
+    def nearest(self, latitude, longitude, k, max_distance=None, predicate=None):
+        """
+        The k records nearest to a point, nearest first.
+
+        :param float latitude: Latitude.
+        :param float longitude: Longitude.
+        :param int k: Number of records to return.
+        :param float max_distance: If set, records further than this distance in meters are left out.
+                                   Optional, default: None.
+        :param predicate: Function receiving a record and returning whether it can be part of the results.
+                          Optional, default: None (every record).
+        :return list: Tuples of distance in meters and record.
+        """
+        if k <= 0 or not self._cells:
+            return []
+
+        x, y = self._project(latitude, longitude)
+        cell = self._cell(x, y)
+        xs, ys, records = self._xs, self._ys, self.records
+
+        min_i, max_i, min_j, max_j = self._bounds
+        max_radius = max(abs(cell[0] - min_i), abs(cell[0] - max_i), abs(cell[1] - min_j), abs(cell[1] - max_j))
+
+        if max_distance is not None:
+            max_radius = min(max_radius, int(max_distance // self.cell_size) + 1)
+
+        heap = []
+
+        for radius in range(max_radius + 1):
+            # Every record outside the rings seen so far is at least this far away.
+            if len(heap) == k and -heap[0][0] <= (radius - 1) * self.cell_size:
+                break
+
+            for ring_cell in self._ring(cell, radius):
+                for position in self._cells.get(ring_cell, ()):
+                    dx = xs[position] - x
+                    dy = ys[position] - y
+                    distance = math.sqrt(dx * dx + dy * dy)
+
+                    if max_distance is not None and distance > max_distance:
+                        continue
+
+                    if len(heap) == k and distance >= -heap[0][0]:
+                        continue
+
+                    if predicate is not None and not predicate(records[position]):
+                        continue
+
+                    if len(heap) == k:
+                        heapq.heapreplace(heap, (-distance, position))
+                    else:
+                        heapq.heappush(heap, (-distance, position))
+
+        return [(-distance, records[position]) for distance, position in sorted(heap, reverse=True)]
+
+
+def _stop_predicate(modes, access, night_lines_service):
+    if modes is None and access is None and night_lines_service is None:
+        return None
+
+    modes = None if modes is None else {str(mode) for mode in modes}
+
+    def predicate(stop):
+        if modes is not None and str(stop.get('codMode')) not in modes:
+            return False
+
+        if access is not None and (int(stop.get('access') or 0) > 0) != access:
+            return False
+
+        if night_lines_service is not None and (int(stop.get('nightLinesService') or 0) > 0) != night_lines_service:
+            return False
+
+        return True
+
+    return predicate
+
+
+def _get_stops_in_bulk(cod_municipality):
+    with priority(BULK):
+        return get_stops_by_municipality(cod_municipality)
+
+
+def _get_stops_of_municipalities(cod_municipalities=None, max_workers=8):
+    if cod_municipalities is None:
+        from citram_api.constants.constants import Municipalities
+
+        cod_municipalities = [municipality.value for municipality in Municipalities]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = list(executor.map(_get_stops_in_bulk, cod_municipalities))
+
+    return [stop for response in responses for stop in as_list(((response or {}).get('stops') or {}).get('Stop'))]
+
+
+class StopIndex(GridIndex):
+    """
+    Local spatial index of stops, to answer nearest stop queries without requesting them to CRTM.
+
+    Example:
+
+    .. code-block:: python
+
+        index = StopIndex.from_municipalities()
+        index.get_nearest_stops(40.453053, -3.688344, 500.0, modes=[TransportModes.METRO.value])
+        index.get_k_nearest_stops(40.453053, -3.688344, 5, access=True)
+
+    :param list stops: Stop records, like the ones returned by the stops functions. Repeated stops are only indexed
+                       once.
+    :param float cell_size: Side of the grid cells in meters. Optional, default: 250.
+    """
+
+    def __init__(self, stops, cell_size=250.0):
+        unique_stops = {}
+
+        for stop in stops:
+            unique_stops.setdefault(stop.get('codStop'), stop)
+
+        super().__init__(unique_stops.values(), cell_size=cell_size)
+
+    @classmethod
+    def from_municipalities(cls, cod_municipalities=None, max_workers=8, cell_size=250.0):
+        """
+        Builds the index with the stops of every municipality, requesting them concurrently. Enabling the catalog
+        cache (see utils.catalog_cache) avoids downloading them again on every process start.
+
+        :param list cod_municipalities: Municipality ids. Optional, default: None (every municipality in
+                                        constants.Municipalities).
+        :param int max_workers: Maximum number of requests running at the same time. Optional, default: 8.
+        :param float cell_size: Side of the grid cells in meters. Optional, default: 250.
+        :return StopIndex: The index.
+        """
+        return cls(_get_stops_of_municipalities(cod_municipalities, max_workers), cell_size=cell_size)
+
+    def get_nearest_stops(self, latitude, longitude, distance, modes=None, access=None, night_lines_service=None):
+        """
+        Stops within a distance of a point, nearest first. It is the local counterpart of
+        stops.get_nearest_stops.
+
+        :param float latitude: Latitude.
+        :param float longitude: Longitude.
+        :param float distance: Distance in meters from the point specified to find stops.
+        :param list modes: If set, only stops of these transport modes are returned. Optional, default: None.
+        :param bool access: If set, only stops that are (True) or aren't (False) adapted. Optional, default: None.
+        :param bool night_lines_service: If set, only stops with (True) or without (False) night service.
+                                         Optional, default: None.
+        :return dict: The stops found, with the same shape as stops.get_nearest_stops: {'stops': {'Stop': [...]}}
+        """
+        results = self.within(latitude, longitude, distance,
+                              predicate=_stop_predicate(modes, access, night_lines_service))
+
+        return {'stops': {'Stop': [stop for _, stop in results]}}
+
+    def get_k_nearest_stops(self, latitude, longitude, k, max_distance=None, modes=None, access=None,
+                            night_lines_service=None):
+        """
+        The k stops nearest to a point, nearest first.
+
+        :param float latitude: Latitude.
+        :param float longitude: Longitude.
+        :param int k: Number of stops to return.
+        :param float max_distance: If set, stops further than this distance in meters are left out.
+                                   Optional, default: None.
+        :param list modes: If set, only stops of these transport modes are returned. Optional, default: None.
+        :param bool access: If set, only stops that are (True) or aren't (False) adapted. Optional, default: None.
+        :param bool night_lines_service: If set, only stops with (True) or without (False) night service.
+                                         Optional, default: None.
+        :return dict: The stops found, with the same shape as stops.get_nearest_stops: {'stops': {'Stop': [...]}}
+        """
+        results = self.nearest(latitude, longitude, k, max_distance=max_distance,
+                               predicate=_stop_predicate(modes, access, night_lines_service))
+
+        return {'stops': {'Stop': [stop for _, stop in results]}}
+
+
+def _get_offices_in_bulk(offices_type):
+    with priority(BULK):
+        return get_offices_by_type(offices_type)
+
+
+class OfficeIndex(GridIndex):
+    """
+    Local spatial index of offices, to find the offices near a point without requesting them to CRTM by zip code or
+    municipality.
+
+    The type field of the office records doesn't hold the values of constants.OfficeTypes, so the offices are given
+    by the type they were requested with.
+
+    Example:
+
+    .. code-block:: python
+
+        index = OfficeIndex.from_types()
+        index.get_k_nearest_offices(40.453053, -3.688344, 3, offices_type=OfficeTypes.RECARGA.value)
+
+    :param dict offices_by_type: Office records by office type, as returned by offices.get_offices_by_type.
+                                 Repeated offices are only indexed once.
+    :param float cell_size: Side of the grid cells in meters. Optional, default: 250.
+    """
+
+    def __init__(self, offices_by_type, cell_size=250.0):
+        unique_offices, office_types = {}, {}
+
+        for offices_type, offices in offices_by_type.items():
+            for office in offices:
+                unique_offices.setdefault(office.get('codOffice'), office)
+                office_types.setdefault(office.get('codOffice'), set()).add(str(offices_type))
+
+        self._office_types = {cod_office: frozenset(types) for cod_office, types in office_types.items()}
+
+        super().__init__(unique_offices.values(), cell_size=cell_size)
+
+    @classmethod
+    def from_types(cls, offices_types=None, cell_size=250.0):
+        """
+        Builds the index with the offices of every type, requesting them concurrently.
+
+        :param list offices_types: Office types. Optional, default: None (every type in constants.OfficeTypes).
+        :param float cell_size: Side of the grid cells in meters. Optional, default: 250.
+        :return OfficeIndex: The index.
+        """
+        if offices_types is None:
+            from citram_api.constants.constants import OfficeTypes
+
+            offices_types = [offices_type.value for offices_type in OfficeTypes]
+
+        with ThreadPoolExecutor(max_workers=len(offices_types) or 1) as executor:
+            responses = list(executor.map(_get_offices_in_bulk, offices_types))
+
+        return cls({offices_type: as_list(((response or {}).get('offices') or {}).get('Office'))
+                    for offices_type, response in zip(offices_types, responses)}, cell_size=cell_size)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, cell_size=250.0):
+        """
+        Builds the index with the offices of a network.snapshot.NetworkSnapshot.
+
+        :param NetworkSnapshot snapshot: Snapshot with the offices of every type.
+        :param float cell_size: Side of the grid cells in meters. Optional, default: 250.
+        :return OfficeIndex: The index.
+        """
+        return cls(snapshot.offices, cell_size=cell_size)
+
+    def _predicate(self, offices_type):
+        if offices_type is None:
+            return None
+
+        offices_type = str(offices_type)
+
+        return lambda office: offices_type in self._office_types.get(office.get('codOffice'), ())
+
+    def get_nearest_offices(self, latitude, longitude, distance, offices_type=None):
+        """
+        Offices within a distance of a point, nearest first.
+
+        :param float latitude: Latitude.
+        :param float longitude: Longitude.
+        :param float distance: Distance in meters from the point specified to find offices.
+        :param str offices_type: If set, only offices of this type are returned. Use constants.OfficeTypes to choose
+                                 the available types easily. Optional, default: None.
+        :return dict: The offices found, with the same shape as offices.get_offices_by_type:
+                      {'offices': {'Office': [...]}}
+        """
+        results = self.within(latitude, longitude, distance, predicate=self._predicate(offices_type))
+
+        return {'offices': {'Office': [office for _, office in results]}}
+
+    def get_k_nearest_offices(self, latitude, longitude, k, max_distance=None, offices_type=None):
+        """
+        The k offices nearest to a point, nearest first.
+
+        :param float latitude: Latitude.
+        :param float longitude: Longitude.
+        :param int k: Number of offices to return.
+        :param float max_distance: If set, offices further than this distance in meters are left out.
+                                   Optional, default: None.
+        :param str offices_type: If set, only offices of this type are returned. Use constants.OfficeTypes to choose
+                                 the available types easily. Optional, default: None.
+        :return dict: The offices found, with the same shape as offices.get_offices_by_type:
+                      {'offices': {'Office': [...]}}
+        """
+        results = self.nearest(latitude, longitude, k, max_distance=max_distance,
+                               predicate=self._predicate(offices_type))
+
+        return {'offices': {'Office': [office for _, office in results]}}
+
+
+class OfficeLocator(object):
+    """
+    Nearest office queries on an OfficeIndex that is rebuilt in the background, so the offices catalog stays up to
+    date without making the queries wait for it. A failed refresh keeps the previous index and is retried after
+    retry_interval.
+
+    Example:
+
+    .. code-block:: python
+
+        locator = OfficeLocator(refresh_interval=6 * 3600).start()
+        locator.get_k_nearest_offices(40.453053, -3.688344, 3, offices_type=OfficeTypes.RECARGA.value)
+        locator.stop()
+
+    :param float refresh_interval: Seconds between refreshes of the index. Optional, default: 24 hours.
+    :param float retry_interval: Seconds before retrying a failed refresh. Optional, default: 5 minutes.
+    :param OfficeIndex index: Initial index, i.e. OfficeIndex.from_snapshot(snapshot). Optional, default: None
+                              (it is built when the locator starts).
+    :param float cell_size: Side of the grid cells in meters. Optional, default: 250.
+    """
+
+    def __init__(self, refresh_interval=24 * 3600, retry_interval=300, index=None, cell_size=250.0):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.cell_size = cell_size
+
+        self.index = index
+        self.refreshed_at = None if index is None else time.time()
+        self.refreshes = 0
+        self.failed_refreshes = 0
+        self.last_error = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """
+        Requests the offices catalog and replaces the index. Queries running meanwhile use the previous one.
+
+        :return OfficeIndex: The new index.
+        """
+        index = OfficeIndex.from_types(cell_size=self.cell_size)
+
+        self.index = index
+        self.refreshed_at = time.time()
+        self.refreshes += 1
+
+        return index
+
+    def _run(self):
+        delay = self.refresh_interval
+
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+                delay = self.refresh_interval
+            except Exception as e:
+                self.failed_refreshes += 1
+                self.last_error = e
+                delay = self.retry_interval
+
+    def start(self):
+        """
+        Builds the index if there isn't one yet, and starts refreshing it in a background thread.
+
+        :return OfficeLocator: The locator itself.
+        """
+        if self.index is None:
+            self.refresh()
+
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='citram-office-locator', daemon=True)
+            self._thread.start()
+
+        return self
+
+    def stop(self):
+        """
+        Stops refreshing the index. The last index is still used by the queries.
+        """
+        self._stop.set()
+
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+        self._thread = None
+
+    def _current_index(self):
+        index = self.index
+
+        if index is None:
+            raise RuntimeError('The office locator has no index yet, call start or refresh first.')
+
+        return index
+
+    def get_nearest_offices(self, latitude, longitude, distance, offices_type=None):
+        """
+        Offices within a distance of a point, nearest first. See OfficeIndex.get_nearest_offices.
+        """
+        return self._current_index().get_nearest_offices(latitude, longitude, distance, offices_type=offices_type)
+
+    def get_k_nearest_offices(self, latitude, longitude, k, max_distance=None, offices_type=None):
+        """
+        The k offices nearest to a point, nearest first. See OfficeIndex.get_k_nearest_offices.
+        """
+        return self._current_index().get_k_nearest_offices(latitude, longitude, k, max_distance=max_distance,
+                                                           offices_type=offices_type)
@@ -0,0 +1,275 @@
+from array import array
+import re
+import threading
+
+from citram_api.api.offices import offices
+from citram_api.api.stops import stops
+from citram_api.utils.utils import as_list
+
+
+# Office records have no post code field, but their address ends with it, i.e. 'Plaza de la Moncloa, 1. 28008 Madrid'.
+_POST_CODE = re.compile(r'\b(\d{5})\b')
+
+
+def _office_post_code(office):
+    post_codes = _POST_CODE.findall(office.get('address') or '')
+
+    return post_codes[-1] if post_codes else None
+
+
+def _covers_every_municipality(snapshot, by_municipality):
+    """
+    Whether a snapshot has the records of every municipality of CRTM, so a query across municipalities (i.e. by post
+    code) is answered completely.
+    """
+    cod_municipalities = {str(municipality.get('codMunicipality')) for municipality in snapshot.municipalities or ()}
+
+    return bool(cod_municipalities) and cod_municipalities <= {str(cod) for cod in by_municipality}
+
+
+class _HashIndex(object):
+    """
+    Positions of records in a list by the value of a field, compared as strings.
+    """
+
+    def __init__(self, keys):
+        positions = {}
+
+        for position, key in enumerate(keys):
+            if key is not None and key != '':
+                positions.setdefault(str(key), []).append(position)
+
+        self._positions = {key: array('i', values) for key, values in positions.items()}
+
+    def __contains__(self, key):
+        return str(key) in self._positions
+
+    def get(self, key):
+        return self._positions.get(str(key), ())
+
+
+class IndexedStore(object):
+    """
+    In-memory copy of the stops and offices of a NetworkSnapshot, with hash indexes by post code, municipality,
+    transport mode and office type, to answer the stops and offices queries without requesting them to CRTM.
+
+    The methods take the same arguments and return the same shape as the functions of citram_api.api. Queries for a
+    value that isn't in the store (i.e. a municipality missing from the snapshot) are requested to CRTM, unless
+    fallback is disabled. A post code can span several municipalities, so post code queries are only answered by the
+    store when the snapshot has every municipality. Stops can also be filtered by transport mode.
+
+    Example:
+
+    .. code-block:: python
+
+        store = IndexedStore(NetworkSnapshot.load('network.json.gz'))
+        store.get_stops_by_zip_code(28922, cod_mode=TransportModes.METRO.value)
+        store.get_offices_by_municipality(Municipalities.FUENLABRADA.value, OfficeTypes.OFICINA.value)
+
+    :param NetworkSnapshot snapshot: Snapshot with the stops and offices of the municipalities.
+    :param bool fallback: Whether queries missing from the store are requested to CRTM. Optional, default: True.
+    """
+
+    def __init__(self, snapshot, fallback=True):
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+        unique_stops = {}
+
+        for municipality_stops in snapshot.municipality_stops.values():
+            for stop in municipality_stops:
+                unique_stops.setdefault(stop.get('codStop'), stop)
+
+        self.stops = list(unique_stops.values())
+        self._all_stops = _covers_every_municipality(snapshot, snapshot.municipality_stops)
+        self._stops_by_post_code = _HashIndex(stop.get('postCode') for stop in self.stops)
+        self._stops_by_mode = _HashIndex(stop.get('codMode') for stop in self.stops)
+        self._stop_modes = [str(stop.get('codMode')) for stop in self.stops]
+
+        # Municipalities in the snapshot without stops are known to have none.
+        positions = {stop.get('codStop'): position for position, stop in enumerate(self.stops)}
+        self._stops_by_municipality = {str(cod_municipality): array('i', (positions[stop.get('codStop')]
+                                                                          for stop in municipality_stops))
+                                       for cod_municipality, municipality_stops
+                                       in snapshot.municipality_stops.items()}
+
+        unique_offices = {}
+        office_types = {}
+
+        for offices_type, type_offices in snapshot.offices.items():
+            for office in type_offices:
+                unique_offices.setdefault(office.get('codOffice'), office)
+                office_types.setdefault(office.get('codOffice'), set()).add(offices_type)
+
+        for municipality_offices in snapshot.municipality_offices.values():
+            for office in municipality_offices:
+                unique_offices.setdefault(office.get('codOffice'), office)
+
+        self.offices = list(unique_offices.values())
+        self._all_offices = _covers_every_municipality(snapshot, snapshot.municipality_offices)
+        positions = {office.get('codOffice'): position for position, office in enumerate(self.offices)}
+        self._offices_by_post_code = _HashIndex(_office_post_code(office) for office in self.offices)
+        self._offices_by_municipality = {str(cod_municipality): array('i', (positions[office.get('codOffice')]
+                                                                            for office in municipality_offices))
+                                         for cod_municipality, municipality_offices
+                                         in snapshot.municipality_offices.items()}
+
+        # Record types don't match the values of OfficeTypes, so types come from the query that returned them.
+        self._offices_by_type = {offices_type: array('i', sorted({positions[office.get('codOffice')]
+                                                                  for office in type_offices}))
+                                 for offices_type, type_offices in snapshot.offices.items()}
+        self._office_types = [frozenset(office_types.get(office.get('codOffice'), ())) for office in self.offices]
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _stops(self, positions, cod_mode):
+        if cod_mode is not None:
+            cod_mode = str(cod_mode)
+            positions = [position for position in positions if self._stop_modes[position] == cod_mode]
+
+        return {'stops': {'Stop': [self.stops[position] for position in positions]}}
+
+    def _offices(self, positions, offices_type):
+        if offices_type is not None:
+            offices_type = str(offices_type)
+            positions = [position for position in positions if offices_type in self._office_types[position]]
+
+        return {'offices': {'Office': [self.offices[position] for position in positions]}}
+
+    def _miss(self, request, *args):
+        self._count(False)
+
+        if not self.fallback:
+            return None
+
+        return request(*args)
+
+    def get_stops_by_zip_code(self, postcode, cod_mode=None):
+        """
+        Stops of a zip code. It is the local counterpart of stops.get_stops_by_zip_code.
+
+        :param int postcode: Zip code from where the stops are going to be retrieved.
+        :param int cod_mode: If set, only stops of this transport mode are returned. Optional, default: None.
+        :return dict: The stops, with the same shape as stops.get_stops_by_zip_code: {'stops': {'Stop': [...]}}.
+                      None if the zip code isn't in the store (or the store lacks some municipality) and fallback is
+                      disabled.
+        """
+        if self._all_stops and postcode in self._stops_by_post_code:
+            self._count(True)
+
+            return self._stops(self._stops_by_post_code.get(postcode), cod_mode)
+
+        response = self._miss(stops.get_stops_by_zip_code, postcode)
+
+        return response if response is None or cod_mode is None else _filter_stops(response, cod_mode)
+
+    def get_stops_by_municipality(self, cod_municipality, cod_mode=None):
+        """
+        Stops of a municipality. It is the local counterpart of stops.get_stops_by_municipality.
+
+        :param int cod_municipality: Id of a municipality. Use constants.Municipalities to easily select it.
+        :param int cod_mode: If set, only stops of this transport mode are returned. Optional, default: None.
+        :return dict: The stops, with the same shape as stops.get_stops_by_municipality: {'stops': {'Stop': [...]}}.
+                      None if the municipality isn't in the store and fallback is disabled.
+        """
+        positions = self._stops_by_municipality.get(str(cod_municipality))
+
+        if positions is not None:
+            self._count(True)
+
+            return self._stops(positions, cod_mode)
+
+        response = self._miss(stops.get_stops_by_municipality, cod_municipality)
+
+        return response if response is None or cod_mode is None else _filter_stops(response, cod_mode)
+
+    def get_stops_by_mode(self, cod_mode):
+        """
+        Stops of a transport mode. CRTM has no such query, so it is only answered by the store.
+
+        :param int cod_mode: Id of a transport mode. Use constants.TransportModes to easily select it.
+        :return dict: The stops, with the same shape as stops.get_stops_by_municipality: {'stops': {'Stop': [...]}}.
+        """
+        self._count(True)
+
+        return self._stops(self._stops_by_mode.get(cod_mode), None)
+
+    def get_offices_by_type(self, offices_type):
+        """
+        Offices of a type. It is the local counterpart of offices.get_offices_by_type.
+
+        :param str offices_type: Office type. Use constants.OfficeTypes to choose the available types easily.
+        :return dict: The offices, with the same shape as offices.get_offices_by_type: {'offices': {'Office': [...]}}.
+                      None if the type isn't in the store and fallback is disabled.
+        """
+        positions = self._offices_by_type.get(str(offices_type))
+
+        if positions is not None:
+            self._count(True)
+
+            return self._offices(positions, None)
+
+        return self._miss(offices.get_offices_by_type, offices_type)
+
+    def get_offices_by_postcode(self, post_code, offices_type=None):
+        """
+        Offices of a zip code. It is the local counterpart of offices.get_offices_by_postcode. The zip code of the
+        offices is the one at the end of their address.
+
+        :param int post_code: Zip code of the area to look for offices.
+        :param str offices_type: Office type. If set, filters the results by the office type specified.
+                                 Use constants.OfficeTypes to choose the available types easily.
+        :return dict: The offices, with the same shape as offices.get_offices_by_postcode:
+                      {'offices': {'Office': [...]}}. None if the zip code isn't in the store (or the store lacks some
+                      municipality) and fallback is disabled.
+        """
+        known_type = offices_type is None or str(offices_type) in self._offices_by_type
+
+        if self._all_offices and known_type and post_code in self._offices_by_post_code:
+            self._count(True)
+
+            return self._offices(self._offices_by_post_code.get(post_code), offices_type)
+
+        return self._miss(offices.get_offices_by_postcode, post_code, offices_type)
+
+    def get_offices_by_municipality(self, cod_municipality, offices_type=None):
+        """
+        Offices of a municipality. It is the local counterpart of offices.get_offices_by_municipality.
+
+        :param int cod_municipality: Id of a municipality. Use constants.Municipalities to easily select it.
+        :param str offices_type: Office type. If set, filters the results by the office type specified.
+                                 Use constants.OfficeTypes to choose the available types easily.
+        :return dict: The offices, with the same shape as offices.get_offices_by_municipality:
+                      {'offices': {'Office': [...]}}. None if the municipality isn't in the store and fallback is
+                      disabled.
+        """
+        positions = self._offices_by_municipality.get(str(cod_municipality))
+
+        if positions is not None and (offices_type is None or str(offices_type) in self._offices_by_type):
+            self._count(True)
+
+            return self._offices(positions, offices_type)
+
+        return self._miss(offices.get_offices_by_municipality, cod_municipality, offices_type)
+
+    def stats(self):
+        """
+        :return dict: Number of queries answered by the store (hits) and requested to CRTM or left unanswered
+                      (misses).
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+def _filter_stops(response, cod_mode):
+    records = as_list(((response or {}).get('stops') or {}).get('Stop'))
+
+    return {'stops': {'Stop': [stop for stop in records if str(stop.get('codMode')) == str(cod_mode)]}}
@@ -0,0 +1,271 @@
+import sys
+
+from citram_api.utils.utils import as_list
+
+
+def _code(value):
+    # Codes are repeated across thousands of records, so a single copy of each one is kept.
+    return None if value is None else sys.intern(str(value))
+
+
+def _int(value, default=0):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class _Model(object):
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name)
+                                                  for name in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__,
+                               ', '.join('{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{} objects are immutable'.format(type(self).__name__))
+
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+
+class Coordinates(_Model):
+    """
+    A point. Latitude and longitude are always floats.
+    """
+    __slots__ = ('latitude', 'longitude')
+
+    def __init__(self, latitude, longitude):
+        self._set(latitude=float(latitude), longitude=float(longitude))
+
+    @classmethod
+    def from_dict(cls, data):
+        try:
+            return cls(data['latitude'], data['longitude'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class Municipality(_Model):
+    """
+    A municipality, as in others.get_municipalities.
+    """
+    __slots__ = ('cod_municipality', 'name')
+
+    def __init__(self, cod_municipality, name):
+        self._set(cod_municipality=_code(cod_municipality), name=name)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('codMunicipality'), data.get('name'))
+
+
+class Itinerary(_Model):
+    """
+    An itinerary of a line. stops holds the stops in order, when the response includes them.
+    """
+    __slots__ = ('cod_itinerary', 'name', 'direction', 'kml', 'stops')
+
+    def __init__(self, cod_itinerary, name, direction, kml=None, stops=()):
+        self._set(cod_itinerary=_code(cod_itinerary), name=name, direction=_int(direction), kml=kml,
+                  stops=tuple(stops))
+
+    @classmethod
+    def from_dict(cls, data):
+        stops = as_list((data.get('stops') or {}).get('StopInformation'))
+
+        return cls(data.get('codItinerary'), data.get('name'), data.get('direction'), data.get('kml'),
+                   [Stop.from_dict(stop) for stop in stops])
+
+
+class Line(_Model):
+    """
+    A line, as in lines.get_lines_by_mode or lines.get_line_info. itineraries holds the itineraries included in the
+    response (shortItinerary or itinerary).
+    """
+    __slots__ = ('cod_line', 'short_description', 'description', 'cod_mode', 'update_date', 'update_kml_date',
+                 'night_service', 'active', 'color_line', 'text_color_line', 'company_code', 'url_line',
+                 'cod_municipalities', 'itineraries')
+
+    def __init__(self, cod_line, short_description=None, description=None, cod_mode=None, update_date=None,
+                 update_kml_date=None, night_service=0, active=True, color_line=None, text_color_line=None,
+                 company_code=None, url_line=None, cod_municipalities=(), itineraries=()):
+        self._set(cod_line=_code(cod_line), short_description=short_description, description=description,
+                  cod_mode=_code(cod_mode), update_date=update_date, update_kml_date=update_kml_date,
+                  night_service=_int(night_service), active=bool(active), color_line=color_line,
+                  text_color_line=text_color_line, company_code=_code(company_code), url_line=url_line,
+                  cod_municipalities=tuple(_code(cod) for cod in cod_municipalities),
+                  itineraries=tuple(itineraries))
+
+    @classmethod
+    def from_dict(cls, data):
+        itineraries = as_list((data.get('itinerary') or data.get('shortItinerary') or {}).get('Itinerary'))
+
+        return cls(data.get('codLine'), data.get('shortDescription'), data.get('description'), data.get('codMode'),
+                   data.get('updateDate'), data.get('updateKmlDate'), data.get('nightService'),
+                   data.get('active', True), data.get('colorLine'), data.get('text_colorLine'),
+                   data.get('companyCode'), data.get('URLLine'),
+                   as_list((data.get('codMunicipalities') or {}).get('string')),
+                   [Itinerary.from_dict(itinerary) for itinerary in itineraries])
+
+
+class Stop(_Model):
+    """
+    A stop. The lines of the stop are kept as line ids in cod_lines, both when the response has codLines and when
+    it embeds whole Line objects.
+    """
+    __slots__ = ('cod_stop', 'short_cod_stop', 'cod_mode', 'name', 'address', 'post_code', 'cod_municipality',
+                 'coordinates', 'cod_lines', 'access', 'park', 'night_lines_service', 'stop_type')
+
+    def __init__(self, cod_stop, short_cod_stop=None, cod_mode=None, name=None, address=None, post_code=None,
+                 cod_municipality=None, coordinates=None, cod_lines=(), access=0, park=0, night_lines_service=0,
+                 stop_type=None):
+        self._set(cod_stop=_code(cod_stop), short_cod_stop=_code(short_cod_stop), cod_mode=_code(cod_mode),
+                  name=name, address=address, post_code=_code(post_code), cod_municipality=_code(cod_municipality),
+                  coordinates=coordinates, cod_lines=tuple(_code(cod) for cod in cod_lines), access=_int(access),
+                  park=_int(park), night_lines_service=_int(night_lines_service),
+                  stop_type=None if stop_type is None else _int(stop_type))
+
+    @classmethod
+    def from_dict(cls, data):
+        if 'codLines' in data:
+            cod_lines = as_list((data.get('codLines') or {}).get('Line'))
+        else:
+            cod_lines = [line['codLine'] for line in as_list((data.get('lines') or {}).get('Line'))]
+
+        return cls(data.get('codStop'), data.get('shortCodStop'), data.get('codMode'), data.get('name'),
+                   data.get('address'), data.get('postCode'), data.get('codMunicipality'),
+                   Coordinates.from_dict(data.get('coordinates') or {}), cod_lines, data.get('access'),
+                   data.get('park'), data.get('nightLinesService'), data.get('stopType'))
+
+
+class StopTime(_Model):
+    """
+    A predicted arrival at a stop, as in stops.get_stop_times.
+    """
+    __slots__ = ('cod_stop', 'cod_line', 'direction', 'destination', 'cod_destination_stop', 'time', 'cod_vehicle',
+                 'cod_issue')
+
+    def __init__(self, cod_stop, cod_line, direction, destination, cod_destination_stop, time, cod_vehicle=None,
+                 cod_issue=None):
+        self._set(cod_stop=_code(cod_stop), cod_line=_code(cod_line), direction=_int(direction),
+                  destination=destination, cod_destination_stop=_code(cod_destination_stop), time=time,
+                  cod_vehicle=cod_vehicle or None, cod_issue=cod_issue or None)
+
+    @classmethod
+    def from_dict(cls, data, cod_stop=None):
+        return cls(cod_stop, (data.get('line') or {}).get('codLine'), data.get('direction'), data.get('destination'),
+                   (data.get('destinationStop') or {}).get('codStop'), data.get('time'), data.get('codVehicle'),
+                   data.get('codIssue'))
+
+
+class Office(_Model):
+    """
+    A CRTM office or recharge point, as in offices.get_offices_by_type.
+    """
+    __slots__ = ('cod_office', 'name', 'address', 'open_time', 'coordinates', 'type')
+
+    def __init__(self, cod_office, name=None, address=None, open_time=None, coordinates=None, type=None):
+        self._set(cod_office=_code(cod_office), name=name, address=address, open_time=open_time,
+                  coordinates=coordinates, type=_code(type))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('codOffice'), data.get('name'), data.get('address'), data.get('openTime'),
+                   Coordinates.from_dict(data.get('coordinates') or {}), data.get('type'))
+
+
+def stops_from_response(response):
+    """
+    :param dict response: Response of any of the stops functions but get_stop_times.
+    :return list: Stop objects.
+    """
+    return [Stop.from_dict(stop) for stop in as_list(((response or {}).get('stops') or {}).get('Stop'))]
+
+
+def lines_from_response(response):
+    """
+    :param dict response: Response of lines.get_lines_by_mode, lines.get_lines_by_municipality,
+                          lines.get_lines_by_line_code or lines.get_line_info.
+    :return list: Line objects.
+    """
+    lines = (response or {}).get('lines') or {}
+
+    return [Line.from_dict(line) for line in as_list(lines.get('Line', lines.get('LineInformation')))]
+
+
+def stop_times_from_response(response):
+    """
+    :param dict response: Response of stops.get_stop_times.
+    :return list: StopTime objects, in the same order as in the response.
+    """
+    stop_times = (response or {}).get('stopTimes') or {}
+    cod_stop = (stop_times.get('stop') or {}).get('codStop')
+
+    return [StopTime.from_dict(time, cod_stop) for time in as_list((stop_times.get('times') or {}).get('Time'))]
+
+
+def offices_from_response(response):
+    """
+    :param dict response: Response of any of the offices functions.
+    :return list: Office objects.
+    """
+    return [Office.from_dict(office) for office in as_list(((response or {}).get('offices') or {}).get('Office'))]
+
+
+def municipalities_from_response(response):
+    """
+    :param dict response: Response of others.get_municipalities.
+    :return list: Municipality objects.
+    """
+    return [Municipality.from_dict(municipality)
+            for municipality in as_list(((response or {}).get('municipalities') or {}).get('Municipality'))]
+
+
+_CONVERTERS = {
+    'stops': stops_from_response,
+    'lines': lines_from_response,
+    'stopTimes': stop_times_from_response,
+    'offices': offices_from_response,
+    'municipalities': municipalities_from_response,
+}
+
+
+def from_response(response):
+    """
+    Converts the response of any endpoint returning stops, lines, stop times, offices or municipalities to a list of
+    typed objects. They take a fraction of the memory of the dictionaries.
+
+    Example:
+
+    .. code-block:: python
+
+        stops = from_response(get_stops_by_municipality(Municipalities.MADRID.value))
+        stops[0].coordinates.latitude
+
+    :param dict response: Response of a request.
+    :return list: Stop, Line, StopTime, Office or Municipality objects, depending on the response.
+    """
+    for key, converter in _CONVERTERS.items():
+        if key in (response or {}):
+            return converter(response)
+
+    raise ValueError('The response has no stops, lines, stop times, offices or municipalities.')
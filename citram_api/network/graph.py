@@ -0,0 +1,307 @@
+from array import array
+from collections import namedtuple
+import math
+import re
+
+from citram_api.index.spatial import DEFAULT_REFERENCE_LATITUDE, METERS_PER_DEGREE, GridIndex, _coordinates
+from citram_api.utils.utils import as_list, fold
+
+
+DEFAULT_TRANSFER_DISTANCE = 50.0
+DEFAULT_NAME_TRANSFER_DISTANCE = 1000.0
+
+Leg = namedtuple('Leg', ['cod_line', 'board_cod_stop', 'alight_cod_stop'])
+
+
+def _name_key(name):
+    return ' '.join(re.split('[^A-Z0-9]+', fold(name or ''))).strip()
+
+
+def _distance(a, b):
+    dx = (a[1] - b[1]) * METERS_PER_DEGREE * math.cos(math.radians(DEFAULT_REFERENCE_LATITUDE))
+    dy = (a[0] - b[0]) * METERS_PER_DEGREE
+
+    return math.sqrt(dx * dx + dy * dy)
+
+
+def _csr(rows):
+    """
+    Packs a list of lists of ints in two arrays: offsets, where row i spans values[offsets[i]:offsets[i + 1]], and
+    values.
+    """
+    offsets = array('i', [0])
+    values = array('i')
+
+    for row in rows:
+        values.extend(row)
+        offsets.append(len(values))
+
+    return offsets, values
+
+
+class TransferGraph(object):
+    """
+    Graph of the network built from a NetworkSnapshot, for routing queries such as the fewest transfers between two
+    stops.
+
+    Everything is numbered and packed in arrays when the graph is built, in compressed sparse row form:
+
+    - the ordered stops of every itinerary, and the itineraries of every line;
+    - the lines of every stop, taken from the itineraries;
+    - the transfers of every stop: stops within transfer_distance meters, and stops of other modes with the same
+      name (accents and case aside) within name_transfer_distance meters, i.e. a metro and a cercanías station;
+    - the lines reachable from every line with one transfer, which is what the queries walk.
+
+    A line can be ridden between any two of its stops, in any itinerary.
+
+    Example:
+
+    .. code-block:: python
+
+        graph = TransferGraph(NetworkSnapshot.load('network.json.gz'))
+        legs = graph.fewest_transfers('4_276', '5_43')
+
+        for leg in legs:
+            print(leg.cod_line, leg.board_cod_stop, leg.alight_cod_stop)
+
+    :param NetworkSnapshot snapshot: Snapshot of the network.
+    :param float transfer_distance: Maximum walking distance of a transfer between any two stops, in meters.
+                                    Optional, default: 50.
+    :param float name_transfer_distance: Maximum distance of a transfer between stops of different modes with the
+                                         same name, in meters. Optional, default: 1000.
+    """
+
+    def __init__(self, snapshot, transfer_distance=DEFAULT_TRANSFER_DISTANCE,
+                 name_transfer_distance=DEFAULT_NAME_TRANSFER_DISTANCE):
+        self.transfer_distance = transfer_distance
+        self.name_transfer_distance = name_transfer_distance
+
+        self.stops = []
+        self.cod_stops = []
+        self.cod_lines = []
+        self._stop_positions = {}
+        self._line_positions = {}
+
+        itinerary_stops, line_itineraries = [], []
+
+        for cod_line, itinerary in snapshot.iter_itineraries():
+            line = self._line_positions.get(cod_line)
+
+            if line is None:
+                line = self._line_positions[cod_line] = len(self.cod_lines)
+                self.cod_lines.append(cod_line)
+                line_itineraries.append([])
+
+            positions = [self._add_stop(stop)
+                         for stop in as_list((itinerary.get('stops') or {}).get('StopInformation'))]
+
+            line_itineraries[line].append(len(itinerary_stops))
+            itinerary_stops.append(positions)
+
+        self._itinerary_offsets, self._itinerary_stops = _csr(itinerary_stops)
+        self._line_itinerary_offsets, self._line_itineraries = _csr(line_itineraries)
+
+        stop_lines = [set() for _ in self.stops]
+
+        for line, itineraries in enumerate(line_itineraries):
+            for itinerary in itineraries:
+                for stop in itinerary_stops[itinerary]:
+                    stop_lines[stop].add(line)
+
+        self._stop_line_offsets, self._stop_lines = _csr(sorted(lines) for lines in stop_lines)
+        self._transfer_offsets, self._transfers = _csr(self._find_transfers())
+
+        # Lines that can be boarded at a stop or at any stop reachable from it by a transfer.
+        reachable = [set(self._lines_of(stop)).union(*(self._lines_of(other) for other in self._transfers_of(stop)))
+                     for stop in range(len(self.stops))]
+        self._reachable_offsets, self._reachable = _csr(sorted(lines) for lines in reachable)
+
+        neighbours = []
+
+        for line in range(len(self.cod_lines)):
+            lines = set()
+
+            for stop in self._stops_of_line(line):
+                lines.update(self._reachable_of(stop))
+
+            lines.discard(line)
+            neighbours.append(sorted(lines))
+
+        self._neighbour_offsets, self._neighbours = _csr(neighbours)
+
+    def _add_stop(self, stop):
+        position = self._stop_positions.get(stop['codStop'])
+
+        if position is None:
+            position = self._stop_positions[stop['codStop']] = len(self.stops)
+            self.stops.append(stop)
+            self.cod_stops.append(stop['codStop'])
+
+        return position
+
+    def _find_transfers(self):
+        index = GridIndex(self.stops)
+        positions = self._stop_positions
+        coordinates = [_coordinates(stop) for stop in self.stops]
+        transfers = [set() for _ in self.stops]
+        by_name = {}
+
+        for stop_position, stop in enumerate(self.stops):
+            if coordinates[stop_position] is None:
+                continue
+
+            by_name.setdefault(_name_key(stop.get('name')), []).append(stop_position)
+
+            for _, other in index.within(*coordinates[stop_position], distance=self.transfer_distance):
+                transfers[stop_position].add(positions[other['codStop']])
+
+        for same_name in by_name.values():
+            for i, stop_position in enumerate(same_name):
+                for other_position in same_name[i + 1:]:
+                    if (self.stops[stop_position].get('codMode') != self.stops[other_position].get('codMode') and
+                            _distance(coordinates[stop_position], coordinates[other_position]) <=
+                            self.name_transfer_distance):
+                        transfers[stop_position].add(other_position)
+                        transfers[other_position].add(stop_position)
+
+        for stop_position, others in enumerate(transfers):
+            others.discard(stop_position)
+
+        return [sorted(others) for others in transfers]
+
+    @staticmethod
+    def _row(offsets, values, i):
+        return values[offsets[i]:offsets[i + 1]]
+
+    def _lines_of(self, stop):
+        return self._row(self._stop_line_offsets, self._stop_lines, stop)
+
+    def _transfers_of(self, stop):
+        return self._row(self._transfer_offsets, self._transfers, stop)
+
+    def _reachable_of(self, stop):
+        return self._row(self._reachable_offsets, self._reachable, stop)
+
+    def _stops_of_line(self, line):
+        stops = []
+
+        for itinerary in self._row(self._line_itinerary_offsets, self._line_itineraries, line):
+            stops.extend(self._row(self._itinerary_offsets, self._itinerary_stops, itinerary))
+
+        return stops
+
+    def _stop(self, cod_stop):
+        try:
+            return self._stop_positions[cod_stop]
+        except KeyError:
+            raise KeyError('Stop {} is not in the graph.'.format(cod_stop))
+
+    def lines_of_stop(self, cod_stop):
+        """
+        :param str cod_stop: Stop id.
+        :return list: Ids of the lines that stop there.
+        """
+        return [self.cod_lines[line] for line in self._lines_of(self._stop(cod_stop))]
+
+    def stops_of_line(self, cod_line):
+        """
+        :param str cod_line: Line id.
+        :return list: Lists of stop ids, one per itinerary of the line, in the order the line serves them.
+        """
+        line = self._line_positions[cod_line]
+
+        return [[self.cod_stops[stop] for stop in self._row(self._itinerary_offsets, self._itinerary_stops, itinerary)]
+                for itinerary in self._row(self._line_itinerary_offsets, self._line_itineraries, line)]
+
+    def transfers_of_stop(self, cod_stop):
+        """
+        :param str cod_stop: Stop id.
+        :return list: Ids of the stops that can be reached from it by a transfer.
+        """
+        return [self.cod_stops[stop] for stop in self._transfers_of(self._stop(cod_stop))]
+
+    def _transfer_point(self, from_stops, line):
+        """
+        A stop of from_stops, and a stop of the line that is the same or reachable from it by a transfer.
+        """
+        line_stops = set(self._stops_of_line(line))
+
+        for stop in from_stops:
+            if stop in line_stops:
+                return stop, stop
+
+            for other in self._transfers_of(stop):
+                if other in line_stops:
+                    return stop, other
+
+        return None
+
+    def fewest_transfers(self, from_cod_stop, to_cod_stop):
+        """
+        A journey between two stops with the fewest transfers, found with a breadth first search over the lines.
+
+        :param str from_cod_stop: Id of the departure stop.
+        :param str to_cod_stop: Id of the arrival stop.
+        :return list: Legs of the journey (namedtuples of cod_line, board_cod_stop and alight_cod_stop), so the
+                      number of transfers is one less than the number of legs. An empty list if both stops are the
+                      same or a transfer apart, and None if there is no journey between them.
+        :raises KeyError: If a stop isn't in the graph.
+        """
+        origin, destination = self._stop(from_cod_stop), self._stop(to_cod_stop)
+
+        if origin == destination or destination in self._transfers_of(origin):
+            return []
+
+        targets = set(self._reachable_of(destination))
+        parents = array('i', [-2]) * len(self.cod_lines)
+        frontier = list(self._reachable_of(origin))
+
+        for line in frontier:
+            parents[line] = -1
+
+        found = next((line for line in frontier if line in targets), None)
+
+        while found is None and frontier:
+            next_frontier = []
+
+            for line in frontier:
+                for neighbour in self._row(self._neighbour_offsets, self._neighbours, line):
+                    if parents[neighbour] == -2:
+                        parents[neighbour] = line
+                        next_frontier.append(neighbour)
+
+                        if neighbour in targets:
+                            found = neighbour
+                            break
+
+                if found is not None:
+                    break
+
+            frontier = next_frontier
+
+        if found is None:
+            return None
+
+        path = [found]
+
+        while parents[path[-1]] != -1:
+            path.append(parents[path[-1]])
+
+        path.reverse()
+
+        return self._legs(origin, destination, path)
+
+    def _legs(self, origin, destination, path):
+        legs = []
+        _, board = self._transfer_point([origin], path[0])
+
+        for line, next_line in zip(path, path[1:]):
+            alight, next_board = self._transfer_point(self._stops_of_line(line), next_line)
+            legs.append(Leg(self.cod_lines[line], self.cod_stops[board], self.cod_stops[alight]))
+            board = next_board
+
+        # Transfers go both ways, so the arrival stop is the destination or a transfer away from it.
+        _, alight = self._transfer_point([destination], path[-1])
+        legs.append(Leg(self.cod_lines[path[-1]], self.cod_stops[board], self.cod_stops[alight]))
+
+        return legs
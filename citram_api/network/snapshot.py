@@ -0,0 +1,420 @@
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+
+from citram_api.api.lines import lines
+from citram_api.api.offices import offices
+from citram_api.api.others import others
+from citram_api.api.stops import stops
+from citram_api.utils.rate_limit import HostRateLimiter
+from citram_api.utils.scheduler import BULK, priority
+from citram_api.utils.utils import as_list, common_request
+
+
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+def _open(path, mode, compressed):
+    if compressed:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+
+    return open(path, mode, encoding='utf-8')
+
+
+class NetworkSnapshot(object):
+    """
+    Consistent picture of the whole network: transport modes, municipalities, lines, the information (itineraries
+    and their stops) and time planning of every line, and the stops and offices of every municipality. It is built
+    with build_network_snapshot and can be saved and loaded to work offline.
+
+    :param list modes: Transport mode records, as in others.get_transport_modes.
+    :param list municipalities: Municipality records, as in others.get_municipalities.
+    :param dict lines: Line records by line id, as in lines.get_lines_by_mode.
+    :param dict line_info: LineInformation records by line id, as in lines.get_line_info.
+    :param dict timeplanning: Responses of lines.get_lines_timeplanning by line id.
+    :param str created_at: ISO date when the crawl started. Optional, default: now.
+    :param list failed_lines: Ids of the lines whose information couldn't be requested. Optional, default: None.
+    :param dict municipality_stops: Stop records by municipality id, as in stops.get_stops_by_municipality.
+                                    Optional, default: None.
+    :param dict offices: Office records by office type, as in offices.get_offices_by_type. Optional, default: None.
+    :param dict municipality_offices: Office records by municipality id, as in offices.get_offices_by_municipality.
+                                      Optional, default: None.
+    :param list failed_municipalities: Ids of the municipalities whose stops or offices couldn't be requested.
+                                       Optional, default: None.
+    """
+
+    def __init__(self, modes, municipalities, lines, line_info, timeplanning, created_at=None, failed_lines=None,
+                 municipality_stops=None, offices=None, municipality_offices=None, failed_municipalities=None):
+        self.modes = modes
+        self.municipalities = municipalities
+        self.lines = lines
+        self.line_info = line_info
+        self.timeplanning = timeplanning
+        self.created_at = created_at or datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.failed_lines = list(failed_lines or [])
+        self.municipality_stops = dict(municipality_stops or {})
+        self.offices = dict(offices or {})
+        self.municipality_offices = dict(municipality_offices or {})
+        self.failed_municipalities = list(failed_municipalities or [])
+
+        self._stops = None
+
+    def iter_itineraries(self):
+        """
+        Iterates over the itineraries of every line.
+
+        :return: Generator of tuples of line id and Itinerary record (with its stops).
+        """
+        for cod_line, info in self.line_info.items():
+            for itinerary in as_list((info.get('itinerary') or {}).get('Itinerary')):
+                yield cod_line, itinerary
+
+    @property
+    def stops(self):
+        """
+        Every stop of the network by stop id, taken from the itineraries of the lines.
+
+        :return dict: StopInformation records by stop id.
+        """
+        if self._stops is None:
+            stops = {}
+
+            for _, itinerary in self.iter_itineraries():
+                for stop in as_list((itinerary.get('stops') or {}).get('StopInformation')):
+                    stops.setdefault(stop['codStop'], stop)
+
+            self._stops = stops
+
+        return self._stops
+
+    def to_dict(self):
+        return {'version': SNAPSHOT_FORMAT_VERSION,
+                'created_at': self.created_at,
+                'modes': self.modes,
+                'municipalities': self.municipalities,
+                'lines': self.lines,
+                'line_info': self.line_info,
+                'timeplanning': self.timeplanning,
+                'failed_lines': self.failed_lines,
+                'municipality_stops': self.municipality_stops,
+                'offices': self.offices,
+                'municipality_offices': self.municipality_offices,
+                'failed_municipalities': self.failed_municipalities}
+
+    @classmethod
+    def from_dict(cls, data):
+        # Snapshots of the first version don't have the stops and offices of the municipalities.
+        return cls(data['modes'], data['municipalities'], data['lines'], data['line_info'], data['timeplanning'],
+                   created_at=data.get('created_at'), failed_lines=data.get('failed_lines'),
+                   municipality_stops=data.get('municipality_stops'), offices=data.get('offices'),
+                   municipality_offices=data.get('municipality_offices'),
+                   failed_municipalities=data.get('failed_municipalities'))
+
+    def save(self, path):
+        """
+        Saves the snapshot as JSON. It is compressed with gzip if the path ends with .gz.
+
+        :param str path: Destination file.
+        """
+        tmp_path = path + '.tmp'
+
+        with _open(tmp_path, 'w', path.endswith('.gz')) as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a snapshot saved with save.
+
+        :param str path: Snapshot file.
+        :return NetworkSnapshot: The snapshot.
+        """
+        with _open(path, 'r', path.endswith('.gz')) as f:
+            return cls.from_dict(json.load(f))
+
+
+class CrawlStats(object):
+    """
+    Counters of a network crawl: requests made, failed requests, lines resumed from a checkpoint and duration.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.lines = 0
+        self.resumed_lines = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+        self._lock = threading.Lock()
+
+    def count_request(self, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.failures += int(failed)
+
+    @property
+    def duration(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def requests_per_second(self):
+        return self.requests / self.duration if self.duration > 0 else 0.0
+
+    def as_dict(self):
+        return {'requests': self.requests,
+                'failures': self.failures,
+                'lines': self.lines,
+                'resumed_lines': self.resumed_lines,
+                'duration': self.duration,
+                'requests_per_second': self.requests_per_second}
+
+
+class NetworkCrawler(object):
+    """
+    Crawls the whole network (modes, municipalities, lines of every mode, information and time planning of every
+    line, offices of every type, and stops and offices of every municipality) with bounded parallelism and a
+    per-host rate limit. Its requests have BULK priority in the scheduler (see utils.scheduler), so they yield to
+    realtime requests made from the same process.
+
+    If a checkpoint path is given, every finished line and municipality is appended to it. A crawl interrupted for
+    any reason resumes from there, without requesting the finished ones again. The checkpoint is deleted when the
+    crawl finishes.
+
+    :param int max_workers: Maximum number of requests running at the same time. Optional, default: 8.
+    :param float requests_per_second: Maximum requests per second to each host. Optional, default: 10.
+    :param float burst: Requests that can be made at once after being idle. Optional, default: requests_per_second.
+    :param list mode_cods: Transport modes to crawl. Optional, default: None (every mode).
+    :param bool include_timeplanning: Whether to request the time planning of each line. Optional, default: True.
+    :param bool include_stops: Whether to request the stops of each municipality. Optional, default: True.
+    :param bool include_offices: Whether to request the offices of each type and municipality. Optional,
+                                 default: True.
+    :param str checkpoint_path: File where the progress is stored. Optional, default: None (not resumable).
+    :param progress: Function called with the number of finished lines and municipalities and the total after each
+                     one. Optional, default: None.
+    """
+
+    def __init__(self, max_workers=8, requests_per_second=10, burst=None, mode_cods=None, include_timeplanning=True,
+                 include_stops=True, include_offices=True, checkpoint_path=None, progress=None):
+        self.max_workers = max_workers
+        self.rate_limiter = HostRateLimiter(requests_per_second, burst=burst)
+        self.mode_cods = mode_cods
+        self.include_timeplanning = include_timeplanning
+        self.include_stops = include_stops
+        self.include_offices = include_offices
+        self.checkpoint_path = checkpoint_path
+        self.progress = progress
+
+        self.stats = CrawlStats()
+        self.created_at = None
+
+        self._checkpoint_lock = threading.Lock()
+
+    def _request(self, url):
+        self.rate_limiter.acquire(url)
+
+        try:
+            with priority(BULK):
+                data = common_request(url)
+        except Exception:
+            self.stats.count_request(failed=True)
+            raise
+
+        self.stats.count_request()
+
+        return data
+
+    def _read_checkpoint(self):
+        header, finished, finished_municipalities = None, {}, {}
+
+        if self.checkpoint_path is None or not os.path.isfile(self.checkpoint_path):
+            return header, finished, finished_municipalities
+
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            for row in f:
+                try:
+                    entry = json.loads(row)
+                except ValueError:
+                    # The last row can be incomplete if the crawl was killed while writing it.
+                    continue
+
+                if entry['type'] == 'header':
+                    header = entry
+                elif entry['type'] == 'municipality':
+                    finished_municipalities[entry['codMunicipality']] = entry
+                else:
+                    finished[entry['codLine']] = entry
+
+        return header, finished, finished_municipalities
+
+    def _write_checkpoint(self, entry):
+        if self.checkpoint_path is None:
+            return
+
+        row = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+        with self._checkpoint_lock, open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+            f.write(row)
+
+    def _crawl_catalog(self):
+        modes = as_list(self._request(others._get_transport_modes_url())['modes'].get('Mode'))
+        municipalities = as_list(self._request(others._get_municipalities_url())['municipalities']
+                                 .get('Municipality'))
+
+        mode_cods = self.mode_cods if self.mode_cods is not None else [mode['codMode'] for mode in modes]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            responses = list(executor.map(self._request, [lines._get_lines_by_mode_url(mode_cod)
+                                                          for mode_cod in mode_cods]))
+
+        line_records = {}
+
+        for response in responses:
+            for line in as_list(((response or {}).get('lines') or {}).get('Line')):
+                line_records.setdefault(line['codLine'], line)
+
+        office_records = {}
+
+        if self.include_offices:
+            from citram_api.constants.constants import OfficeTypes
+
+            for offices_type in OfficeTypes:
+                response = self._request(offices._get_offices_by_type_url(offices_type.value))
+                office_records[offices_type.value] = as_list(((response or {}).get('offices') or {}).get('Office'))
+
+        return {'type': 'header', 'created_at': self.created_at, 'modes': modes,
+                'municipalities': municipalities, 'lines': line_records, 'offices': office_records}
+
+    def _crawl_line(self, cod_line):
+        info = self._request(lines._get_line_info_url(cod_line))
+        entry = {'type': 'line', 'codLine': cod_line,
+                 'info': ((info or {}).get('lines') or {}).get('LineInformation')}
+
+        if self.include_timeplanning:
+            entry['timeplanning'] = self._request(lines._get_lines_timeplanning_url(cod_line))
+
+        self._write_checkpoint(entry)
+
+        return entry
+
+    def _crawl_municipality(self, cod_municipality):
+        entry = {'type': 'municipality', 'codMunicipality': cod_municipality}
+
+        if self.include_stops:
+            response = self._request(stops._get_stops_by_municipality_url(cod_municipality))
+            entry['stops'] = as_list(((response or {}).get('stops') or {}).get('Stop'))
+
+        if self.include_offices:
+            response = self._request(offices._get_offices_by_municipality_url(cod_municipality))
+            entry['offices'] = as_list(((response or {}).get('offices') or {}).get('Office'))
+
+        self._write_checkpoint(entry)
+
+        return entry
+
+    def crawl(self):
+        """
+        Runs the crawl.
+
+        :return NetworkSnapshot: The snapshot of the network. Lines whose requests failed are listed in its
+                                 failed_lines.
+        """
+        self.stats = CrawlStats()
+        self.created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+        header, finished, finished_municipalities = self._read_checkpoint()
+
+        if header is None:
+            header = self._crawl_catalog()
+            self._write_checkpoint(header)
+        else:
+            self.created_at = header['created_at']
+
+        line_records = header['lines']
+        pending = [cod_line for cod_line in line_records if cod_line not in finished]
+        failed_lines = []
+
+        cod_municipalities = []
+
+        if self.include_stops or self.include_offices:
+            cod_municipalities = [municipality['codMunicipality'] for municipality in header['municipalities']]
+
+        pending_municipalities = [cod_municipality for cod_municipality in cod_municipalities
+                                  if cod_municipality not in finished_municipalities]
+        failed_municipalities = []
+
+        self.stats.resumed_lines = len(finished)
+        done = len(finished) + len(finished_municipalities)
+        total = len(line_records) + len(cod_municipalities)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = ([(finished, failed_lines, cod_line, executor.submit(self._crawl_line, cod_line))
+                        for cod_line in pending] +
+                       [(finished_municipalities, failed_municipalities, cod_municipality,
+                         executor.submit(self._crawl_municipality, cod_municipality))
+                        for cod_municipality in pending_municipalities])
+
+            for finished_entries, failed, cod, future in futures:
+                try:
+                    finished_entries[cod] = future.result()
+                except Exception:
+                    failed.append(cod)
+
+                done += 1
+
+                if self.progress is not None:
+                    self.progress(done, total)
+
+        self.stats.lines = len(finished)
+        self.stats.finished_at = time.monotonic()
+
+        snapshot = NetworkSnapshot(header['modes'], header['municipalities'], line_records,
+                                   {cod_line: entry['info'] for cod_line, entry in finished.items()
+                                    if entry.get('info')},
+                                   {cod_line: entry.get('timeplanning') for cod_line, entry in finished.items()
+                                    if entry.get('timeplanning') is not None},
+                                   created_at=self.created_at, failed_lines=failed_lines,
+                                   municipality_stops={cod: entry['stops'] for cod, entry
+                                                       in finished_municipalities.items() if 'stops' in entry},
+                                   offices=header.get('offices'),
+                                   municipality_offices={cod: entry['offices'] for cod, entry
+                                                         in finished_municipalities.items() if 'offices' in entry},
+                                   failed_municipalities=failed_municipalities)
+
+        if (self.checkpoint_path is not None and not failed_lines and not failed_municipalities and
+                os.path.isfile(self.checkpoint_path)):
+            os.remove(self.checkpoint_path)
+
+        return snapshot
+
+
+def build_network_snapshot(**kwargs):
+    """
+    Crawls the whole network and returns a snapshot of it. See NetworkCrawler for the accepted arguments.
+
+    Example:
+
+    .. code-block:: python
+
+        snapshot = build_network_snapshot(max_workers=16, requests_per_second=20, checkpoint_path='crawl.jsonl')
+        snapshot.save('network.json.gz')
+
+        snapshot = NetworkSnapshot.load('network.json.gz')
+
+    Use NetworkCrawler directly to get the throughput and duration of the crawl:
+
+    .. code-block:: python
+
+        crawler = NetworkCrawler(max_workers=16, requests_per_second=20)
+        snapshot = crawler.crawl()
+        crawler.stats.as_dict()  # {'requests': 3120, 'failures': 0, ..., 'requests_per_second': 19.7}
+
+    :return NetworkSnapshot: The snapshot of the network.
+    """
+    return NetworkCrawler(**kwargs).crawl()
@@ -0,0 +1,305 @@
+"""
+Network wide incident monitor. It can also be run as a long-running loop that prints every event as a JSON line:
+
+    python -m citram_api.realtime.incidents [interval in seconds] [transport mode ids...]
+"""
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import json
+import sys
+import threading
+import time
+
+from citram_api.api.lines import lines
+from citram_api.utils.utils import as_list, common_request
+
+
+OPENED = 'opened'
+UPDATED = 'updated'
+CLOSED = 'closed'
+
+ID_KEYS = ('codIncident', 'codIssue', 'id')
+
+IncidentEvent = namedtuple('IncidentEvent', ['kind', 'cod_mode', 'cod_line', 'cod_incident', 'incident', 'previous'])
+IncidentEvent.__doc__ = ('Change of an incident of a line. kind is OPENED, UPDATED or CLOSED, incident is the record '
+                         'of the incident (the last one seen for CLOSED) and previous the record before an update.')
+
+
+def _digest(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _incident_records(value, inside=False):
+    # Records are the objects found below the keys whose name mentions incidents, i.e. incidents.Incident.
+    if isinstance(value, list):
+        for item in value:
+            yield from _incident_records(item, inside)
+    elif isinstance(value, dict):
+        nested = [item for key, item in value.items()
+                  if 'incident' in key.lower() and isinstance(item, (dict, list))]
+
+        if nested:
+            for item in nested:
+                yield from _incident_records(item, True)
+        elif inside and value:
+            yield value
+
+
+def _incident_id(record):
+    for key in ID_KEYS:
+        if record.get(key):
+            return str(record[key])
+
+    return _digest(record)
+
+
+def incidents_by_id(response):
+    """
+    :param dict response: Response of lines.get_incidents_affectations.
+    :return dict: Incident records by incident id. Records without any of ID_KEYS are identified by a hash of
+                  their content.
+    """
+    return {_incident_id(record): record for record in _incident_records(response)}
+
+
+class IncidentMonitor(object):
+    """
+    Monitors the incidents of every line of the network. The lines are enumerated with lines.get_lines_by_mode, and
+    every interval all of them are polled, spreading the requests evenly across the interval so they don't hit CRTM
+    at once. Responses identical to the previous one of the same line (compared by hash) are skipped without further
+    processing, and the rest are diffed to emit OPENED, UPDATED and CLOSED events.
+
+    Incidents found in the first poll of a line are emitted as OPENED unless emit_initial is False.
+
+    Example:
+
+    .. code-block:: python
+
+        monitor = IncidentMonitor(mode_cods=[TransportModes.METRO.value], interval=120)
+
+        for event in monitor.events():
+            print(event.kind, event.cod_line, event.incident)
+
+    :param list mode_cods: Transport modes to monitor. Optional, default: None (every mode in constants.TransportModes).
+    :param float interval: Seconds between two polls of the same line. Optional, default: 60.
+    :param int max_workers: Maximum number of requests running at the same time. Optional, default: 8.
+    :param float lines_refresh: Seconds between two enumerations of the lines. Optional, default: 1 day.
+    :param bool emit_initial: Whether the incidents of the first poll are emitted. Optional, default: True.
+    """
+
+    def __init__(self, mode_cods=None, interval=60, max_workers=8, lines_refresh=24 * 3600, emit_initial=True):
+        self.mode_cods = mode_cods
+        self.interval = interval
+        self.max_workers = max_workers
+        self.lines_refresh = lines_refresh
+        self.emit_initial = emit_initial
+
+        self.requests = 0
+        self.unchanged = 0
+        self.failures = 0
+
+        self._lines = None
+        self._lines_at = None
+        self._hashes = {}
+        self._incidents = {}
+        self._stop = threading.Event()
+
+    def resolve_lines(self):
+        """
+        Enumerates the lines to monitor.
+
+        :return list: Tuples of transport mode id and line id.
+        """
+        mode_cods = self.mode_cods
+
+        if mode_cods is None:
+            from citram_api.constants.constants import TransportModes
+
+            mode_cods = [mode.value for mode in TransportModes]
+
+        found = []
+
+        for mode_cod in mode_cods:
+            response = lines.get_lines_by_mode(mode_cod)
+
+            for line in as_list(((response or {}).get('lines') or {}).get('Line')):
+                found.append((mode_cod, line['codLine']))
+
+        self._lines = found
+        self._lines_at = time.monotonic()
+
+        return found
+
+    def _current_lines(self):
+        if self._lines is None or time.monotonic() - self._lines_at >= self.lines_refresh:
+            try:
+                self.resolve_lines()
+            except Exception:
+                if self._lines is None:
+                    raise
+
+        return self._lines
+
+    def _poll(self, mode_cod, cod_line):
+        return common_request(lines._get_incidents_affectations_url(mode_cod, cod_line))
+
+    def process(self, mode_cod, cod_line, response):
+        """
+        Compares a response with the previous one of the same line.
+
+        :param int mode_cod: Transport mode id of the line.
+        :param str cod_line: Line id.
+        :param dict response: Response of lines.get_incidents_affectations for the line.
+        :return list: IncidentEvent objects.
+        """
+        digest = _digest(response)
+        first = cod_line not in self._hashes
+
+        if self._hashes.get(cod_line) == digest:
+            self.unchanged += 1
+
+            return []
+
+        self._hashes[cod_line] = digest
+        previous = self._incidents.get(cod_line, {})
+        current = self._incidents[cod_line] = incidents_by_id(response)
+
+        if first and not self.emit_initial:
+            return []
+
+        events = []
+
+        for cod_incident, incident in current.items():
+            if cod_incident not in previous:
+                events.append(IncidentEvent(OPENED, mode_cod, cod_line, cod_incident, incident, None))
+            elif previous[cod_incident] != incident:
+                events.append(IncidentEvent(UPDATED, mode_cod, cod_line, cod_incident, incident,
+                                            previous[cod_incident]))
+
+        for cod_incident in previous.keys() - current.keys():
+            events.append(IncidentEvent(CLOSED, mode_cod, cod_line, cod_incident, previous[cod_incident], None))
+
+        return events
+
+    def _collect(self, futures, done):
+        events = []
+
+        for future in done:
+            mode_cod, cod_line = futures.pop(future)
+            self.requests += 1
+
+            try:
+                response = future.result()
+            except Exception:
+                self.failures += 1
+
+                continue
+
+            events.extend(self.process(mode_cod, cod_line, response))
+
+        return events
+
+    def poll_once(self):
+        """
+        Polls every line at once, without spreading the requests.
+
+        :return list: IncidentEvent objects.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._poll, mode_cod, cod_line): (mode_cod, cod_line)
+                       for mode_cod, cod_line in self._current_lines()}
+
+            return self._collect(futures, list(futures))
+
+    def _wait_until(self, until, futures):
+        # Yields the events of the requests finished before until, or of every request if until is None.
+        while until is None or not self._stop.is_set():
+            timeout = None if until is None else until - time.monotonic()
+
+            if timeout is not None and timeout <= 0:
+                return
+
+            if not futures:
+                if until is None:
+                    return
+
+                self._stop.wait(timeout)
+
+                continue
+
+            done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            yield from self._collect(futures, done)
+
+    def events(self, max_cycles=None):
+        """
+        Polls the lines until stop is called (or max_cycles polls of every line) and yields the events as they are
+        detected.
+
+        :param int max_cycles: Number of polls of every line before stopping. Optional, default: None (forever).
+        :return: Generator of IncidentEvent objects.
+        """
+        self._stop.clear()
+        cycles = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+
+            while not self._stop.is_set() and (max_cycles is None or cycles < max_cycles):
+                cycle_lines = self._current_lines()
+                started_at = time.monotonic()
+                step = self.interval / max(1, len(cycle_lines))
+
+                for position, (mode_cod, cod_line) in enumerate(cycle_lines):
+                    yield from self._wait_until(started_at + position * step, futures)
+
+                    if self._stop.is_set():
+                        break
+
+                    futures[executor.submit(self._poll, mode_cod, cod_line)] = (mode_cod, cod_line)
+
+                cycles += 1
+                last_cycle = self._stop.is_set() or (max_cycles is not None and cycles >= max_cycles)
+
+                yield from self._wait_until(None if last_cycle else started_at + self.interval, futures)
+
+    def run(self, callback, max_cycles=None):
+        """
+        Long-running loop calling callback with every event, until stop is called.
+
+        :param callback: Function called with each IncidentEvent.
+        :param int max_cycles: Number of polls of every line before stopping. Optional, default: None (forever).
+        """
+        for event in self.events(max_cycles=max_cycles):
+            callback(event)
+
+    def stop(self):
+        """
+        Stops events and run. Can be called from any thread.
+        """
+        self._stop.set()
+
+    def stats(self):
+        """
+        :return dict: Number of requests, responses skipped because they didn't change, failed requests and
+                      monitored lines.
+        """
+        return {'requests': self.requests, 'unchanged': self.unchanged, 'failures': self.failures,
+                'lines': len(self._lines or [])}
+
+
+def main(interval=60, *mode_cods):
+    monitor = IncidentMonitor(mode_cods=[int(mode_cod) for mode_cod in mode_cods] or None, interval=float(interval))
+
+    def emit(event):
+        print(json.dumps(event._asdict(), ensure_ascii=False), flush=True)
+
+    try:
+        monitor.run(emit)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,162 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from citram_api.api.lines import lines
+from citram_api.utils.utils import as_list, common_request
+
+
+NEW = 'new'
+MOVED = 'moved'
+REMOVED = 'removed'
+
+LocationTarget = namedtuple('LocationTarget', ['cod_mode', 'cod_itinerary', 'cod_line', 'cod_stop', 'direction'])
+LocationTarget.__doc__ = 'Arguments of lines.get_line_location for one itinerary of a line.'
+
+LocationChange = namedtuple('LocationChange', ['status', 'cod_line', 'cod_itinerary', 'direction', 'cod_vehicle',
+                                               'vehicle'])
+LocationChange.__doc__ = ('Change of a vehicle between two polls. status is NEW, MOVED or REMOVED, cod_vehicle is None '
+                          'for vehicles without id and vehicle is the record of the vehicle in the response (the last '
+                          'one seen for REMOVED).')
+
+
+def line_location_targets(cod_line):
+    """
+    Resolves the arguments of lines.get_line_location for every itinerary and direction of a line.
+
+    :param str cod_line: Line id. Use utils.create_line_cod to create this id easily.
+    :return list: LocationTarget objects, one for each itinerary with stops.
+    """
+    info = ((lines.get_line_info(cod_line) or {}).get('lines') or {}).get('LineInformation') or {}
+    targets = []
+
+    for itinerary in as_list((info.get('itinerary') or {}).get('Itinerary')):
+        stops = as_list((itinerary.get('stops') or {}).get('StopInformation'))
+
+        if stops:
+            targets.append(LocationTarget(int(info['codMode']), itinerary['codItinerary'], info['codLine'],
+                                          stops[0]['codStop'], itinerary['direction']))
+
+    return targets
+
+
+def _vehicles(value):
+    # Every object with coordinates in a get_line_location response is a vehicle.
+    if isinstance(value, list):
+        for item in value:
+            yield from _vehicles(item)
+    elif isinstance(value, dict):
+        if 'coordinates' in value:
+            yield value
+        else:
+            for item in value.values():
+                yield from _vehicles(item)
+
+
+# Key of a vehicle without codVehicle: its position, and how many vehicles before it were at the same position.
+_AnonymousVehicle = namedtuple('_AnonymousVehicle', ['position', 'occurrence'])
+
+
+def _position(vehicle):
+    coordinates = vehicle.get('coordinates')
+
+    return tuple(sorted(coordinates.items())) if isinstance(coordinates, dict) else coordinates
+
+
+def _vehicles_by_id(response):
+    vehicles = {}
+    occurrences = {}
+
+    for vehicle in _vehicles(response):
+        cod_vehicle = vehicle.get('codVehicle')
+
+        if cod_vehicle:
+            vehicles[cod_vehicle] = vehicle
+        else:
+            position = _position(vehicle)
+            occurrences[position] = occurrences.get(position, 0) + 1
+            vehicles[_AnonymousVehicle(position, occurrences[position])] = vehicle
+
+    return vehicles
+
+
+def _cod_vehicle(key):
+    return None if isinstance(key, _AnonymousVehicle) else key
+
+
+def _poll(target):
+    return common_request(lines._get_line_location_url(*target))
+
+
+def watch_line_locations(cod_lines, interval=10, max_workers=8, max_polls=None):
+    """
+    Follows the vehicles of one or several lines. The itineraries and directions of the lines are resolved once,
+    then all of them are polled concurrently every interval and only the vehicles that appeared, moved or
+    disappeared since the previous poll are yielded.
+
+    Vehicles are identified by their codVehicle. CRTM often leaves it empty, and those vehicles can't be told apart
+    between polls, so they are matched by position instead: a vehicle without id at a position where there was none
+    is NEW, one that is no longer at its position is REMOVED (so moving is a REMOVED and a NEW), and their cod_vehicle
+    is None. They are never MOVED. Itineraries whose request fails are skipped until the next poll, and their
+    vehicles are kept as they were.
+
+    Example:
+
+    .. code-block:: python
+
+        for change in watch_line_locations([create_line_cod(TransportModes.METRO_LIGERO_TRANVIA.value, 2),
+                                            create_line_cod(TransportModes.AUTOBUSES_INTERURBANOS.value, 591)]):
+            if change.status == REMOVED:
+                map.remove(change.cod_vehicle)
+            else:
+                map.move(change.cod_vehicle, change.vehicle['coordinates'])
+
+    :param cod_lines: Line id or list of line ids. Use utils.create_line_cod to create them easily.
+    :param float interval: Seconds between the start of two polls. Optional, default: 10.
+    :param int max_workers: Maximum number of requests running at the same time. Optional, default: 8.
+    :param int max_polls: Number of polls before stopping. Optional, default: None (polls forever).
+    :return: Generator of LocationChange objects.
+    """
+    if isinstance(cod_lines, str):
+        cod_lines = [cod_lines]
+
+    targets = [target for cod_line in cod_lines for target in line_location_targets(cod_line)]
+    known = {target: {} for target in targets}
+    polls = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while max_polls is None or polls < max_polls:
+            started_at = time.monotonic()
+            futures = [(target, executor.submit(_poll, target)) for target in targets]
+
+            for target, future in futures:
+                try:
+                    vehicles = _vehicles_by_id(future.result())
+                except Exception:
+                    continue
+
+                previous = known[target]
+
+                for cod_vehicle, vehicle in vehicles.items():
+                    last = previous.get(cod_vehicle)
+
+                    if last is None:
+                        status = NEW
+                    elif last.get('coordinates') != vehicle.get('coordinates'):
+                        status = MOVED
+                    else:
+                        continue
+
+                    yield LocationChange(status, target.cod_line, target.cod_itinerary, target.direction,
+                                         _cod_vehicle(cod_vehicle), vehicle)
+
+                for cod_vehicle in previous.keys() - vehicles.keys():
+                    yield LocationChange(REMOVED, target.cod_line, target.cod_itinerary, target.direction,
+                                         _cod_vehicle(cod_vehicle), previous[cod_vehicle])
+
+                known[target] = vehicles
+
+            polls += 1
+
+            if max_polls is None or polls < max_polls:
+                time.sleep(max(0.0, interval - (time.monotonic() - started_at)))
@@ -0,0 +1,171 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import heapq
+import itertools
+import time
+
+from citram_api.api.stops import stops
+from citram_api.utils.utils import as_list, common_request
+
+
+StopTimesTarget = namedtuple('StopTimesTarget', ['cod_stop', 'stop_type', 'stop_times_by_iti', 'order_by'])
+StopTimesTarget.__new__.__defaults__ = (2,)
+StopTimesTarget.__doc__ = 'Arguments of stops.get_stop_times for one stop.'
+
+StopTimesChange = namedtuple('StopTimesChange', ['cod_stop', 'actual_date', 'times', 'added', 'removed',
+                                                 'next_poll_in'])
+StopTimesChange.__doc__ = ('Change of the arrivals of a stop between two polls. times holds every Time record of the '
+                           'last response, added and removed the ones that weren\'t in the previous response or are '
+                           'not anymore, and next_poll_in the seconds until the stop is polled again.')
+
+
+def _parse_date(value):
+    # '2020-01-02T01:48:39+01:00'. Python 3.6 doesn't accept the colon of the offset.
+    if len(value) > 6 and value[-3] == ':':
+        value = value[:-3] + value[-2:]
+
+    return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+def _arrival_key(time_record):
+    return ((time_record.get('line') or {}).get('codLine'), time_record.get('direction'),
+            time_record.get('destination'), time_record.get('time'), time_record.get('codVehicle'))
+
+
+def _poll(target):
+    return common_request(stops._get_stop_times_url(*target))
+
+
+class StopTimesWatcher(object):
+    """
+    Watches the arrivals of many stops, polling each one when it is worth it instead of on a fixed timer.
+
+    After every poll of a stop, its next poll is scheduled from the earliest predicted arrival of the response,
+    measured from its actualDate (the clock of CRTM): a stop whose next vehicle arrives in 20 minutes is polled much
+    later than one whose next vehicle is arriving. The delay is that time multiplied by fraction, bounded by
+    min_interval and max_interval. Stops are kept in a heap by their next poll time, and the ones due at the same
+    time are polled concurrently.
+
+    Only stops whose arrivals changed are yielded.
+
+    Example:
+
+    .. code-block:: python
+
+        watcher = StopTimesWatcher([StopTimesTarget('8_17491', 'P', '8_17491'), ('4_276', 'P', '4_276')])
+
+        for change in watcher.watch():
+            print(change.cod_stop, [time['time'] for time in change.added])
+
+    :param list targets: StopTimesTarget objects or tuples with the arguments of stops.get_stop_times.
+    :param float min_interval: Minimum seconds between two polls of a stop. Optional, default: 15.
+    :param float max_interval: Maximum seconds between two polls of a stop. Also used when a stop has no arrivals.
+                               Optional, default: 300.
+    :param float fraction: Part of the time to the next arrival waited before polling again. Optional, default: 0.5.
+    :param int max_workers: Maximum number of requests running at the same time. Optional, default: 8.
+    """
+
+    def __init__(self, targets, min_interval=15, max_interval=300, fraction=0.5, max_workers=8):
+        self.targets = [StopTimesTarget(*target) for target in targets]
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.fraction = fraction
+        self.max_workers = max_workers
+
+        self.requests = 0
+        self.failures = 0
+
+    def next_delay(self, response):
+        """
+        Seconds to wait before polling a stop again.
+
+        :param dict response: Last response of stops.get_stop_times for the stop.
+        :return float: The delay.
+        """
+        stop_times = (response or {}).get('stopTimes') or {}
+        arrivals = [time_record.get('time') for time_record in as_list((stop_times.get('times') or {}).get('Time'))]
+        arrivals = [arrival for arrival in arrivals if arrival]
+
+        if not arrivals or not stop_times.get('actualDate'):
+            return self.max_interval
+
+        try:
+            now = _parse_date(stop_times['actualDate'])
+            first = min(_parse_date(arrival) for arrival in arrivals)
+        except ValueError:
+            return self.min_interval
+
+        delay = (first - now).total_seconds() * self.fraction
+
+        return min(self.max_interval, max(self.min_interval, delay))
+
+    def watch(self, max_polls=None):
+        """
+        Polls the stops forever (or max_polls requests) and yields the changes of their arrivals.
+
+        :param int max_polls: Number of requests before stopping. Optional, default: None (polls forever).
+        :return: Generator of StopTimesChange objects.
+        """
+        counter = itertools.count()
+        now = time.monotonic()
+        heap = [(now, next(counter), target) for target in self.targets]
+        heapq.heapify(heap)
+        known = {}
+        polls = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while heap and (max_polls is None or polls < max_polls):
+                wait = heap[0][0] - time.monotonic()
+
+                if wait > 0:
+                    time.sleep(wait)
+
+                now = time.monotonic()
+                due = []
+
+                while heap and heap[0][0] <= now and (max_polls is None or polls + len(due) < max_polls):
+                    due.append(heapq.heappop(heap)[2])
+
+                futures = [(target, executor.submit(_poll, target)) for target in due]
+                polls += len(due)
+
+                for target, future in futures:
+                    self.requests += 1
+
+                    try:
+                        response = future.result()
+                    except Exception:
+                        self.failures += 1
+                        heapq.heappush(heap, (time.monotonic() + self.min_interval, next(counter), target))
+
+                        continue
+
+                    delay = self.next_delay(response)
+                    heapq.heappush(heap, (time.monotonic() + delay, next(counter), target))
+
+                    stop_times = (response or {}).get('stopTimes') or {}
+                    times = as_list((stop_times.get('times') or {}).get('Time'))
+                    current = {_arrival_key(time_record): time_record for time_record in times}
+                    previous = known.get(target.cod_stop, {})
+                    known[target.cod_stop] = current
+
+                    added = [current[key] for key in current.keys() - previous.keys()]
+                    removed = [previous[key] for key in previous.keys() - current.keys()]
+
+                    if added or removed:
+                        yield StopTimesChange(target.cod_stop, stop_times.get('actualDate'), times,
+                                              sorted(added, key=lambda time_record: time_record.get('time') or ''),
+                                              sorted(removed, key=lambda time_record: time_record.get('time') or ''),
+                                              delay)
+
+
+def watch_stop_times(targets, max_polls=None, **kwargs):
+    """
+    Watches the arrivals of many stops. See StopTimesWatcher for the accepted arguments.
+
+    :param list targets: StopTimesTarget objects or tuples with the arguments of stops.get_stop_times.
+    :param int max_polls: Number of requests before stopping. Optional, default: None (polls forever).
+    :return: Generator of StopTimesChange objects.
+    """
+    return StopTimesWatcher(targets, **kwargs).watch(max_polls=max_polls)
@@ -0,0 +1,243 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+import zlib
+
+from citram_api.utils.json_decoder import loads
+from citram_api.utils.transport import endpoint_name
+
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+DEFAULT_TTLS = {
+    'GetModes.php': 7 * DAY,
+    'GetMunicipalities.php': 7 * DAY,
+    'GetLines.php': DAY,
+    'GetLinesInformation.php': DAY,
+    'GetStops.php': DAY,
+}
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    cod_line TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_cod_line ON entries (cod_line);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS line_versions (
+    cod_line TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+);
+'''
+
+
+def _cod_line(url):
+    cod_lines = parse_qs(urlsplit(url).query).get('codLine')
+
+    return cod_lines[0] if cod_lines else None
+
+
+def _line_records(data):
+    lines = (data or {}).get('lines') or {}
+    records = lines.get('Line', lines.get('LineInformation'))
+
+    if isinstance(records, dict):
+        records = [records]
+
+    return [record for record in records or [] if isinstance(record, dict) and 'codLine' in record]
+
+
+class CatalogCache(object):
+    """
+    Persistent cache of the responses of the endpoints whose data rarely changes (transport modes, municipalities,
+    lines, line information and stops). The responses are stored compressed in a SQLite database, so they survive
+    restarts and can be shared by several processes.
+
+    Every endpoint has its own time to live. When the database grows over max_bytes, the least recently used
+    responses are evicted. Whenever a line list is received, the updateDate and updateKmlDate of each line are
+    compared with the ones seen before, and the cached responses of the lines that changed are dropped.
+
+    Usually it is enabled with enable_catalog_cache, so every request of the library uses it.
+
+    :param str path: Path of the SQLite database. Optional, default: catalog.sqlite in the cache directory.
+    :param dict ttls: Time to live in seconds by endpoint name (i.e. GetStops.php). It is merged with DEFAULT_TTLS,
+                      a ttl of None or 0 disables the cache for that endpoint. Optional, default: None.
+    :param int max_bytes: Maximum size of the stored responses (compressed). Optional, default: 256 MB.
+    """
+
+    def __init__(self, path=None, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        if path is None:
+            from citram_api.utils.utils import get_cache_dir
+
+            os.makedirs(get_cache_dir(), exist_ok=True)
+            path = os.path.join(get_cache_dir(), 'catalog.sqlite')
+
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_bytes = max_bytes
+
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        with self._connection as conn:
+            conn.executescript(_SCHEMA)
+
+    @property
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+
+        return conn
+
+    def ttl(self, url):
+        """
+        Time to live of the responses of an url.
+
+        :param str url: Url of a request.
+        :return float: Seconds the response is kept, or None if the endpoint isn't cached.
+        """
+        return self.ttls.get(endpoint_name(url)) or None
+
+    def get(self, url):
+        """
+        Returns the cached response of an url, if there is a fresh one.
+
+        :param str url: Url of a request.
+        :return dict: The cached response, or None.
+        """
+        ttl = self.ttl(url)
+
+        if ttl is None:
+            return None
+
+        now = time.time()
+        row = self._connection.execute('SELECT body, stored_at FROM entries WHERE url = ?', (url,)).fetchone()
+
+        if row is None or now - row[1] > ttl:
+            return None
+
+        with self._write_lock, self._connection as conn:
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (now, url))
+
+        return loads(zlib.decompress(row[0]))
+
+    def put(self, url, data):
+        """
+        Stores the response of an url, if its endpoint is cached.
+
+        :param str url: Url of a request.
+        :param dict data: The decoded response.
+        """
+        if self.ttl(url) is None:
+            return
+
+        body = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+
+        with self._write_lock, self._connection as conn:
+            self._invalidate_changed_lines(conn, url, data)
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (url, endpoint_name(url), _cod_line(url), body, len(body), now, now))
+            self._evict(conn)
+
+    def invalidate_line(self, cod_line):
+        """
+        Drops every cached response of a line (line information and line lookups by code).
+
+        :param str cod_line: Line id.
+        """
+        with self._write_lock, self._connection as conn:
+            conn.execute('DELETE FROM entries WHERE cod_line = ?', (cod_line,))
+
+    def clear(self):
+        """
+        Drops every cached response.
+        """
+        with self._write_lock, self._connection as conn:
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM line_versions')
+
+    def _invalidate_changed_lines(self, conn, url, data):
+        for line in _line_records(data):
+            if 'updateDate' not in line:
+                continue
+
+            cod_line = line['codLine']
+            version = '{}|{}'.format(line.get('updateDate'), line.get('updateKmlDate'))
+            row = conn.execute('SELECT version FROM line_versions WHERE cod_line = ?', (cod_line,)).fetchone()
+
+            if row is not None and row[0] != version:
+                conn.execute('DELETE FROM entries WHERE cod_line = ? AND url != ?', (cod_line, url))
+
+            if row is None or row[0] != version:
+                conn.execute('INSERT OR REPLACE INTO line_versions VALUES (?, ?)', (cod_line, version))
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+        if total <= self.max_bytes:
+            return
+
+        for url, size in conn.execute('SELECT url, size FROM entries ORDER BY accessed_at').fetchall():
+            conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            total -= size
+
+            if total <= self.max_bytes:
+                break
+
+
+_catalog_cache = None
+
+
+def get_catalog_cache():
+    """
+    Returns the catalog cache used by the requests of the library.
+
+    :return CatalogCache: The catalog cache, or None if it isn't enabled.
+    """
+    return _catalog_cache
+
+
+def enable_catalog_cache(path=None, ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Enables the persistent catalog cache for every request of the library. See CatalogCache for the arguments.
+
+    Example:
+
+    .. code-block:: python
+
+        enable_catalog_cache(ttls={'GetStops.php': 12 * HOUR})
+        get_stops_by_municipality(Municipalities.MADRID.value)  # Only requested to CRTM the first time.
+
+    :return CatalogCache: The enabled cache.
+    """
+    global _catalog_cache
+
+    _catalog_cache = CatalogCache(path=path, ttls=ttls, max_bytes=max_bytes)
+
+    return _catalog_cache
+
+
+def disable_catalog_cache():
+    """
+    Disables the persistent catalog cache. The stored responses are kept on disk.
+    """
+    global _catalog_cache
+
+    _catalog_cache = None
@@ -1,3 +1,13 @@
 class NotEnoughParametersException(Exception):
     def __init__(self, message):
         super().__init__(message)
+
+
+class DeadlineExceededException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class ReplayMissException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
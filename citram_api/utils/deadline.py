@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+import contextvars
+import time
+
+from citram_api.utils.custom_exceptions import DeadlineExceededException
+
+
+_deadline = contextvars.ContextVar('citram_api_deadline', default=None)
+
+
+class Deadline(object):
+    """
+    Point in time by which a call must be finished.
+
+    :param float seconds: Seconds from now.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """
+        :return float: Seconds left, 0 if the deadline has passed.
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self):
+        """
+        :raises DeadlineExceededException: If the deadline has passed.
+        """
+        if self.expired:
+            raise DeadlineExceededException('Deadline of {} seconds exceeded.'.format(self.seconds))
+
+
+def current_deadline():
+    """
+    :return Deadline: The innermost deadline of the calling thread or asyncio task, or None if there is none.
+    """
+    return _deadline.get()
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Limits the time every request of the library made inside the block can take, retries and hedged requests
+    included. When the time runs out the request fails with DeadlineExceededException. Nested deadlines can only
+    shorten the outer one.
+
+    Deadlines are per thread and per asyncio task: they don't apply to requests made from other threads, nor from
+    other tasks than the ones created inside the block.
+
+    Example:
+
+    .. code-block:: python
+
+        with deadline(1.5):
+            times = get_stop_times(cod_stop, 'P', cod_stop)
+
+    :param float seconds: Time budget in seconds.
+    :return Deadline: The active deadline.
+    """
+    new = Deadline(seconds)
+    outer = current_deadline()
+
+    if outer is not None and outer.expires_at < new.expires_at:
+        new.expires_at = outer.expires_at
+
+    token = _deadline.set(new)
+
+    try:
+        yield new
+    finally:
+        _deadline.reset(token)
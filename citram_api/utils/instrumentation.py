@@ -0,0 +1,308 @@
+from bisect import bisect_left
+import threading
+import time
+
+from citram_api.utils.transport import endpoint_name
+
+
+HIT = 'hit'
+MISS = 'miss'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+DECODE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+class RequestRecord(object):
+    """
+    Measures of a request made through the library, passed to the hooks when it finishes.
+
+    - endpoint: Name of the endpoint, i.e. GetStopsTimes.php.
+    - url: Requested url.
+    - latency: Seconds the call took, caches included.
+    - bytes: Size of the body received, None if nothing was received.
+    - status: Status code of the response, None if nothing was received.
+    - decode_time: Seconds spent decoding the JSON body, 0 if it wasn't decoded.
+    - cache: HIT if a cache answered, MISS if a cache was consulted but CRTM was requested, None if no cache applies.
+    - error: The exception raised, if any.
+    """
+    __slots__ = ('endpoint', 'url', 'started_at', 'latency', 'bytes', 'status', 'decode_time', 'cache', 'error')
+
+    def __init__(self, url):
+        self.endpoint = endpoint_name(url)
+        self.url = url
+        self.started_at = time.monotonic()
+        self.latency = None
+        self.bytes = None
+        self.status = None
+        self.decode_time = 0.0
+        self.cache = None
+        self.error = None
+
+    def finish(self, error=None):
+        self.latency = time.monotonic() - self.started_at
+        self.error = error
+
+        for hook in list(_hooks):
+            try:
+                hook(self)
+            except Exception:
+                # A broken hook must not break the requests.
+                pass
+
+
+def has_hooks():
+    """
+    :return bool: Whether any hook is registered.
+    """
+    return bool(_hooks)
+
+
+def add_hook(hook):
+    """
+    Registers a function called with a RequestRecord after every request made through the library.
+
+    Example:
+
+    .. code-block:: python
+
+        add_hook(lambda record: print(record.endpoint, record.status, record.latency))
+
+    :param hook: Function taking a RequestRecord. It runs in the thread that made the request, so it should be quick.
+    """
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """
+    Unregisters a hook registered with add_hook.
+
+    :param hook: The hook.
+    """
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+class Histogram(object):
+    """
+    Histogram with fixed buckets, as in Prometheus: the count of observations less than or equal to each bucket
+    bound, plus their sum and count.
+
+    :param tuple buckets: Upper bounds of the buckets, in increasing order.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        :return list: Tuples of bucket bound and number of observations less than or equal to it, the last bound
+                      being infinity.
+        """
+        total, result = 0, []
+
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+
+        return result
+
+    def quantile(self, q):
+        """
+        :param float q: Quantile between 0 and 1.
+        :return float: Upper bound of the bucket where the quantile falls, None if there are no observations.
+        """
+        if not self.count:
+            return None
+
+        for bound, total in self.cumulative():
+            if total >= q * self.count:
+                return bound
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for key, value in sorted(labels.items())) + '}'
+
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsCollector(object):
+    """
+    Hook keeping in-memory metrics by endpoint: histograms of latency, response size and decode time, and counters
+    of requests by status code, errors and cache hits and misses. Usually it is registered with enable_metrics.
+
+    Example:
+
+    .. code-block:: python
+
+        metrics = enable_metrics()
+        get_stop_times(...)
+        metrics.snapshot()['GetStopsTimes.php']['latency']['p99']
+        print(metrics.prometheus_text())
+
+    :param str prefix: Prefix of the metric names in the Prometheus exposition. Optional, default: citram_api.
+    """
+
+    def __init__(self, prefix='citram_api'):
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _metrics(self, endpoint):
+        metrics = self._endpoints.get(endpoint)
+
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = {'latency': Histogram(LATENCY_BUCKETS),
+                                                   'bytes': Histogram(SIZE_BUCKETS),
+                                                   'decode': Histogram(DECODE_BUCKETS),
+                                                   'status': {}, 'errors': 0, 'cache': {HIT: 0, MISS: 0}}
+
+        return metrics
+
+    def __call__(self, record):
+        with self._lock:
+            metrics = self._metrics(record.endpoint)
+            metrics['latency'].observe(record.latency)
+
+            if record.bytes is not None:
+                metrics['bytes'].observe(record.bytes)
+
+            if record.decode_time:
+                metrics['decode'].observe(record.decode_time)
+
+            if record.status is not None:
+                metrics['status'][record.status] = metrics['status'].get(record.status, 0) + 1
+
+            if record.error is not None:
+                metrics['errors'] += 1
+
+            if record.cache is not None:
+                metrics['cache'][record.cache] += 1
+
+    def snapshot(self):
+        """
+        :return dict: Metrics by endpoint: number of requests, errors, requests by status code, cache hits and
+                      misses, and count, sum and p50/p90/p99 (bucket bounds) of latency, bytes and decode time.
+        """
+        with self._lock:
+            snapshot = {}
+
+            for endpoint, metrics in self._endpoints.items():
+                snapshot[endpoint] = {'requests': metrics['latency'].count, 'errors': metrics['errors'],
+                                      'status': dict(metrics['status']), 'cache': dict(metrics['cache'])}
+
+                for name in ('latency', 'bytes', 'decode'):
+                    histogram = metrics[name]
+                    snapshot[endpoint][name] = {'count': histogram.count, 'sum': histogram.sum,
+                                                'p50': histogram.quantile(0.5), 'p90': histogram.quantile(0.9),
+                                                'p99': histogram.quantile(0.99)}
+
+            return snapshot
+
+    def prometheus_text(self):
+        """
+        :return str: The metrics in the Prometheus text exposition format.
+        """
+        histograms = (('latency', 'request_duration_seconds', 'Duration of the requests, caches included.'),
+                      ('bytes', 'response_size_bytes', 'Size of the bodies received.'),
+                      ('decode', 'decode_duration_seconds', 'Time spent decoding JSON bodies.'))
+        lines = []
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+
+            for key, name, description in histograms:
+                name = '{}_{}'.format(self.prefix, name)
+                lines += ['# HELP {} {}'.format(name, description), '# TYPE {} histogram'.format(name)]
+
+                for endpoint, metrics in endpoints:
+                    histogram = metrics[key]
+
+                    for bound, total in histogram.cumulative():
+                        lines.append('{}_bucket{} {}'.format(name, _labels(endpoint=endpoint, le=_number(bound)),
+                                                             total))
+
+                    lines.append('{}_sum{} {}'.format(name, _labels(endpoint=endpoint), _number(histogram.sum)))
+                    lines.append('{}_count{} {}'.format(name, _labels(endpoint=endpoint), histogram.count))
+
+            name = '{}_responses_total'.format(self.prefix)
+            lines += ['# HELP {} Responses by status code.'.format(name), '# TYPE {} counter'.format(name)]
+            lines += ['{}{} {}'.format(name, _labels(endpoint=endpoint, status=status), count)
+                      for endpoint, metrics in endpoints for status, count in sorted(metrics['status'].items())]
+
+            name = '{}_errors_total'.format(self.prefix)
+            lines += ['# HELP {} Requests that raised an exception.'.format(name), '# TYPE {} counter'.format(name)]
+            lines += ['{}{} {}'.format(name, _labels(endpoint=endpoint), metrics['errors'])
+                      for endpoint, metrics in endpoints]
+
+            name = '{}_cache_total'.format(self.prefix)
+            lines += ['# HELP {} Cache lookups by result.'.format(name), '# TYPE {} counter'.format(name)]
+            lines += ['{}{} {}'.format(name, _labels(endpoint=endpoint, result=result), count)
+                      for endpoint, metrics in endpoints for result, count in sorted(metrics['cache'].items())]
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+_metrics = None
+
+
+def get_metrics():
+    """
+    :return MetricsCollector: The collector registered with enable_metrics, or None if it isn't enabled.
+    """
+    return _metrics
+
+
+def enable_metrics(prefix='citram_api'):
+    """
+    Registers a MetricsCollector hook for every request of the library.
+
+    :param str prefix: Prefix of the metric names in the Prometheus exposition. Optional, default: citram_api.
+    :return MetricsCollector: The registered collector.
+    """
+    global _metrics
+
+    disable_metrics()
+    _metrics = MetricsCollector(prefix)
+    add_hook(_metrics)
+
+    return _metrics
+
+
+def disable_metrics():
+    """
+    Unregisters the collector registered with enable_metrics.
+    """
+    global _metrics
+
+    if _metrics is not None:
+        remove_hook(_metrics)
+        _metrics = None
+
+
+def prometheus_text():
+    """
+    :return str: The metrics of the collector registered with enable_metrics in the Prometheus text exposition
+                 format, empty if it isn't enabled.
+    """
+    return _metrics.prometheus_text() if _metrics is not None else ''
@@ -0,0 +1,95 @@
+import importlib
+import json
+import os
+import threading
+
+
+# Decoders tried, in order, when none is configured. All of them decode bytes directly.
+PREFERRED_DECODERS = ('orjson', 'ujson', 'json')
+
+_decoder_lock = threading.Lock()
+_decoder = None
+_decoder_name = None
+
+
+def _load_decoder(name):
+    if name == 'json':
+        # The stdlib detects the encoding of bytes itself.
+        return json.loads
+
+    return importlib.import_module(name).loads
+
+
+def available_decoders():
+    """
+    :return list: Names of the known JSON decoders that are installed, fastest first.
+    """
+    names = []
+
+    for name in PREFERRED_DECODERS:
+        try:
+            _load_decoder(name)
+        except ImportError:
+            continue
+
+        names.append(name)
+
+    return names
+
+
+def set_decoder(decoder=None):
+    """
+    Sets the function used to decode the JSON body of every response.
+
+    Example:
+
+    .. code-block:: python
+
+        set_decoder('json')  # Always use the stdlib
+        set_decoder(lambda body: simplejson.loads(body))
+
+    :param decoder: Name of a known decoder ('orjson', 'ujson' or 'json') or a function that takes the body as bytes
+                    and returns the decoded object. Optional, default: None (the environment variable
+                    CITRAM_API_JSON_DECODER if set, otherwise the fastest installed decoder).
+    :return str: The name of the decoder in use.
+    """
+    global _decoder, _decoder_name
+
+    if decoder is None:
+        decoder = os.environ.get('CITRAM_API_JSON_DECODER') or available_decoders()[0]
+
+    if callable(decoder):
+        loads, name = decoder, getattr(decoder, '__name__', repr(decoder))
+    elif decoder in PREFERRED_DECODERS:
+        loads, name = _load_decoder(decoder), decoder
+    else:
+        raise ValueError('Unknown JSON decoder: {}. Use one of: {}.'.format(decoder, ', '.join(PREFERRED_DECODERS)))
+
+    with _decoder_lock:
+        _decoder, _decoder_name = loads, name
+
+    return name
+
+
+def get_decoder():
+    """
+    :return str: The name of the decoder in use.
+    """
+    if _decoder is None:
+        set_decoder()
+
+    return _decoder_name
+
+
+def loads(body):
+    """
+    Decodes a JSON document with the configured decoder.
+
+    :param bytes body: The UTF-8 encoded document, i.e. the body of a response.
+    :return: The decoded object.
+    :raises ValueError: If the body isn't valid JSON.
+    """
+    if _decoder is None:
+        set_decoder()
+
+    return _decoder(body)
@@ -0,0 +1,119 @@
+import sys
+
+from citram_api.utils.utils import as_list
+
+
+# Keys whose value is a list when there are several items, but a single item (or nothing) when there is one.
+LIST_KEYS = frozenset(['Itinerary', 'Line', 'LineStatus', 'Mode', 'Municipality', 'Office', 'Stop', 'StopInformation',
+                       'Time', 'string'])
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+
+    return value
+
+
+class InternPool(object):
+    """
+    Pool of shared objects used by normalize. Equal embedded Line objects normalized with the same pool end up being
+    the same object, so a pool can be kept and reused to share them across responses too.
+    """
+
+    def __init__(self):
+        self._objects = {}
+
+    def __len__(self):
+        return len(self._objects)
+
+    def intern(self, value):
+        """
+        :param dict value: An embedded Line object.
+        :return dict: The shared object equal to value.
+        """
+        return self._objects.setdefault(_freeze(value), value)
+
+    def clear(self):
+        self._objects.clear()
+
+
+def _normalize(value, pool, in_place):
+    if isinstance(value, list):
+        items = [_normalize(item, pool, in_place) for item in value]
+
+        if not in_place:
+            return items
+
+        value[:] = items
+
+        return value
+
+    if not isinstance(value, dict):
+        return value
+
+    normalized = value if in_place else {}
+
+    for key, item in value.items():
+        if key in LIST_KEYS:
+            item = as_list(item)
+
+        normalized[key] = _normalize(item, pool, in_place)
+
+    value = normalized
+
+    if 'codStop' in value:
+        lines = value.get('lines')
+        cod_lines = value.get('codLines')
+
+        if isinstance(lines, dict):
+            lines['Line'] = [pool.intern(line) if isinstance(line, dict) else line
+                             for line in as_list(lines.get('Line'))]
+
+        if isinstance(cod_lines, dict):
+            cod_lines['Line'] = [sys.intern(cod_line) if isinstance(cod_line, str) else cod_line
+                                 for cod_line in as_list(cod_lines.get('Line'))]
+
+    if isinstance(value.get('line'), dict):
+        # Line of each stop time.
+        value['line'] = pool.intern(value['line'])
+
+    return value
+
+
+def normalize(response, pool=None, in_place=False):
+    """
+    Normalizes a response so it can be processed without checking its shape:
+
+    - Values that CRTM returns as a single item or as a list depending on the number of results (Line, Stop,
+      Itinerary, StopInformation, Time, Office...) are always lists.
+    - Line objects embedded in stops and stop times (i.e. in get_nearest_stops, get_line_info or get_stop_times) are
+      replaced by one shared object for each distinct line, and line ids in codLines are interned. This cuts the
+      memory of large responses considerably.
+
+    A normalized copy is returned and the response is left as it is, since responses can be shared: the realtime
+    cache and the catalog cache may return the same object to several callers, and the transport returns read-only
+    responses for its conditional endpoints. in_place normalizes the response itself, which saves the copy, but must
+    only be used on responses the caller owns, never on cached ones. Since the embedded lines are shared, modifying
+    one of them modifies it everywhere.
+
+    Example:
+
+    .. code-block:: python
+
+        line = normalize(get_line_info(create_line_cod(TransportModes.METRO.value, 10)))['lines']['LineInformation']
+
+        for itinerary in line['itinerary']['Itinerary']:
+            for stop in itinerary['stops']['StopInformation']:
+                stop['lines']['Line'][0]['codLine']
+
+    :param dict response: Response of any request.
+    :param InternPool pool: Pool of shared lines. Pass the same one to share lines across responses.
+                            Optional, default: None (a new pool for this response).
+    :param bool in_place: Whether the response itself is normalized instead of a copy. Optional, default: False.
+    :return dict: The normalized response.
+    """
+    return _normalize(response, pool if pool is not None else InternPool(), in_place)
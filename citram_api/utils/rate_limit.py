@@ -0,0 +1,117 @@
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket. Tokens are added at a constant rate up to the capacity of the bucket, and every
+    acquired token allows one request.
+
+    :param float rate: Tokens added per second.
+    :param float capacity: Maximum number of tokens, which is the size of the allowed bursts. Optional, default: the
+                           rate (one second worth of tokens), with a minimum of 1.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Takes tokens if they are available.
+
+        :param float tokens: Number of tokens to take. Optional, default: 1.
+        :return float: 0 if the tokens were taken, otherwise the seconds to wait until they will be available.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+
+                return 0.0
+
+            return (tokens - self._tokens) / self.rate
+
+    def peek(self, tokens=1):
+        """
+        Checks whether tokens are available, without taking them.
+
+        :param float tokens: Number of tokens. Optional, default: 1.
+        :return float: 0 if the tokens are available, otherwise the seconds to wait until they will be.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+
+            return 0.0 if self._tokens >= tokens else (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Takes tokens, waiting until they are available.
+
+        :param float tokens: Number of tokens to take. Optional, default: 1.
+        :return float: Seconds waited.
+        """
+        started_at = time.monotonic()
+        wait = self.try_acquire(tokens)
+
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.try_acquire(tokens)
+
+        return time.monotonic() - started_at
+
+
+class HostRateLimiter(object):
+    """
+    Rate limits requests by host, with one token bucket for each host.
+
+    :param float requests_per_second: Requests allowed per second to each host.
+    :param float burst: Requests that can be made at once after being idle. Optional, default: requests_per_second.
+    :param dict host_rates: Requests per second by host, for hosts that need a different limit. Keys are urls (only
+                            the host is used). Optional, default: None.
+    """
+
+    def __init__(self, requests_per_second, burst=None, host_rates=None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.host_rates = {urlsplit(url).netloc: rate for url, rate in (host_rates or {}).items()}
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        """
+        :param str url: Url of a request.
+        :return TokenBucket: The bucket of the host of that url.
+        """
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(host)
+
+                if bucket is None:
+                    rate = self.host_rates.get(host, self.requests_per_second)
+                    bucket = self._buckets[host] = TokenBucket(rate, self.burst)
+
+        return bucket
+
+    def acquire(self, url):
+        """
+        Waits until a request to the host of an url is allowed.
+
+        :param str url: Url of a request.
+        :return float: Seconds waited.
+        """
+        return self.bucket(url).acquire()
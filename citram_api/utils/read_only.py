@@ -0,0 +1,65 @@
+import copy
+
+
+def _read_only_error(*args, **kwargs):
+    raise TypeError('Shared responses are read-only, copy.deepcopy it to get one that can be modified.')
+
+
+class ReadOnlyDict(dict):
+    """
+    Dict that can't be modified, used for the responses shared by several callers. It is a dict in every other way,
+    so it can be read, compared and serialized like any other response. copy.copy and copy.deepcopy return plain,
+    modifiable dicts.
+    """
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = _read_only_error
+    clear = pop = popitem = setdefault = update = _read_only_error
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {key: copy.deepcopy(value, memo) for key, value in self.items()}
+
+    def __reduce__(self):
+        return ReadOnlyDict, (dict(self),)
+
+
+class ReadOnlyList(list):
+    """
+    List that can't be modified, the ReadOnlyDict counterpart for the lists of shared responses. copy.copy and
+    copy.deepcopy return plain, modifiable lists.
+    """
+
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only_error
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only_error
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(item, memo) for item in self]
+
+    def __reduce__(self):
+        return ReadOnlyList, (list(self),)
+
+
+def read_only(value):
+    """
+    Read-only version of a decoded JSON value: dicts and lists are converted to ReadOnlyDict and ReadOnlyList all
+    the way down, other values are immutable already.
+
+    :param value: A decoded JSON value.
+    :return: The read-only value.
+    """
+    if isinstance(value, dict):
+        return ReadOnlyDict((key, read_only(item)) for key, item in value.items())
+
+    if isinstance(value, list):
+        return ReadOnlyList(read_only(item) for item in value)
+
+    return value
@@ -0,0 +1,231 @@
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import threading
+import time
+
+from citram_api.utils.custom_exceptions import DeadlineExceededException
+from citram_api.utils.deadline import current_deadline
+from citram_api.utils.transport import endpoint_name
+
+
+DEFAULT_ENDPOINTS = ('GetStopsTimes.php', 'GetLineLocation.php')
+
+
+class RealtimeCache(object):
+    """
+    Short lived in-memory cache for the realtime endpoints (stop times and line locations).
+
+    Responses are kept for a few seconds in a LRU. Identical requests made while one is already in flight don't
+    reach CRTM: they wait for that request and get its result (single-flight), both from threads and from asyncio
+    tasks. The cached responses are shared by every caller, so they must not be modified.
+
+    Usually it is enabled with enable_realtime_cache, so every request of the library uses it.
+
+    :param float ttl: Seconds a response is reused. Optional, default: 3.
+    :param int max_entries: Maximum number of responses kept. Optional, default: 4096.
+    :param tuple endpoints: Names of the endpoints to cache. Optional, default: GetStopsTimes.php and
+                            GetLineLocation.php.
+    """
+
+    def __init__(self, ttl=3, max_entries=4096, endpoints=DEFAULT_ENDPOINTS):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.endpoints = frozenset(endpoints)
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._async_in_flight = {}
+
+    def handles(self, url):
+        """
+        :param str url: Url of a request.
+        :return bool: Whether the responses of that url are cached.
+        """
+        return endpoint_name(url) in self.endpoints
+
+    def _lookup(self, url, now):
+        entry = self._entries.get(url)
+
+        if entry is None:
+            return False, None
+
+        expires_at, data = entry
+
+        if expires_at < now:
+            del self._entries[url]
+
+            return False, None
+
+        self._entries.move_to_end(url)
+
+        return True, data
+
+    def _store(self, url, data):
+        with self._lock:
+            self._entries[url] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(url)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_fetch(self, url, fetch):
+        """
+        Returns the cached response of an url or calls fetch to get it. Concurrent calls for the same url only call
+        fetch once.
+
+        :param str url: Url of a request.
+        :param fetch: Function without arguments returning the response of the url.
+        :return dict: The response.
+        """
+        with self._lock:
+            found, data = self._lookup(url, time.monotonic())
+
+            if found:
+                self.hits += 1
+
+                return data
+
+            future = self._in_flight.get(url)
+            owner = future is None
+
+            if owner:
+                self.misses += 1
+                future = self._in_flight[url] = Future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            budget = current_deadline()
+
+            if budget is None:
+                return future.result()
+
+            try:
+                return future.result(timeout=budget.remaining())
+            except FutureTimeoutError:
+                raise DeadlineExceededException('Deadline of {} seconds exceeded.'.format(budget.seconds))
+
+        try:
+            data = fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._store(url, data)
+            future.set_result(data)
+
+            return data
+        finally:
+            with self._lock:
+                self._in_flight.pop(url, None)
+
+    async def get_or_fetch_async(self, url, fetch):
+        """
+        Awaitable version of get_or_fetch. Concurrent tasks of the same event loop requesting the same url only
+        await fetch once.
+
+        :param str url: Url of a request.
+        :param fetch: Function without arguments returning an awaitable with the response of the url.
+        :return dict: The response.
+        """
+        loop = asyncio.get_event_loop()
+        key = (id(loop), url)
+
+        with self._lock:
+            found, data = self._lookup(url, time.monotonic())
+
+            if found:
+                self.hits += 1
+
+                return data
+
+            future = self._async_in_flight.get(key)
+            owner = future is None
+
+            if owner:
+                self.misses += 1
+                future = self._async_in_flight[key] = loop.create_future()
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return await asyncio.shield(future)
+
+        try:
+            data = await fetch()
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it so asyncio doesn't warn when nobody else was waiting.
+            future.exception()
+            raise
+        else:
+            self._store(url, data)
+            future.set_result(data)
+
+            return data
+        finally:
+            with self._lock:
+                self._async_in_flight.pop(key, None)
+
+    def stats(self):
+        """
+        :return dict: Number of hits, misses (requests made), coalesced requests and cached entries.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'entries': len(self._entries)}
+
+    def clear(self):
+        """
+        Drops every cached response. The counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+_realtime_cache = None
+
+
+def get_realtime_cache():
+    """
+    Returns the realtime cache used by the requests of the library.
+
+    :return RealtimeCache: The realtime cache, or None if it isn't enabled.
+    """
+    return _realtime_cache
+
+
+def enable_realtime_cache(ttl=3, max_entries=4096, endpoints=DEFAULT_ENDPOINTS):
+    """
+    Enables the realtime cache for every request of the library. See RealtimeCache for the arguments.
+
+    Example:
+
+    .. code-block:: python
+
+        cache = enable_realtime_cache(ttl=2)
+        ...
+        cache.stats()  # {'hits': 1250, 'misses': 87, 'coalesced': 311, 'entries': 42}
+
+    :return RealtimeCache: The enabled cache.
+    """
+    global _realtime_cache
+
+    _realtime_cache = RealtimeCache(ttl=ttl, max_entries=max_entries, endpoints=endpoints)
+
+    return _realtime_cache
+
+
+def disable_realtime_cache():
+    """
+    Disables the realtime cache.
+    """
+    global _realtime_cache
+
+    _realtime_cache = None
@@ -0,0 +1,357 @@
+import hashlib
+import io
+import json
+import struct
+import threading
+import time
+import zlib
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from citram_api.constants.hosts import Urls
+from citram_api.utils.custom_exceptions import ReplayMissException
+from citram_api.utils.transport import Transport, get_transport, set_transport
+
+
+MAGIC = b'CRTMARC1'
+
+# Response headers kept in the archive. The rest aren't used by the library.
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+# Request headers removed while recording.
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+_TRAILER = struct.Struct('<QQ')
+
+_previous_transport = None
+_previous_transport_lock = threading.Lock()
+
+
+def _body_digest(body):
+    if not body:
+        return ''
+
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    return hashlib.sha1(body).hexdigest()
+
+
+class Archive(object):
+    """
+    Requests and the raw bytes of their responses, to be replayed later without network access.
+
+    Each request is identified by its method, url and a digest of its body, so the SOAP exchanges of
+    get_ttp_card_info are told apart by card number. A request recorded several times is replayed with its responses
+    in the same order, and the last one is repeated once they run out.
+
+    The file is compact: every distinct body is stored once, compressed, followed by a compressed index of the
+    requests. Loading an archive decompresses everything into memory, so replaying a response is a dictionary lookup.
+
+    :param str path: File the archive is saved to. Optional, default: None.
+    :param latency: Seconds every replayed response is delayed, or a function of the url returning them. Optional,
+                    default: None (no delay).
+    """
+
+    def __init__(self, path=None, latency=None):
+        self.path = path
+        self.latency = latency
+        self.replaying = False
+
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._positions = {}
+
+    @classmethod
+    def load(cls, path, latency=None):
+        """
+        Loads a saved archive to replay it.
+
+        :param str path: File of the archive.
+        :param latency: Seconds every replayed response is delayed, or a function of the url returning them.
+                        Optional, default: None (no delay).
+        :return Archive: The loaded archive.
+        :raises ValueError: If the file isn't an archive.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if data[:len(MAGIC)] != MAGIC or len(data) < len(MAGIC) + _TRAILER.size:
+            raise ValueError('{} is not a citram_api archive.'.format(path))
+
+        index_offset, index_size = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+        index = json.loads(zlib.decompress(data[index_offset:index_offset + index_size]).decode('utf-8'))
+        bodies = [zlib.decompress(data[offset:offset + size]) for offset, size in index['bodies']]
+
+        archive = cls(path, latency)
+        archive.replaying = True
+
+        for method, url, digest, responses in index['requests']:
+            archive._responses[(method, url, digest)] = [(status, headers, bodies[body])
+                                                         for status, headers, body in responses]
+
+        return archive
+
+    def adapter(self, adapter):
+        """
+        :param requests.adapters.BaseAdapter adapter: Adapter that sends the requests to the network.
+        :return requests.adapters.BaseAdapter: An adapter that replays the archive, or one that records the
+                                               responses of the given adapter in it.
+        """
+        if self.replaying:
+            return ReplayAdapter(self)
+
+        return RecordingAdapter(self, adapter)
+
+    def delay(self, url):
+        """
+        :param str url: Url of a request.
+        :return float: Seconds the replayed response of that url is delayed.
+        """
+        if self.latency is None:
+            return 0
+
+        return self.latency(url) if callable(self.latency) else self.latency
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(responses) for responses in self._responses.values())
+
+    def add(self, method, url, request_body, status, headers, body):
+        """
+        Records a response.
+
+        :param str method: Method of the request, i.e. 'GET'.
+        :param str url: Url of the request.
+        :param bytes request_body: Body of the request, None for GET requests.
+        :param int status: Status code of the response.
+        :param dict headers: Headers of the response. Only RECORDED_HEADERS are kept.
+        :param bytes body: Raw body of the response.
+        """
+        headers = {name: headers[name] for name in RECORDED_HEADERS if headers.get(name) is not None}
+        key = (method, url, _body_digest(request_body))
+
+        with self._lock:
+            self._responses.setdefault(key, []).append((status, headers, body))
+
+    def response(self, method, url, request_body=None):
+        """
+        Returns the next recorded response of a request.
+
+        :param str method: Method of the request, i.e. 'GET'.
+        :param str url: Url of the request.
+        :param bytes request_body: Body of the request, None for GET requests.
+        :return tuple: Status code, headers and raw body of the response.
+        :raises ReplayMissException: If the request wasn't recorded.
+        """
+        key = (method, url, _body_digest(request_body))
+        responses = self._responses.get(key)
+
+        if responses is None:
+            raise ReplayMissException('{} {} is not in the archive.'.format(method, url))
+
+        if len(responses) == 1:
+            return responses[0]
+
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+
+        return responses[min(position, len(responses) - 1)]
+
+    def save(self, path=None):
+        """
+        Writes the archive to a file.
+
+        :param str path: File to write. Optional, default: the path of the archive.
+        """
+        path = path or self.path
+        bodies, body_indexes, requests = [], {}, []
+
+        with self._lock:
+            items = [(key, list(responses)) for key, responses in self._responses.items()]
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            offset = len(MAGIC)
+
+            for (method, url, digest), responses in items:
+                recorded = []
+
+                for status, headers, body in responses:
+                    body_digest = hashlib.sha1(body).digest()
+
+                    if body_digest not in body_indexes:
+                        compressed = zlib.compress(body)
+                        f.write(compressed)
+                        body_indexes[body_digest] = len(bodies)
+                        bodies.append((offset, len(compressed)))
+                        offset += len(compressed)
+
+                    recorded.append((status, headers, body_indexes[body_digest]))
+
+                requests.append((method, url, digest, recorded))
+
+            index = zlib.compress(json.dumps({'bodies': bodies, 'requests': requests},
+                                             separators=(',', ':')).encode('utf-8'))
+            f.write(index)
+            f.write(_TRAILER.pack(offset, len(index)))
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Requests adapter that sends the requests through another adapter and records their responses in an archive.
+    Conditional headers are removed, so every response is recorded with its body.
+    """
+
+    def __init__(self, archive, adapter):
+        super().__init__()
+        self.archive = archive
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        if any(header in request.headers for header in CONDITIONAL_HEADERS):
+            # A 304 has no body to replay, so the archive always gets the whole response.
+            request = request.copy()
+
+            for header in CONDITIONAL_HEADERS:
+                request.headers.pop(header, None)
+
+        response = self.adapter.send(request, **kwargs)
+        # Reading the content here keeps streamed responses working: requests iterates the content already read.
+        self.archive.add(request.method, request.url, request.body, response.status_code, response.headers,
+                         response.content)
+
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Requests adapter that answers the requests with the responses of an archive, delayed by its latency, without
+    network access.
+    """
+
+    def __init__(self, archive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        status, headers, body = self.archive.response(request.method, request.url, request.body)
+        delay = self.archive.delay(request.url)
+
+        if delay > 0:
+            time.sleep(delay)
+
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response._content = body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+
+        return response
+
+    def close(self):
+        pass
+
+
+def enable_recording(path, **kwargs):
+    """
+    Replaces the shared transport with one that records every response it receives, SOAP card queries included.
+    Call disable_archive to write the archive. If another archive was being recorded, it is written first.
+
+    Responses answered by the catalog or realtime caches aren't recorded, so they should be disabled while recording.
+    The WSDL of the card service is requested through the transport too, instead of being read from its cache.
+
+    Example:
+
+    .. code-block:: python
+
+        enable_recording('crtm.archive')
+        get_stop_times('8_17491', 'P', '8_17491')
+        disable_archive()
+
+    :param str path: File the archive is written to.
+    :param kwargs: Arguments of the new Transport.
+    :return Archive: The archive being recorded.
+    """
+    archive = Archive(path)
+    kwargs.setdefault('host_pool_sizes', {Urls.CITRAM_WIDGET_SERVICE.value: 32})
+    _replace_transport(Transport(archive=archive, **kwargs))
+
+    return archive
+
+
+def enable_replay(path, latency=None, **kwargs):
+    """
+    Replaces the shared transport with one that answers every request from an archive held in memory, without
+    network access. Requests that weren't recorded raise ReplayMissException.
+
+    Example:
+
+    .. code-block:: python
+
+        enable_replay('crtm.archive', latency=0.05)
+
+    :param str path: File of the archive.
+    :param latency: Seconds every response is delayed, or a function of the url returning them. Optional, default:
+                    None (no delay).
+    :param kwargs: Arguments of the new Transport.
+    :return Archive: The archive being replayed.
+    """
+    archive = Archive.load(path, latency)
+    _replace_transport(Transport(archive=archive, **kwargs))
+
+    return archive
+
+
+def _save_recording():
+    archive = get_transport().archive
+
+    if archive is not None and not archive.replaying:
+        archive.save()
+
+
+def _replace_transport(transport):
+    global _previous_transport
+
+    with _previous_transport_lock:
+        # Enabling an archive twice keeps the transport that was there before the first one, and writes the archive
+        # being recorded, if any, which would be lost otherwise.
+        if _previous_transport is None:
+            _previous_transport = get_transport()
+        else:
+            _save_recording()
+
+        set_transport(transport)
+
+
+def disable_archive(**kwargs):
+    """
+    Puts back the shared transport that was there before enable_recording or enable_replay, with its settings. A
+    recorded archive is written to its file.
+
+    :param kwargs: Arguments of a new Transport to use instead of the previous one. Optional.
+    """
+    global _previous_transport
+
+    _save_recording()
+
+    with _previous_transport_lock:
+        previous, _previous_transport = _previous_transport, None
+
+        if kwargs or previous is None:
+            kwargs.setdefault('host_pool_sizes', {Urls.CITRAM_WIDGET_SERVICE.value: 32})
+            previous = Transport(**kwargs)
+
+        set_transport(previous)
@@ -0,0 +1,299 @@
+import bisect
+from contextlib import contextmanager
+import contextvars
+import itertools
+import threading
+import time
+from urllib.parse import urlsplit
+
+from citram_api.utils.custom_exceptions import DeadlineExceededException
+from citram_api.utils.deadline import current_deadline
+from citram_api.utils.rate_limit import TokenBucket
+from citram_api.utils.transport import endpoint_name
+
+
+REALTIME = 0
+BULK = 1
+
+PRIORITY_NAMES = {REALTIME: 'realtime', BULK: 'bulk'}
+
+_priority = contextvars.ContextVar('citram_api_priority', default=REALTIME)
+
+
+def current_priority():
+    """
+    :return int: Priority of the requests made by the calling thread or asyncio task, REALTIME unless changed with
+                 priority.
+    """
+    return _priority.get()
+
+
+@contextmanager
+def priority(level):
+    """
+    Sets the priority of every request of the library made inside the block by the calling thread, or by the calling
+    asyncio task (tasks created inside the block inherit it, other tasks of the same loop don't).
+
+    Example:
+
+    .. code-block:: python
+
+        with priority(BULK):
+            for cod_line in cod_lines:
+                get_line_info(cod_line)
+
+    :param int level: REALTIME or BULK.
+    """
+    token = _priority.set(level)
+
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _new_metrics():
+    return {level: {'requests': 0, 'queued': 0, 'max_queued': 0, 'wait_time': 0.0, 'max_wait_time': 0.0}
+            for level in PRIORITY_NAMES}
+
+
+class _HostQueue(object):
+    """
+    Requests waiting for a host, in a single priority queue whatever their endpoint. A request goes out once both
+    the bucket of the host and the bucket of its endpoint have a token, and no request ahead of it in the queue can
+    go out.
+    """
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.condition = threading.Condition()
+        self.waiters = []
+        self.endpoint_buckets = {}
+        self.metrics = {}
+
+    def _blocked(self, waiter, endpoint):
+        """
+        Whether a request ahead of the waiter could take the token it needs.
+        """
+        for other in self.waiters:
+            if other is waiter:
+                return False
+
+            other_endpoint = other[2]
+
+            if self.bucket is None and other_endpoint != endpoint:
+                # Without a host budget, requests of other endpoints don't compete for tokens.
+                continue
+
+            other_bucket = self.endpoint_buckets[other_endpoint]
+
+            if other_bucket is None or other_bucket.peek() == 0:
+                return True
+
+        return False
+
+    def _try_acquire(self, endpoint):
+        """
+        :return float: 0 if the tokens of the host and the endpoint were taken, otherwise the seconds to wait.
+        """
+        endpoint_bucket = self.endpoint_buckets[endpoint]
+        wait = endpoint_bucket.peek() if endpoint_bucket is not None else 0
+
+        if wait == 0 and self.bucket is not None:
+            wait = self.bucket.try_acquire()
+
+        if wait == 0 and endpoint_bucket is not None:
+            # Only the waiters of this queue take tokens of the endpoint, so the token peeked is still there.
+            endpoint_bucket.try_acquire()
+
+        return wait
+
+    def acquire(self, endpoint, level, ticket, budget):
+        metrics = self.metrics[endpoint][level]
+        started_at = time.monotonic()
+        waiter = (level, ticket, endpoint)
+
+        with self.condition:
+            metrics['queued'] += 1
+            metrics['max_queued'] = max(metrics['max_queued'], metrics['queued'])
+            bisect.insort(self.waiters, waiter)
+
+            try:
+                while True:
+                    if self._blocked(waiter, endpoint):
+                        # Woken up when the waiters ahead take their tokens.
+                        wait = None
+                    else:
+                        wait = self._try_acquire(endpoint)
+
+                        if wait == 0:
+                            self.waiters.remove(waiter)
+
+                            break
+
+                    if budget is not None:
+                        remaining = budget.remaining()
+
+                        if remaining <= 0:
+                            raise DeadlineExceededException('Deadline of {} seconds exceeded.'
+                                                            .format(budget.seconds))
+
+                        wait = remaining if wait is None else min(wait, remaining)
+
+                    self.condition.wait(wait)
+            except BaseException:
+                self.waiters.remove(waiter)
+
+                raise
+            finally:
+                metrics['queued'] -= 1
+                self.condition.notify_all()
+
+            waited = time.monotonic() - started_at
+            metrics['requests'] += 1
+            metrics['wait_time'] += waited
+            metrics['max_wait_time'] = max(metrics['max_wait_time'], waited)
+
+        return waited
+
+
+class Scheduler(object):
+    """
+    Shared scheduler for the requests of the library, with token bucket rate limits and two priorities: REALTIME
+    (the default) and BULK.
+
+    Every host has one budget shared by all its endpoints (host_rate) and, on top of it, every endpoint can have its
+    own limit. Requests waiting for a host go out in priority order whatever their endpoint, so bulk work such as a
+    network crawl of GetLinesInformation.php yields to interactive requests such as GetStopsTimes.php. A request
+    waiting for the limit of its endpoint doesn't hold back requests of other endpoints.
+
+    Usually it is enabled with enable_scheduler, so every request of the library goes through it. The priority of
+    the requests is set with the priority context manager.
+
+    Example:
+
+    .. code-block:: python
+
+        enable_scheduler(host_rate=20, endpoint_rates={'GetLinesInformation.php': 5})
+
+        with priority(BULK):
+            crawl()
+
+    :param dict endpoint_rates: Requests per second by endpoint name, i.e. {'GetLinesInformation.php': 5}.
+                                Optional, default: None.
+    :param float default_rate: Requests per second for the endpoints not in endpoint_rates. Optional, default: None
+                               (those endpoints only have the limit of their host).
+    :param float burst: Requests that can be made at once to an endpoint after being idle. Optional, default: the
+                        rate of each endpoint.
+    :param float host_rate: Requests per second to each host, shared by all its endpoints. Optional, default: None
+                            (only the endpoint limits apply).
+    :param float host_burst: Requests that can be made at once to a host after being idle. Optional, default:
+                             host_rate.
+    """
+
+    def __init__(self, endpoint_rates=None, default_rate=None, burst=None, host_rate=None, host_burst=None):
+        self.endpoint_rates = dict(endpoint_rates or {})
+        self.default_rate = default_rate
+        self.burst = burst
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._tickets = itertools.count()
+
+    def _queue(self, host, endpoint):
+        queue = self._queues.get(host)
+
+        if queue is None or endpoint not in queue.endpoint_buckets:
+            with self._lock:
+                queue = self._queues.get(host)
+
+                if queue is None:
+                    bucket = TokenBucket(self.host_rate, self.host_burst) if self.host_rate is not None else None
+                    queue = self._queues[host] = _HostQueue(bucket)
+
+                with queue.condition:
+                    if endpoint not in queue.endpoint_buckets:
+                        rate = self.endpoint_rates.get(endpoint, self.default_rate)
+                        queue.metrics[endpoint] = _new_metrics()
+                        queue.endpoint_buckets[endpoint] = TokenBucket(rate, self.burst) if rate is not None else None
+
+        return queue
+
+    def acquire(self, url, level=None):
+        """
+        Waits until a request to an url is allowed. The active deadline (see utils.deadline) limits the wait.
+
+        :param str url: Url of a request.
+        :param int level: Priority of the request. Optional, default: None (the priority of the calling thread or task).
+        :return float: Seconds waited.
+        :raises DeadlineExceededException: If the deadline passes while waiting.
+        """
+        endpoint = endpoint_name(url)
+        queue = self._queue(urlsplit(url).netloc, endpoint)
+        level = current_priority() if level is None else level
+
+        if queue.bucket is None and queue.endpoint_buckets[endpoint] is None:
+            with queue.condition:
+                queue.metrics[endpoint][level]['requests'] += 1
+
+            return 0.0
+
+        return queue.acquire(endpoint, level, next(self._tickets), current_deadline())
+
+    def stats(self):
+        """
+        Metrics of each endpoint and priority: requests scheduled, requests currently queued, maximum queue depth,
+        and total and maximum seconds waited.
+
+        :return dict: Metrics by endpoint name and priority name, i.e.
+                      {'GetStopsTimes.php': {'realtime': {'requests': 10, 'queued': 0, ...}, 'bulk': {...}}}.
+        """
+        with self._lock:
+            queues = list(self._queues.items())
+
+        stats = {}
+
+        for _, queue in queues:
+            with queue.condition:
+                for endpoint, endpoint_metrics in queue.metrics.items():
+                    stats[endpoint] = {PRIORITY_NAMES[level]: dict(metrics)
+                                       for level, metrics in endpoint_metrics.items()}
+
+        return stats
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """
+    Returns the scheduler used by the requests of the library.
+
+    :return Scheduler: The scheduler, or None if it isn't enabled.
+    """
+    return _scheduler
+
+
+def enable_scheduler(endpoint_rates=None, default_rate=None, burst=None, host_rate=None, host_burst=None):
+    """
+    Enables the scheduler for every request of the library. See Scheduler for the arguments.
+
+    :return Scheduler: The enabled scheduler.
+    """
+    global _scheduler
+
+    _scheduler = Scheduler(endpoint_rates=endpoint_rates, default_rate=default_rate, burst=burst,
+                           host_rate=host_rate, host_burst=host_burst)
+
+    return _scheduler
+
+
+def disable_scheduler():
+    """
+    Disables the scheduler. Requests aren't rate limited anymore.
+    """
+    global _scheduler
+
+    _scheduler = None
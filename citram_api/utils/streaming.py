@@ -0,0 +1,134 @@
+import codecs
+import json
+import re
+
+
+_STRUCTURAL = re.compile(r'[\[\]{}",:]')
+_STRING_END = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_NOT_WHITESPACE = re.compile(r'[^ \t\r\n]')
+_DELIMITERS = frozenset(' \t\r\n,]}')
+
+_SCAN, _PENDING, _LIST = range(3)
+
+
+def _texts(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+
+    for chunk in chunks:
+        yield decoder.decode(chunk), False
+
+    yield decoder.decode(b'', final=True), True
+
+
+def _is_key(raw_string, key):
+    if '\\' in raw_string:
+        return json.loads('"' + raw_string + '"') == key
+
+    return raw_string == key
+
+
+def iter_json_items(chunks, key):
+    """
+    Incrementally parses a JSON document and yields the values of a key as soon as each one is complete. If the
+    value is a list, every item of the list is yielded on its own. Only the item being parsed is kept in memory, so
+    the whole document is never held at once.
+
+    Occurrences of the key nested inside a yielded value are part of that value and aren't yielded on their own.
+
+    Example:
+
+    .. code-block:: python
+
+        for stop in iter_json_items(chunks, 'Stop'):
+            ...
+
+    :param chunks: Iterable of bytes with the UTF-8 document, i.e. the chunks of a streamed response.
+    :param str key: Key whose values are yielded.
+    :return: Generator of the decoded values.
+    """
+    decoder = json.JSONDecoder()
+    state = _SCAN
+    last_string = None
+    buf = ''
+    pos = 0
+
+    for text, finished in _texts(chunks):
+        buf = buf[pos:] + text
+        pos = 0
+
+        while True:
+            if state != _SCAN:
+                match = _NOT_WHITESPACE.search(buf, pos)
+
+                if match is None:
+                    pos = len(buf)
+
+                    break
+
+                pos = match.start()
+                c = buf[pos]
+
+                if state == _LIST and c in ',]':
+                    pos += 1
+                    state = _LIST if c == ',' else _SCAN
+
+                    continue
+
+                if state == _PENDING and c == '[':
+                    pos += 1
+                    state = _LIST
+
+                    continue
+
+                if state == _PENDING and c != '{':
+                    # A scalar value, there is nothing to yield.
+                    state = _SCAN
+                else:
+                    try:
+                        value, end = decoder.raw_decode(buf, pos)
+                    except ValueError:
+                        if finished:
+                            raise
+
+                        # The value continues in the next chunk.
+                        break
+
+                    if not finished and (end == len(buf) or buf[end] not in _DELIMITERS):
+                        # A number could continue in the next chunk.
+                        break
+
+                    yield value
+
+                    pos = end
+
+                    if state == _PENDING:
+                        state = _SCAN
+
+                    continue
+
+            match = _STRUCTURAL.search(buf, pos)
+
+            if match is None:
+                pos = len(buf)
+
+                break
+
+            pos = match.start()
+
+            if buf[pos] == '"':
+                end = _STRING_END.match(buf, pos + 1)
+
+                if end is None:
+                    # The string continues in the next chunk.
+                    break
+
+                last_string = buf[pos + 1:end.end() - 1]
+                pos = end.end()
+
+                continue
+
+            if buf[pos] == ':' and last_string is not None and _is_key(last_string, key):
+                state = _PENDING
+
+            last_string = None
+            pos += 1
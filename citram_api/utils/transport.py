@@ -0,0 +1,586 @@
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from citram_api.constants.hosts import Urls
+from citram_api.utils.deadline import Deadline, current_deadline
+from citram_api.utils.json_decoder import loads
+from citram_api.utils.read_only import read_only
+
+
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 15
+
+# Endpoints whose responses rarely change, so it is worth remembering their last response (see conditional_endpoints).
+CATALOG_ENDPOINTS = ('GetModes.php', 'GetMunicipalities.php', 'GetLines.php', 'GetOffices.php',
+                     'GetLinesInformation.php', 'GetLinesTimePlanning.php', 'GetStops.php')
+
+
+def _host_prefix(url):
+    parts = urlsplit(url)
+
+    return '{scheme}://{netloc}/'.format(scheme=parts.scheme, netloc=parts.netloc)
+
+
+def _override_url(url, url_overrides):
+    for prefix, replacement in url_overrides.items():
+        if url.startswith(prefix):
+            return replacement + url[len(prefix):]
+
+    return url
+
+
+def endpoint_name(url):
+    """
+    Name of the CRTM endpoint requested by an url, i.e. GetStopsTimes.php.
+
+    :param str url: Url of a request.
+    :return str: The last part of the url path.
+    """
+    return urlsplit(url).path.rsplit('/', 1)[-1]
+
+
+class _ResponseMemo(object):
+    """
+    Last validators, body digest and decoded body of the urls of some endpoints, in a LRU. The decoded bodies are
+    read-only, since they are returned to every caller.
+    """
+
+    def __init__(self, endpoints, max_entries):
+        self.endpoints = frozenset(endpoints)
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+
+            if entry is not None:
+                self._entries.move_to_end(url)
+
+            return entry
+
+    def put(self, url, entry):
+        with self._lock:
+            self._entries[url] = entry
+            self._entries.move_to_end(url)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _cap_timeout(timeout, seconds):
+    if timeout is None:
+        return seconds
+
+    if isinstance(timeout, tuple):
+        return tuple(seconds if part is None else min(part, seconds) for part in timeout)
+
+    return min(timeout, seconds)
+
+
+def _percentile(values, percentile):
+    values = sorted(values)
+
+    return values[min(len(values) - 1, int(len(values) * percentile / 100.0))]
+
+
+class Transport(object):
+    """
+    Pooled HTTP transport used by every request the library makes.
+
+    Connections are kept alive and reused between calls, so only the first request to each host pays the TCP and
+    TLS handshakes. The connection pools live in adapters shared by all threads, while every thread gets its own
+    lightweight session on top of them, so a single transport can be used safely from thread pools.
+
+    Example:
+
+    .. code-block:: python
+
+        configure_transport(pool_maxsize=32, read_timeout=5,
+                            host_pool_sizes={Urls.CITRAM_WIDGET_SERVICE.value: 64})
+
+    Requests can be given a time budget with deadline (a default one for every request, or utils.deadline.deadline
+    for a block of code). Connection errors, timeouts and 5XX responses are retried with jittered exponential
+    backoff while the budget allows it, and when the budget runs out DeadlineExceededException is raised.
+
+    To cut tail latency, requests can be hedged: if there is no response after the given percentile of the recent
+    latencies of that endpoint, a second identical request is sent and the first response of both is used. Every
+    request is a GET, so sending it twice is safe. Streamed requests aren't retried nor hedged.
+
+    .. code-block:: python
+
+        configure_transport(deadline=2, retries=2, hedge_percentile=95)
+
+    For the endpoints in conditional_endpoints (none by default, CATALOG_ENDPOINTS are the ones worth it), get_json
+    remembers the last response of each url. Requests are sent with If-None-Match and If-Modified-Since when the
+    server gave an ETag or a Last-Modified, so unchanged catalogs aren't downloaded again, and whether or not it did,
+    a body with the same hash as the last one isn't decoded again. Either way the remembered decoded body is returned,
+    which is shared by every caller, so it is read-only (see utils.read_only): modifying it raises TypeError, and
+    copy.deepcopy gives a copy that can be modified. The remembered bodies take memory (catalog bodies are up to
+    several MB each), so conditional_max_entries should be sized to the urls requested often.
+
+    .. code-block:: python
+
+        configure_transport(conditional_endpoints=CATALOG_ENDPOINTS, conditional_max_entries=32)
+
+    :param int pool_connections: Number of hosts whose pools are kept around. Optional, default: 4.
+    :param int pool_maxsize: Maximum number of connections kept alive per host. Optional, default: 16.
+    :param dict host_pool_sizes: Pool size overrides by host. Keys are urls (only the scheme and host are used) and
+                                 values the maximum number of connections for that host. Optional, default: None.
+    :param float connect_timeout: Seconds to wait for a connection to be established. Optional, default: 3.05.
+    :param float read_timeout: Seconds to wait between bytes received from the server. Optional, default: 15.
+    :param bool keep_alive: Whether connections are reused between requests. Optional, default: True.
+    :param int max_retries: Retries on connection errors, handled by urllib3. Optional, default: 0.
+    :param dict headers: Extra headers sent with every request. Optional, default: None.
+    :param float deadline: Seconds a request can take, retries and hedged requests included. A shorter deadline
+                           set with utils.deadline.deadline takes precedence. Optional, default: None (no deadline).
+    :param int retries: Retries after connection errors, timeouts and 5XX responses. Optional, default: 0.
+    :param float backoff: Base of the exponential backoff between retries, in seconds. Each pause is random between
+                          0 and backoff * 2 ** retry. Optional, default: 0.1.
+    :param float max_backoff: Maximum pause between retries, in seconds. Optional, default: 2.
+    :param float hedge_percentile: Percentile (0-100) of the recent latencies of an endpoint after which a hedged
+                                   request is sent. Optional, default: None (no hedging).
+    :param float hedge_delay: Seconds after which a hedged request is sent while there aren't enough latencies of an
+                              endpoint to compute the percentile. Optional, default: 0.5.
+    :param int latency_window: Number of recent latencies kept by endpoint. Optional, default: 200.
+    :param tuple conditional_endpoints: Names of the endpoints whose last response is remembered, i.e.
+                                        CATALOG_ENDPOINTS. Optional, default: () (disabled).
+    :param int conditional_max_entries: Maximum number of urls remembered. Optional, default: 256.
+    :param dict url_overrides: Url prefixes replaced before requesting, i.e. to point the library to a local server:
+                               {Urls.CITRAM_WIDGET_SERVICE.value: 'http://127.0.0.1:8000'}. Optional, default: None.
+    :param Archive archive: utils.replay.Archive the responses are recorded to, or replayed from if it was loaded
+                            from a file. Optional, default: None.
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, host_pool_sizes=None,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 keep_alive=True, max_retries=0, headers=None, deadline=None, retries=0, backoff=0.1,
+                 max_backoff=2.0, hedge_percentile=None, hedge_delay=0.5, latency_window=200,
+                 conditional_endpoints=(), conditional_max_entries=256,
+                 url_overrides=None, archive=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_sizes = dict(host_pool_sizes or {})
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+
+        self.headers = {'Connection': 'keep-alive' if keep_alive else 'close'}
+        self.headers.update(headers or {})
+
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.latency_window = latency_window
+        self.url_overrides = dict(url_overrides or {})
+        self.archive = archive
+
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.deadlines_exceeded = 0
+        self.decodes = 0
+        self.decodes_avoided = 0
+        self.not_modified = 0
+
+        self._memo = _ResponseMemo(conditional_endpoints, conditional_max_entries)
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._adapters = None
+        # Weak, so the sessions of finished threads are released with them.
+        self._sessions = weakref.WeakSet()
+        self._executor = None
+        self._latencies = {}
+
+    @property
+    def timeout(self):
+        return self.connect_timeout, self.read_timeout
+
+    def _create_adapters(self):
+        adapters = {}
+
+        for host, pool_size in self.host_pool_sizes.items():
+            adapters[_host_prefix(host)] = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                                       max_retries=self.max_retries)
+
+        default_adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                                      max_retries=self.max_retries)
+        adapters.setdefault('https://', default_adapter)
+        adapters.setdefault('http://', default_adapter)
+
+        if self.archive is not None:
+            wrapped = {adapter: self.archive.adapter(adapter) for adapter in set(adapters.values())}
+            adapters = {prefix: wrapped[adapter] for prefix, adapter in adapters.items()}
+
+        return adapters
+
+    def new_session(self):
+        """
+        Creates a session on the connection pools of this transport, for a client that needs a session of its own
+        (i.e. the SOAP client of the card queries). It must only be used from one thread at a time. The transport
+        doesn't keep it alive, it is released once the caller drops it.
+
+        :return requests.Session: The new session.
+        """
+        with self._lock:
+            if self._adapters is None:
+                self._adapters = self._create_adapters()
+
+            session = requests.Session()
+            session.headers.update(self.headers)
+
+            if self.archive is not None and self.archive.replaying:
+                # Proxies and netrc don't apply to replayed responses, and looking them up costs more than replaying.
+                session.trust_env = False
+
+            # Longer prefixes must be mounted last so requests picks them first.
+            for prefix, adapter in sorted(self._adapters.items(), key=lambda item: len(item[0])):
+                session.mount(prefix, adapter)
+
+            self._sessions.add(session)
+
+        return session
+
+    @property
+    def session(self):
+        """
+        Session of the current thread. All the sessions of a transport share the same connection pools.
+
+        :return requests.Session: The session to use from the calling thread.
+        """
+        session = getattr(self._local, 'session', None)
+
+        if session is None:
+            session = self._local.session = self.new_session()
+
+        return session
+
+    def get(self, url, **kwargs):
+        """
+        Performs a GET request through the pooled connections, within the active deadline and with the retries and
+        hedging of the transport.
+
+        :param str url: Url to request.
+        :param kwargs: Extra arguments for requests.Session.get. The transport timeouts are used unless a timeout
+                       is given.
+        :return requests.Response: The response of the server.
+        :raises DeadlineExceededException: If the deadline passes before a response is received.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        budget = self._budget()
+
+        url = _override_url(url, self.url_overrides)
+
+        if kwargs.get('stream'):
+            if budget is not None:
+                self._check(budget)
+                kwargs['timeout'] = _cap_timeout(kwargs['timeout'], budget.remaining())
+
+            return self.session.get(url, **kwargs)
+
+        retry = 0
+
+        while True:
+            self._check(budget)
+
+            try:
+                res, error = self._hedged_get(url, kwargs, budget), None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                res, error = None, e
+
+            if error is None and res.status_code < 500:
+                return res
+
+            if budget is not None and budget.expired:
+                self._check(budget)
+
+            pause = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+
+            if retry >= self.retries or (budget is not None and pause >= budget.remaining()):
+                if error is not None:
+                    raise error
+
+                return res
+
+            time.sleep(pause)
+            retry += 1
+
+            with self._lock:
+                self.retried += 1
+
+    def _budget(self):
+        budget = current_deadline()
+
+        if self.deadline is not None and (budget is None or budget.remaining() > self.deadline):
+            budget = Deadline(self.deadline)
+
+        return budget
+
+    def _check(self, budget):
+        if budget is not None and budget.expired:
+            with self._lock:
+                self.deadlines_exceeded += 1
+
+            budget.check()
+
+    def _timed_get(self, url, kwargs):
+        started_at = time.monotonic()
+        res = self.session.get(url, **kwargs)
+
+        with self._lock:
+            latencies = self._latencies.get(endpoint_name(url))
+
+            if latencies is None:
+                latencies = self._latencies[endpoint_name(url)] = deque(maxlen=self.latency_window)
+
+            latencies.append(time.monotonic() - started_at)
+
+        return res
+
+    def hedge_delay_for(self, url):
+        """
+        :param str url: Url of a request.
+        :return float: Seconds to wait for a response before sending a hedged request to that url.
+        """
+        with self._lock:
+            latencies = list(self._latencies.get(endpoint_name(url), ()))
+
+        if len(latencies) < 10:
+            return self.hedge_delay
+
+        return _percentile(latencies, self.hedge_percentile)
+
+    def _hedged_get(self, url, kwargs, budget):
+        if budget is None and self.hedge_percentile is None:
+            return self._timed_get(url, kwargs)
+
+        if budget is not None:
+            kwargs = dict(kwargs, timeout=_cap_timeout(kwargs['timeout'], budget.remaining()))
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_maxsize * 2,
+                                                    thread_name_prefix='citram-transport')
+
+            executor = self._executor
+
+        pending = {executor.submit(self._timed_get, url, kwargs)}
+        hedge = None
+
+        if self.hedge_percentile is not None:
+            delay = self.hedge_delay_for(url)
+
+            if budget is None or delay < budget.remaining():
+                done, _ = wait(pending, timeout=delay)
+
+                if not done:
+                    hedge = executor.submit(self._timed_get, url, kwargs)
+                    pending.add(hedge)
+
+                    with self._lock:
+                        self.hedged += 1
+
+        error = None
+
+        while pending:
+            done, pending = wait(pending, timeout=None if budget is None else budget.remaining(),
+                                 return_when=FIRST_COMPLETED)
+
+            if not done:
+                # The requests still running are left to finish in the background.
+                self._check(budget)
+
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+
+                    return future.result()
+
+                error = future.exception()
+
+        raise error
+
+    def stats(self):
+        """
+        :return dict: Number of retries, hedged requests, hedged requests that answered first, requests that
+                      exceeded their deadline, bodies decoded, bodies not decoded because they were unchanged and
+                      304 responses.
+        """
+        with self._lock:
+            return {'retried': self.retried, 'hedged': self.hedged, 'hedge_wins': self.hedge_wins,
+                    'deadlines_exceeded': self.deadlines_exceeded, 'decodes': self.decodes,
+                    'decodes_avoided': self.decodes_avoided, 'not_modified': self.not_modified}
+
+    def get_json(self, url, record=None):
+        """
+        Performs a GET request and decodes the JSON body of the response. The raw bytes of the body are decoded
+        with the configured decoder (see json_decoder.set_decoder), without decoding them to text first.
+
+        For the conditional endpoints, the request is conditional, and a 304 response or a body identical to the last
+        one is answered with the last decoded body, without decoding it again. That result is shared, so it is
+        read-only. Otherwise the result is a new object owned by the caller.
+
+        :param str url: Url to request.
+        :param RequestRecord record: Record where the status code, size and decode time are stored (see
+                                     utils.instrumentation). Optional, default: None.
+        :return dict: The decoded body.
+        """
+        conditional = endpoint_name(url) in self._memo.endpoints
+        entry = self._memo.get(url) if conditional else None
+        headers = {}
+
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        res = self.get(url, headers=headers)
+
+        if record is not None:
+            record.status = res.status_code
+            record.bytes = len(res.content)
+
+        if res.status_code == 304 and entry is not None:
+            with self._lock:
+                self.not_modified += 1
+                self.decodes_avoided += 1
+
+            return entry['data']
+
+        digest = None
+
+        if conditional and res.status_code == 200:
+            digest = hashlib.blake2b(res.content, digest_size=16).digest()
+
+            if entry is not None and entry['digest'] == digest:
+                with self._lock:
+                    self.decodes_avoided += 1
+
+                self._memo.put(url, dict(entry, etag=res.headers.get('ETag'),
+                                         last_modified=res.headers.get('Last-Modified')))
+
+                return entry['data']
+
+        started_at = time.monotonic()
+        data = loads(res.content)
+
+        if record is not None:
+            record.decode_time = time.monotonic() - started_at
+
+        with self._lock:
+            self.decodes += 1
+
+        if digest is not None:
+            data = read_only(data)
+            self._memo.put(url, {'etag': res.headers.get('ETag'), 'last_modified': res.headers.get('Last-Modified'),
+                                 'digest': digest, 'data': data})
+
+        return data
+
+    def stream(self, url, chunk_size=64 * 1024, record=None):
+        """
+        Performs a GET request and yields the body of the response as it is received.
+
+        :param str url: Url to request.
+        :param int chunk_size: Maximum size of each chunk in bytes. Optional, default: 64 KB.
+        :param RequestRecord record: Record where the status code and the bytes received are stored (see
+                                     utils.instrumentation). Optional, default: None.
+        :return: Generator of chunks of bytes.
+        """
+        with self.get(url, stream=True) as res:
+            if record is not None:
+                record.status = res.status_code
+                record.bytes = 0
+
+            for chunk in res.iter_content(chunk_size=chunk_size):
+                if record is not None:
+                    record.bytes += len(chunk)
+
+                yield chunk
+
+    def close(self):
+        """
+        Closes every session and connection pool of this transport. It can still be used afterwards, new
+        connections will be opened when needed.
+        """
+        with self._lock:
+            for session in list(self._sessions):
+                session.close()
+
+            if self._adapters is not None:
+                for adapter in set(self._adapters.values()):
+                    adapter.close()
+
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+
+            self._sessions = weakref.WeakSet()
+            self._adapters = None
+            self._executor = None
+            self._local = threading.local()
+
+
+_transport_lock = threading.Lock()
+_transport = Transport(host_pool_sizes={Urls.CITRAM_WIDGET_SERVICE.value: 32})
+
+
+def get_transport():
+    """
+    Returns the transport shared by all the requests of the library.
+
+    :return Transport: The shared transport.
+    """
+    return _transport
+
+
+def set_transport(transport):
+    """
+    Replaces the transport shared by all the requests of the library. The previous one is closed.
+
+    :param Transport transport: The new transport.
+    """
+    global _transport
+
+    with _transport_lock:
+        previous, _transport = _transport, transport
+
+    if previous is not transport:
+        previous.close()
+
+
+def configure_transport(**kwargs):
+    """
+    Creates a new shared transport with the given settings. See Transport for the accepted arguments.
+
+    Example:
+
+    .. code-block:: python
+
+        configure_transport(connect_timeout=1, read_timeout=3, pool_maxsize=64)
+
+    :return Transport: The new shared transport.
+    """
+    transport = Transport(**kwargs)
+    set_transport(transport)
+
+    return transport
@@ -1,10 +1,135 @@
-import requests
+import os
+import unicodedata
+
+from citram_api.utils.catalog_cache import get_catalog_cache
+from citram_api.utils.instrumentation import HIT, MISS, RequestRecord, has_hooks
+from citram_api.utils.realtime_cache import get_realtime_cache
+from citram_api.utils.scheduler import get_scheduler
+from citram_api.utils.streaming import iter_json_items
+from citram_api.utils.transport import get_transport
 
 
 def common_request(url):
-    res = requests.get(url)
+    if not has_hooks():
+        return _cached_request(url, None)
+
+    record = RequestRecord(url)
+
+    try:
+        data = _cached_request(url, record)
+    except Exception as e:
+        record.finish(e)
+        raise
+
+    record.finish()
+
+    return data
+
+
+def _cached_request(url, record):
+    realtime_cache = get_realtime_cache()
+
+    if realtime_cache is not None and realtime_cache.handles(url):
+        def fetch():
+            if record is not None:
+                record.cache = MISS
+
+            return _request(url, record)
+
+        data = realtime_cache.get_or_fetch(url, fetch)
+
+        if record is not None and record.cache is None:
+            record.cache = HIT
+
+        return data
+
+    return _request(url, record)
+
+
+def _request(url, record=None):
+    catalog_cache = get_catalog_cache()
+
+    if catalog_cache is not None:
+        data = catalog_cache.get(url)
+
+        if record is not None and catalog_cache.ttl(url) is not None:
+            record.cache = MISS if data is None else HIT
+
+        if data is not None:
+            return data
+
+    _schedule(url)
+
+    data = get_transport().get_json(url, record=record)
+
+    if catalog_cache is not None:
+        catalog_cache.put(url, data)
+
+    return data
 
-    return res.json()
+
+def stream_request(url, key):
+    """
+    Streams the response of an url and yields the values of a key as they are received. See
+    streaming.iter_json_items. The caches of the library aren't used.
+
+    The request is measured by the hooks (see utils.instrumentation) when the generator is exhausted or closed. Its
+    latency covers the whole stream, parsing included, and its bytes are the ones received until then.
+
+    :param str url: Url to request.
+    :param str key: Key whose values are yielded, i.e. 'Stop'.
+    :return: Generator of the decoded values.
+    """
+    _schedule(url)
+
+    if not has_hooks():
+        return iter_json_items(get_transport().stream(url), key)
+
+    return _recorded_stream(url, key)
+
+
+def _recorded_stream(url, key):
+    record = RequestRecord(url)
+    error = None
+
+    try:
+        yield from iter_json_items(get_transport().stream(url, record=record), key)
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        record.finish(error)
+
+
+def _schedule(url):
+    scheduler = get_scheduler()
+
+    if scheduler is not None:
+        scheduler.acquire(url)
+
+
+def as_list(value):
+    """
+    CRTM returns a single object instead of a list when there is only one result. This returns always a list.
+
+    :param value: A list, a single object or None.
+    :return list: The value as a list.
+    """
+    if value is None:
+        return []
+
+    return value if isinstance(value, list) else [value]
+
+
+def fold(text):
+    """
+    Upper case version of a text without accents nor other diacritics, i.e. 'Álamo, el' -> 'ALAMO, EL'. Names are
+    compared folded so accents and case don't matter.
+
+    :param str text: Text to fold.
+    :return str: The folded text, only with ASCII characters.
+    """
+    return unicodedata.normalize('NFKD', text.upper()).encode('ASCII', 'ignore').decode('UTF-8')
 
 
 def create_line_cod(mode_cod, line):
@@ -12,4 +137,14 @@ def create_line_cod(mode_cod, line):
 
 
 def create_stop_cod(mode_cod, stop_cod):
-    return str(mode_cod) + '_' + str(stop_cod)
\ No newline at end of file
+    return str(mode_cod) + '_' + str(stop_cod)
+
+
+def get_cache_dir():
+    """
+    Directory where the on-disk caches of the library are stored. It can be set with the CITRAM_API_CACHE_DIR
+    environment variable, by default it is ~/.cache/citram_api.
+
+    :return str: Path of the cache directory. It might not exist yet.
+    """
+    return os.environ.get('CITRAM_API_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'citram_api')
@@ -14,8 +14,11 @@ setuptools.setup(
     long_description_content_type='text/markdown',
     url='https://github.com/jvicentem/citram-python-api',
     packages=setuptools.find_packages(),
-    python_requires='>=3.6',
+    package_data={'citram_api.constants': ['data/*.json']},
+    python_requires='>=3.7',
     install_requires=['zeep==3.4.0',
                       'xmltodict==0.12.0',
-                      'requests==2.22.0']
+                      'requests==2.22.0'],
+    extras_require={'aio': ['aiohttp>=3.6'],
+                    'fast': ['orjson>=3']}
 )
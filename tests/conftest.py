@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.stand_in_server import StandInServer
+from citram_api.constants.hosts import Urls
+from citram_api.utils.transport import Transport, get_transport, set_transport
+
+
+@pytest.fixture
+def stand_in():
+    """
+    Starts a StandInServer answering for the CRTM widget API and makes the shared transport request it. Called with
+    the arguments of StandInServer and the extra arguments of the Transport, it returns both. The servers are stopped
+    and the previous transport is put back after the test.
+    """
+    previous = get_transport()
+    servers = []
+
+    def start(body=b'{}', delay=None, etag=False, **kwargs):
+        server = StandInServer(body, delay=delay, etag=etag).__enter__()
+        servers.append(server)
+        transport = Transport(url_overrides={Urls.CITRAM_WIDGET_SERVICE.value: server.url}, **kwargs)
+        set_transport(transport)
+
+        return server, transport
+
+    yield start
+
+    set_transport(previous)
+
+    for server in servers:
+        server.__exit__(None, None, None)
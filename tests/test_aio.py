@@ -0,0 +1,240 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from urllib.parse import urlsplit
+
+from aiohttp import web
+import pytest
+
+from citram_api.aio import lines as aio_lines, offices as aio_offices, stops as aio_stops
+from citram_api.aio.transport import AsyncTransport, get_async_transport, set_async_transport
+from citram_api.aio.utils import gather
+from citram_api.api.lines import lines
+from citram_api.api.offices import offices
+from citram_api.api.stops import stops
+from citram_api.constants.hosts import Urls
+from citram_api.utils.catalog_cache import CatalogCache, disable_catalog_cache, enable_catalog_cache
+from citram_api.utils.deadline import current_deadline, deadline
+from citram_api.utils.scheduler import BULK, REALTIME, current_priority, disable_scheduler, enable_scheduler, \
+    get_scheduler, priority
+
+
+def _path(url):
+    parts = urlsplit(url)
+
+    return parts.path + '?' + parts.query if parts.query else parts.path
+
+
+async def _serve(requests):
+    async def handle(request):
+        requests.append(request.path_qs)
+
+        return web.json_response({'path': request.path_qs})
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+
+    return runner, 'http://127.0.0.1:{}'.format(runner.addresses[0][1])
+
+
+def _run(test):
+    requests = []
+
+    async def main():
+        runner, url = await _serve(requests)
+        transport = AsyncTransport(url_overrides={Urls.CITRAM_WIDGET_SERVICE.value: url})
+        previous = get_async_transport()
+        set_async_transport(transport)
+
+        try:
+            return await test()
+        finally:
+            set_async_transport(previous)
+            await transport.close()
+            await runner.cleanup()
+
+    return asyncio.run(main()), requests
+
+
+@pytest.mark.parametrize('call, url', [
+    (lambda: aio_stops.get_stops_by_cod_stop('4_276'), stops._get_stops_by_cod_stop_url('4_276')),
+    (lambda: aio_stops.get_stop_times('4_276', 'P', 3), stops._get_stop_times_url('4_276', 'P', 3, 2)),
+    (lambda: aio_lines.get_lines_by_mode(4), lines._get_lines_by_mode_url(4)),
+    (lambda: aio_offices.get_offices_by_postcode(28003), offices._get_offices_by_postcode_url(28003, None)),
+])
+def test_requests_go_to_the_overridden_url(call, url):
+    result, requests = _run(call)
+
+    assert requests == [_path(url).replace('/widgets/api', '', 1)]
+    assert result == {'path': requests[0]}
+
+
+def test_gather_keeps_the_order_of_the_results():
+    cod_stops = ['4_{}'.format(i) for i in range(30)]
+
+    results, requests = _run(lambda: gather(*(aio_stops.get_stops_by_cod_stop(cod_stop) for cod_stop in cod_stops),
+                                            limit=5))
+
+    assert len(requests) == 30
+    assert [result['path'] for result in results] == [_path(stops._get_stops_by_cod_stop_url(cod_stop))
+                                                      .replace('/widgets/api', '', 1) for cod_stop in cod_stops]
+
+
+def test_scheduler_waits_do_not_use_the_default_executor():
+    release = threading.Event()
+
+    async def test():
+        loop = asyncio.get_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+        blocked = loop.run_in_executor(None, release.wait)
+
+        try:
+            return await asyncio.wait_for(gather(*(aio_stops.get_stop_info('4_{}'.format(i)) for i in range(10))), 5)
+        finally:
+            release.set()
+            await blocked
+
+    enable_scheduler(default_rate=1000)
+
+    try:
+        results, _ = _run(test)
+    finally:
+        disable_scheduler()
+
+    assert len(results) == 10
+
+
+def test_priority_is_kept_by_each_asyncio_task():
+    async def test():
+        inside = asyncio.Event()
+
+        async def bulk():
+            with priority(BULK):
+                inside.set()
+                await asyncio.sleep(0.05)  # Let the other task request while this one is inside the block.
+
+                return await aio_lines.get_lines_by_mode(4)
+
+        async def realtime():
+            await inside.wait()
+
+            return current_priority(), await aio_stops.get_stop_times('4_276', 'P', 3)
+
+        return await asyncio.gather(bulk(), realtime())
+
+    enable_scheduler(default_rate=1000)
+
+    try:
+        (_, (level, _)), _ = _run(test)
+        stats = get_scheduler().stats()
+    finally:
+        disable_scheduler()
+
+    assert level == REALTIME
+    assert stats['GetStopsTimes.php']['realtime']['requests'] == 1
+    assert stats['GetStopsTimes.php']['bulk']['requests'] == 0
+    assert stats['GetLines.php']['bulk']['requests'] == 1
+
+
+def test_deadline_is_kept_by_each_asyncio_task():
+    async def test():
+        inside = asyncio.Event()
+
+        async def limited():
+            with deadline(5) as limit:
+                inside.set()
+                await asyncio.sleep(0.05)
+
+                return current_deadline() is limit
+
+        async def unlimited():
+            await inside.wait()
+
+            return current_deadline()
+
+        return await asyncio.gather(limited(), unlimited())
+
+    assert asyncio.run(test()) == [True, None]
+
+
+def test_catalog_cache_is_used_out_of_the_event_loop(tmp_path, monkeypatch):
+    threads = []
+
+    def record(method):
+        def wrapper(self, *args):
+            threads.append(threading.current_thread().name)
+
+            return method(self, *args)
+
+        return wrapper
+
+    monkeypatch.setattr(CatalogCache, 'get', record(CatalogCache.get))
+    monkeypatch.setattr(CatalogCache, 'put', record(CatalogCache.put))
+    enable_catalog_cache(str(tmp_path / 'catalog.sqlite'))
+
+    try:
+        (first, second), requests = _run(lambda: gather(aio_lines.get_lines_by_mode(4), aio_lines.get_lines_by_mode(4),
+                                                        limit=1))
+    finally:
+        disable_catalog_cache()
+
+    assert first == second
+    assert len(requests) == 1
+    assert len(threads) == 3
+    assert all(thread.startswith('citram-aio-catalog-cache') for thread in threads)
+
+
+def test_session_of_an_idle_loop_is_closed_when_it_runs_again():
+    transport = AsyncTransport()
+    previous_loop = asyncio.new_event_loop()
+
+    async def session():
+        return transport.session
+
+    async def replace():
+        try:
+            return transport.session
+        finally:
+            await transport.close()
+
+    try:
+        previous = previous_loop.run_until_complete(session())
+        current = asyncio.run(replace())
+        previous_loop.run_until_complete(asyncio.sleep(0))
+    finally:
+        previous_loop.close()
+
+    assert current is not previous
+    assert previous.closed
+
+
+def test_session_of_a_running_loop_is_closed():
+    transport = AsyncTransport()
+    previous_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=previous_loop.run_forever, daemon=True)
+    thread.start()
+
+    async def session():
+        return transport.session
+
+    async def replace():
+        try:
+            return transport.session
+        finally:
+            await transport.close()
+
+    try:
+        previous = asyncio.run_coroutine_threadsafe(session(), previous_loop).result(5)
+        asyncio.run(replace())
+        closed = asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), previous_loop)
+        closed.result(5)
+    finally:
+        previous_loop.call_soon_threadsafe(previous_loop.stop)
+        thread.join()
+        previous_loop.close()
+
+    assert previous.closed
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from citram_api.api.lines import lines
+from citram_api.constants.hosts import Urls
+from citram_api.utils import catalog_cache
+from citram_api.utils.catalog_cache import CatalogCache, DAY, disable_catalog_cache, enable_catalog_cache
+
+
+API = Urls.CITRAM_WIDGET_SERVICE.value
+LINES_URL = API + '/GetLines.php?mode=8'
+LINE_INFO_URL = API + '/GetLinesInformation.php?activeDate=2020-01-01&codLine=8__450___'
+LINE_INFO = {'lines': {'LineInformation': {'codLine': '8__450___', 'shortDescription': '450'}}}
+
+
+def _lines(update_date):
+    return {'lines': {'Line': [{'codLine': '8__450___', 'updateDate': update_date, 'updateKmlDate': '2020-01-01'}]}}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CatalogCache(str(tmp_path / 'catalog.sqlite'))
+
+
+def test_responses_expire_after_the_ttl_of_their_endpoint(cache, monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(catalog_cache.time, 'time', lambda: now[0])
+    cache.put(LINES_URL, _lines('2020-01-01'))
+
+    now[0] += DAY - 1
+    assert cache.get(LINES_URL) == _lines('2020-01-01')
+
+    now[0] += 2
+    assert cache.get(LINES_URL) is None
+
+
+def test_only_cached_endpoints_are_stored(tmp_path):
+    cache = CatalogCache(str(tmp_path / 'catalog.sqlite'), ttls={'GetLines.php': None})
+    stop_times_url = API + '/GetStopsTimes.php?codStop=4_276'
+
+    cache.put(stop_times_url, {'stopTimes': {}})
+    cache.put(LINES_URL, _lines('2020-01-01'))
+
+    assert cache.ttl(stop_times_url) is None
+    assert cache.get(stop_times_url) is None
+    assert cache.get(LINES_URL) is None
+
+
+def test_changed_lines_are_invalidated(cache):
+    cache.put(LINES_URL, _lines('2020-01-01'))
+    cache.put(LINE_INFO_URL, LINE_INFO)
+    cache.put(LINES_URL, _lines('2020-01-01'))
+
+    assert cache.get(LINE_INFO_URL) == LINE_INFO
+
+    cache.put(LINES_URL, _lines('2020-02-01'))
+
+    assert cache.get(LINE_INFO_URL) is None
+    assert cache.get(LINES_URL) == _lines('2020-02-01')
+
+
+def test_invalidate_line(cache):
+    cache.put(LINE_INFO_URL, LINE_INFO)
+    cache.invalidate_line('8__450___')
+
+    assert cache.get(LINE_INFO_URL) is None
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path, monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(catalog_cache.time, 'time', lambda: now[0])
+    cache = CatalogCache(str(tmp_path / 'catalog.sqlite'))
+    urls = [API + '/GetLines.php?mode={}'.format(mode) for mode in (4, 5)]
+
+    cache.put(urls[0], _lines('2020-01-01'))
+    now[0] += 1
+    cache.put(urls[1], _lines('2020-01-01'))
+    now[0] += 1
+    cache.get(urls[0])
+
+    # Room for a single response.
+    cache.max_bytes = cache._connection.execute('SELECT MAX(size) FROM entries').fetchone()[0]
+    now[0] += 1
+    cache.put(urls[0], _lines('2020-01-01'))
+
+    assert cache.get(urls[0]) is not None
+    assert cache.get(urls[1]) is None
+
+
+def test_requests_are_answered_from_the_cache(stand_in, tmp_path):
+    server, _ = stand_in(json.dumps(_lines('2020-01-01')).encode('utf-8'))
+    enable_catalog_cache(str(tmp_path / 'catalog.sqlite'))
+
+    try:
+        first = lines.get_lines_by_mode(8)
+        second = lines.get_lines_by_mode(8)
+    finally:
+        disable_catalog_cache()
+
+    assert first == second == _lines('2020-01-01')
+    assert server.requests == 1
@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Any request fails, as the proxy doesn't exist, except those to local stand-in servers.
+_OFFLINE = {'HTTPS_PROXY': 'http://127.0.0.1:9', 'HTTP_PROXY': 'http://127.0.0.1:9', 'NO_PROXY': '127.0.0.1'}
+
+
+def _run(script, cache_dir):
+    env = dict(os.environ, PYTHONPATH=ROOT, CITRAM_API_CACHE_DIR=str(cache_dir), **_OFFLINE)
+
+    return subprocess.run([sys.executable, '-c', script], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def test_import_makes_no_request(tmp_path):
+    result = _run('from citram_api.constants.constants import OfficeTypes, TransportModes; '
+                  'print(TransportModes.METRO.value)', tmp_path)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == b'4'
+
+
+def test_municipalities_come_from_the_cache_directory(tmp_path):
+    with open(os.path.join(str(tmp_path), 'municipalities.json'), 'w', encoding='utf-8') as f:
+        json.dump({'municipalities': {'Municipality': [{'codMunicipality': '4350', 'name': 'MADRID'}]}}, f)
+
+    result = _run('from citram_api.constants.constants import Municipalities; print(Municipalities.MADRID.value)',
+                  tmp_path)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == b'4350'
+
+
+def test_municipalities_come_from_the_bundled_snapshot(tmp_path):
+    result = _run('from citram_api.constants.constants import Municipalities; '
+                  'print(Municipalities.MADRID.value, Municipalities.FUENLABRADA.value, len(Municipalities))', tmp_path)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == [b'4350', b'4330', b'179']
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_refresh_constants_stores_the_new_snapshots(tmp_path):
+    script = '''
+import json
+
+from benchmarks.stand_in_server import StandInServer
+from citram_api.constants import constants
+from citram_api.constants.hosts import Urls
+from citram_api.utils.transport import Transport, set_transport
+
+bodies = {'/GetModes.php': {'modes': {'Mode': [{'codMode': '4', 'name': 'METRO'}]}},
+          '/GetMunicipalities.php': {'municipalities': {'Municipality': [{'codMunicipality': '4350',
+                                                                          'name': 'MADRID'}]}}}
+
+with StandInServer(lambda path: json.dumps(bodies[path]).encode('utf-8')) as server:
+    set_transport(Transport(url_overrides={Urls.CITRAM_WIDGET_SERVICE.value: server.url}))
+    transport_modes, municipalities = constants.refresh_constants()
+
+print(len(transport_modes), len(municipalities), constants.Municipalities is municipalities)
+'''
+    result = _run(script, tmp_path)
+    loaded = _run('from citram_api.constants.constants import Municipalities; print(len(Municipalities))', tmp_path)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == [b'1', b'1', b'True']
+    assert sorted(os.listdir(str(tmp_path))) == ['municipalities.json', 'transport_modes.json']
+    assert loaded.stdout.strip() == b'1'
@@ -0,0 +1,48 @@
+import json
+import time
+
+import pytest
+import requests
+
+from benchmarks.stand_in_server import tail_delay
+from citram_api.api.stops import stops
+from citram_api.utils.custom_exceptions import DeadlineExceededException
+from citram_api.utils.deadline import deadline
+
+
+BODY = json.dumps({'stops': {'Stop': {'codStop': '4_276'}}}).encode('utf-8')
+
+
+def test_deadline_is_exceeded_within_the_deadline(stand_in):
+    _, transport = stand_in(BODY, delay=tail_delay(slow=2.0, slow_ratio=1), retries=3)
+    started_at = time.monotonic()
+
+    with pytest.raises(DeadlineExceededException):
+        with deadline(0.3):
+            stops.get_stops_by_cod_stop('4_276')
+
+    assert time.monotonic() - started_at < 0.6
+    assert transport.stats()['deadlines_exceeded'] == 1
+
+
+def test_retries_are_limited(stand_in):
+    server, transport = stand_in(BODY, delay=tail_delay(base=1.0, slow_ratio=0), read_timeout=0.1, retries=2,
+                                 backoff=0.01)
+
+    with pytest.raises(requests.Timeout):
+        stops.get_stops_by_cod_stop('4_276')
+
+    assert server.requests == 3
+    assert transport.stats()['retried'] == 2
+
+
+def test_hedged_request_beats_a_stalled_one(stand_in):
+    # With this seed the first request is slow and the second one fast.
+    _, transport = stand_in(BODY, delay=tail_delay(slow=2.0, slow_ratio=0.5, seed=1), hedge_percentile=95,
+                            hedge_delay=0.05)
+    started_at = time.monotonic()
+
+    assert stops.get_stops_by_cod_stop('4_276') == json.loads(BODY.decode('utf-8'))
+    assert time.monotonic() - started_at < 1.0
+    assert transport.stats()['hedged'] == 1
+    assert transport.stats()['hedge_wins'] == 1
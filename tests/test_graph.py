@@ -0,0 +1,82 @@
+import pytest
+
+from citram_api.network.graph import Leg, TransferGraph
+from citram_api.network.snapshot import NetworkSnapshot
+
+
+def _stop(cod_stop, name, latitude, longitude):
+    return {'codStop': cod_stop, 'codMode': cod_stop.split('_')[0], 'name': name,
+            'coordinates': {'latitude': latitude, 'longitude': longitude}}
+
+
+STOPS = {
+    '4_1': _stop('4_1', 'SOL', 40.400, -3.700),
+    '4_2': _stop('4_2', 'GRAN VÍA', 40.402, -3.700),
+    '4_3': _stop('4_3', 'TRIBUNAL', 40.404, -3.700),
+    '4_4': _stop('4_4', 'BILBAO', 40.406, -3.700),
+    # 22 meters from BILBAO.
+    '8_1': _stop('8_1', 'GLORIETA DE BILBAO', 40.4062, -3.700),
+    '8_2': _stop('8_2', 'FUENCARRAL', 40.410, -3.700),
+    # A different mode with the same name as 4_1, 420 meters away.
+    '5_1': _stop('5_1', 'Sól', 40.400, -3.705),
+    '5_2': _stop('5_2', 'ATOCHA', 40.395, -3.705),
+    '8_9': _stop('8_9', 'ALCALÁ DE HENARES', 41.000, -3.300),
+    '8_10': _stop('8_10', 'MECO', 41.010, -3.300),
+}
+
+
+def _line(cod_line, *itineraries):
+    return {'codLine': cod_line, 'itinerary': {'Itinerary': [
+        {'codItinerary': '{}_IT_{}'.format(cod_line, direction), 'direction': direction,
+         'stops': {'StopInformation': [STOPS[cod_stop] for cod_stop in cod_stops]}}
+        for direction, cod_stops in enumerate(itineraries, 1)]}}
+
+
+@pytest.fixture
+def graph():
+    line_info = {info['codLine']: info for info in [
+        _line('4__1___', ['4_1', '4_2', '4_3'], ['4_3', '4_2', '4_1']),
+        _line('4__2___', ['4_3', '4_4']),
+        _line('8__1___', ['8_1', '8_2']),
+        _line('5__1___', ['5_1', '5_2']),
+        _line('8__9___', ['8_9', '8_10']),
+    ]}
+
+    return TransferGraph(NetworkSnapshot([], [], {}, line_info, {}))
+
+
+def test_stops_lines_and_transfers_are_packed(graph):
+    assert graph.cod_lines == ['4__1___', '4__2___', '8__1___', '5__1___', '8__9___']
+    assert sorted(graph.cod_stops) == sorted(STOPS)
+    assert graph.stops_of_line('4__1___') == [['4_1', '4_2', '4_3'], ['4_3', '4_2', '4_1']]
+    assert graph.lines_of_stop('4_3') == ['4__1___', '4__2___']
+    assert graph.lines_of_stop('4_2') == ['4__1___']
+    assert graph.transfers_of_stop('4_4') == ['8_1'] and graph.transfers_of_stop('8_1') == ['4_4']
+    assert graph.transfers_of_stop('4_1') == ['5_1'] and graph.transfers_of_stop('5_1') == ['4_1']
+    assert graph.transfers_of_stop('4_2') == []
+    assert {graph._stop_lines.typecode, graph._transfers.typecode, graph._neighbours.typecode} == {'i'}
+
+
+def test_stops_too_far_away_are_not_transfers():
+    line_info = {'4__1___': _line('4__1___', ['4_1']), '5__1___': _line('5__1___', ['5_1'])}
+    far = TransferGraph(NetworkSnapshot([], [], {}, line_info, {}), name_transfer_distance=100)
+
+    assert far.transfers_of_stop('4_1') == []
+
+
+def test_fewest_transfers(graph):
+    assert graph.fewest_transfers('4_1', '8_2') == [Leg('4__1___', '4_1', '4_3'), Leg('4__2___', '4_3', '4_4'),
+                                                    Leg('8__1___', '8_1', '8_2')]
+    assert graph.fewest_transfers('4_2', '4_3') == [Leg('4__1___', '4_2', '4_3')]
+    assert graph.fewest_transfers('4_1', '5_2') == [Leg('5__1___', '5_1', '5_2')]
+    assert graph.fewest_transfers('8_2', '4_1') == [Leg('8__1___', '8_2', '8_1'), Leg('4__2___', '4_4', '4_3'),
+                                                    Leg('4__1___', '4_3', '4_1')]
+
+
+def test_same_stops_unreachable_and_unknown_stops(graph):
+    assert graph.fewest_transfers('4_1', '4_1') == []
+    assert graph.fewest_transfers('4_4', '8_1') == []
+    assert graph.fewest_transfers('4_1', '8_10') is None
+
+    with pytest.raises(KeyError):
+        graph.fewest_transfers('4_1', '9_99')
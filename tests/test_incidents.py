@@ -0,0 +1,103 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from citram_api.realtime.incidents import CLOSED, OPENED, UPDATED, IncidentMonitor, incidents_by_id
+
+
+def _incidents(*records):
+    return {'incidents': {'Incident': list(records)}}
+
+
+class Incidents(object):
+    """
+    Bodies of GetLines.php with the lines in responses, and of GetIncidentsAffectations.php by line, one per poll.
+    The last one is repeated once they run out, and a line without bodies can't be requested.
+    """
+
+    def __init__(self, **responses):
+        self.responses = responses
+        self.polls = []
+
+    def __call__(self, path):
+        query = {key: values[0] for key, values in parse_qs(urlsplit(path).query).items()}
+
+        if urlsplit(path).path.endswith('/GetLines.php'):
+            body = {'lines': {'Line': [{'codLine': cod_line} for cod_line in sorted(self.responses)]}}
+        else:
+            self.polls.append(query['codLine'])
+            responses = self.responses[query['codLine']]
+            body = responses.pop(0) if len(responses) > 1 else responses[0]
+
+        return json.dumps(body).encode('utf-8')
+
+
+def test_incidents_are_found_below_incident_keys():
+    response = {'incidents': {'Incident': [{'codIncident': 7, 'title': 'Obras'},
+                                           {'description': 'Sin identificador'}],
+                              'lineIncidents': {'codIssue': 'A1', 'title': 'Huelga'},
+                              'affectations': {'Affectation': {'codLine': '4__1___'}}}}
+
+    found = incidents_by_id(response)
+
+    assert found['7'] == {'codIncident': 7, 'title': 'Obras'}
+    assert found['A1'] == {'codIssue': 'A1', 'title': 'Huelga'}
+    assert len(found) == 3
+    assert incidents_by_id({'incidents': {}}) == {} == incidents_by_id(None)
+
+
+def test_changes_are_diffed_and_unchanged_responses_skipped():
+    monitor = IncidentMonitor()
+    work, strike = {'codIncident': 1, 'title': 'Obras'}, {'codIncident': 2, 'title': 'Huelga'}
+
+    assert [(event.kind, event.cod_incident) for event in monitor.process(4, '4__1___', _incidents(work))] == [
+        (OPENED, '1')]
+    assert monitor.process(4, '4__1___', _incidents(work)) == [] and monitor.unchanged == 1
+
+    events = monitor.process(4, '4__1___', _incidents(dict(work, title='Obras nocturnas'), strike))
+
+    assert sorted((event.kind, event.cod_incident) for event in events) == [(OPENED, '2'), (UPDATED, '1')]
+    assert [event.previous for event in events if event.kind == UPDATED] == [work]
+
+    event, = monitor.process(4, '4__1___', _incidents(strike))
+
+    assert (event.kind, event.cod_mode, event.cod_line, event.incident) == (CLOSED, 4, '4__1___',
+                                                                            {'codIncident': 1,
+                                                                             'title': 'Obras nocturnas'})
+
+
+def test_initial_incidents_can_be_left_out():
+    monitor = IncidentMonitor(emit_initial=False)
+
+    assert monitor.process(4, '4__1___', _incidents({'codIncident': 1})) == []
+    assert [event.kind for event in monitor.process(4, '4__1___', _incidents())] == [CLOSED]
+
+
+def test_every_line_is_polled_each_cycle(stand_in):
+    incidents = Incidents(**{'4__1___': [_incidents(), _incidents({'codIncident': 1})],
+                             '4__2___': [_incidents({'codIncident': 2})]})
+    stand_in(incidents)
+    monitor = IncidentMonitor(mode_cods=[4], interval=0.05)
+
+    events = list(monitor.events(max_cycles=2))
+
+    assert sorted(incidents.polls) == ['4__1___', '4__1___', '4__2___', '4__2___']
+    assert sorted((event.cod_line, event.kind) for event in events) == [('4__1___', OPENED), ('4__2___', OPENED)]
+    assert monitor.stats() == {'requests': 4, 'unchanged': 1, 'failures': 0, 'lines': 2}
+
+
+def test_failures_are_counted_and_stop_ends_the_loop(stand_in):
+    incidents = Incidents(**{'4__1___': [_incidents({'codIncident': 1})]})
+    stand_in(incidents)
+    monitor = IncidentMonitor(mode_cods=[4], interval=0.01)
+    monitor._lines = [(4, '4__1___'), (4, '4__9___')]
+    monitor._lines_at = float('inf')
+    events = []
+
+    def callback(event):
+        events.append(event)
+        monitor.stop()
+
+    monitor.run(callback)
+
+    assert [(event.kind, event.cod_line) for event in events] == [(OPENED, '4__1___')]
+    assert monitor.poll_once() == [] and monitor.failures >= 1
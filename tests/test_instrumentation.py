@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from citram_api.api.stops import stops
+from citram_api.utils.instrumentation import add_hook, remove_hook
+
+
+BODY = json.dumps({'stops': {'Stop': [{'codStop': '4_{}'.format(i)} for i in range(100)]}}).encode('utf-8')
+
+
+@pytest.fixture
+def records(stand_in):
+    records = []
+    stand_in(BODY)
+    add_hook(records.append)
+
+    yield records
+
+    remove_hook(records.append)
+
+
+def test_streamed_requests_are_recorded(records):
+    assert len(list(stops.iter_stops_by_zip_code(28004))) == 100
+
+    assert len(records) == 1
+    assert records[0].endpoint == 'GetStops.php'
+    assert records[0].status == 200
+    assert records[0].bytes == len(BODY)
+    assert records[0].error is None
+
+
+def test_streams_closed_early_are_recorded(records):
+    items = stops.iter_stops_by_municipality(4350)
+    next(items)
+
+    assert records == []
+
+    items.close()
+
+    assert len(records) == 1
+    assert records[0].status == 200
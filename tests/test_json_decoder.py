@@ -0,0 +1,68 @@
+import json
+import sys
+
+import pytest
+
+from benchmarks.payloads import line_info_payload
+from citram_api.api.stops import stops
+from citram_api.utils import json_decoder
+from citram_api.utils.json_decoder import available_decoders, get_decoder, loads, set_decoder
+
+
+@pytest.fixture(autouse=True)
+def decoder(monkeypatch):
+    # Every test starts with no decoder chosen, and the one in use before is put back afterwards.
+    monkeypatch.setattr(json_decoder, '_decoder', None)
+    monkeypatch.setattr(json_decoder, '_decoder_name', None)
+    monkeypatch.delenv('CITRAM_API_JSON_DECODER', raising=False)
+
+
+def test_the_fastest_installed_decoder_is_used_by_default():
+    assert available_decoders()[-1] == 'json'
+    assert get_decoder() == available_decoders()[0]
+
+
+def test_missing_decoders_are_skipped(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    monkeypatch.setitem(sys.modules, 'ujson', None)
+
+    assert available_decoders() == ['json']
+    assert loads(b'{"a": 1}') == {'a': 1}
+    assert get_decoder() == 'json'
+
+
+def test_the_environment_variable_chooses_the_decoder(monkeypatch):
+    monkeypatch.setenv('CITRAM_API_JSON_DECODER', 'json')
+
+    assert get_decoder() == 'json'
+
+    monkeypatch.setenv('CITRAM_API_JSON_DECODER', 'simdjson')
+
+    with pytest.raises(ValueError):
+        set_decoder()
+
+
+@pytest.mark.parametrize('name', available_decoders())
+def test_every_decoder_decodes_utf8_bodies_alike(name):
+    body = line_info_payload(5)
+
+    assert set_decoder(name) == name
+    assert loads(body) == json.loads(body.decode('utf-8'))
+
+    with pytest.raises(ValueError):
+        loads(b'{"truncated": ')
+
+
+def test_a_function_can_be_the_decoder(stand_in):
+    calls = []
+
+    def decode(body):
+        calls.append(body)
+
+        return json.loads(body)
+
+    stand_in(b'{"stops": {}}')
+
+    assert set_decoder(decode) == 'decode'
+    assert stops.get_stops_by_zip_code(28004) == {'stops': {}}
+    assert calls == [b'{"stops": {}}']
@@ -0,0 +1,38 @@
+from citram_api.realtime import locations
+from citram_api.realtime.locations import MOVED, NEW, REMOVED, LocationTarget, watch_line_locations
+
+
+TARGET = LocationTarget(8, '8__591____1__IT_1', '8__591___', '8_10000', 1)
+
+
+def _vehicle(longitude, cod_vehicle=''):
+    return {'codVehicle': cod_vehicle, 'coordinates': {'longitude': longitude, 'latitude': 40.4}}
+
+
+def _watch(monkeypatch, polls):
+    responses = iter(polls)
+    monkeypatch.setattr(locations, 'line_location_targets', lambda cod_line: [TARGET])
+    monkeypatch.setattr(locations, '_poll', lambda target: {'vehiclesLocation': {'VehicleLocation': next(responses)}})
+    changes = []
+
+    for change in watch_line_locations('8__591___', interval=0, max_workers=1, max_polls=len(polls)):
+        changes.append(change)
+
+    return changes
+
+
+def test_reordered_anonymous_vehicles_are_not_reported(monkeypatch):
+    first = [_vehicle(-3.70), _vehicle(-3.71), _vehicle(-3.72)]
+    second = [first[2], first[0]]  # Reordered, and the second vehicle is gone.
+
+    changes = _watch(monkeypatch, [first, second])
+
+    assert [change.status for change in changes[:3]] == [NEW, NEW, NEW]
+    assert [(change.status, change.cod_vehicle, change.vehicle) for change in changes[3:]] == [(REMOVED, None,
+                                                                                                first[1])]
+
+
+def test_vehicles_with_id_are_followed(monkeypatch):
+    changes = _watch(monkeypatch, [[_vehicle(-3.70, '1000')], [_vehicle(-3.71, '1000')]])
+
+    assert [(change.status, change.cod_vehicle) for change in changes] == [(NEW, '1000'), (MOVED, '1000')]
@@ -0,0 +1,77 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from benchmarks.payloads import line_info_payload, offices_payload, stop_times_payload, stops_payload
+from citram_api.models.models import Coordinates, Line, Stop, StopTime, from_response
+from citram_api.utils.read_only import read_only
+
+
+def test_stops_keep_the_ids_of_their_lines():
+    response = json.loads(stops_payload(20))
+    stops = from_response(response)
+
+    assert len(stops) == 20
+
+    for stop, data in zip(stops, response['stops']['Stop']):
+        assert isinstance(stop, Stop)
+        assert stop.cod_stop == data['codStop']
+        assert stop.cod_lines == tuple(line['codLine'] for line in data['lines']['Line'])
+        assert stop.coordinates == Coordinates(data['coordinates']['latitude'], data['coordinates']['longitude'])
+        assert stop.access == 2 and stop.stop_type is None
+
+
+def test_codes_are_interned():
+    first, second = from_response(json.loads(stops_payload(2)))
+
+    assert first.cod_municipality is second.cod_municipality
+    assert Stop.from_dict({'codStop': ''.join(['8_', '1'])}).cod_stop is Stop.from_dict({'codStop': '8_1'}).cod_stop
+
+
+def test_lines_stop_times_and_offices():
+    line, = from_response(json.loads(line_info_payload(3)))
+
+    assert isinstance(line, Line)
+    assert line.cod_line == '8__591___' and line.cod_municipalities == ('4289', '4350')
+    assert [itinerary.direction for itinerary in line.itineraries] == [1, 2]
+    assert [stop.cod_stop for stop in line.itineraries[0].stops] == ['8_10000', '8_10001', '8_10002']
+
+    times = from_response(json.loads(stop_times_payload(3)))
+
+    assert [type(time) for time in times] == [StopTime] * 3
+    assert {(time.cod_stop, time.cod_line, time.cod_destination_stop) for time in times} == {('4_276', '4__10___',
+                                                                                            '4_205')}
+    assert times[0].cod_vehicle is None and times[0].time == '2020-01-02T01:40:39+01:00'
+
+    offices = from_response(json.loads(offices_payload(2)))
+
+    assert [office.cod_office for office in offices] == ['01_000000', '01_000001']
+    assert offices[1].type == 'gestion'
+
+
+def test_single_objects_empty_containers_and_read_only_responses():
+    stop = {'codStop': '8_1', 'codLines': {'Line': '8__591___'}, 'coordinates': {'latitude': '40.4'}}
+
+    assert from_response({'stops': {'Stop': stop}}) == [Stop('8_1', cod_lines=['8__591___'])]
+    assert from_response({'stops': ''}) == []
+    assert from_response(read_only({'stops': {'Stop': [stop]}}))[0].cod_lines == ('8__591___',)
+
+    with pytest.raises(ValueError):
+        from_response({'unknown': {}})
+
+
+def test_objects_are_immutable_hashable_and_picklable():
+    stop, = from_response(json.loads(stops_payload(1)))
+
+    with pytest.raises(AttributeError):
+        stop.name = 'other'
+
+    with pytest.raises(AttributeError):
+        stop.__dict__
+
+    assert pickle.loads(pickle.dumps(stop)) == stop
+    assert copy.deepcopy(stop) == stop
+    assert len({stop, copy.copy(stop)}) == 1
+    assert repr(stop).startswith("Stop(cod_stop='")
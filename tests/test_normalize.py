@@ -0,0 +1,47 @@
+import copy
+
+from citram_api.utils.normalize import normalize
+
+
+LINE = {'codLine': '4__10___', 'shortDescription': '10'}
+RESPONSE = {'stops': {'Stop': [{'codStop': '4_276', 'lines': {'Line': dict(LINE)}, 'codLines': {'Line': '4__10___'}},
+                               {'codStop': '4_284', 'lines': {'Line': [dict(LINE)]}}]}}
+
+
+def test_normalize_returns_a_copy():
+    response = copy.deepcopy(RESPONSE)
+
+    normalized = normalize(response)
+
+    assert response == RESPONSE
+    assert normalized['stops']['Stop'][0]['lines']['Line'] == [LINE]
+    assert normalized['stops']['Stop'][0]['codLines']['Line'] == ['4__10___']
+    assert normalized['stops']['Stop'][0]['lines']['Line'][0] is normalized['stops']['Stop'][1]['lines']['Line'][0]
+    assert normalize(response) == normalized
+
+
+def test_normalize_in_place():
+    response = copy.deepcopy(RESPONSE)
+
+    normalized = normalize(response, in_place=True)
+
+    assert normalized is response
+    assert response['stops']['Stop'][0]['lines']['Line'] == [LINE]
+
+
+def test_normalize_empty_containers():
+    normalized = normalize({'stops': {'Stop': {'codStop': '4_276', 'lines': {}, 'codLines': {}}}})
+
+    assert normalized == {'stops': {'Stop': [{'codStop': '4_276', 'lines': {'Line': []}, 'codLines': {'Line': []}}]}}
+
+
+def test_normalize_single_objects():
+    response = {'stopTimes': {'Time': {'line': dict(LINE), 'time': '2020-01-01T10:00:00'}},
+                'stops': {'Stop': {'codStop': '4_276', 'lines': {'Line': dict(LINE)},
+                                   'codLines': {'Line': '4__10___'}}}}
+
+    normalized = normalize(response)
+
+    assert normalized['stops']['Stop'][0]['lines']['Line'] == [LINE]
+    assert normalized['stops']['Stop'][0]['codLines']['Line'] == ['4__10___']
+    assert normalized['stopTimes']['Time'][0]['line'] is normalized['stops']['Stop'][0]['lines']['Line'][0]
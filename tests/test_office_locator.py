@@ -0,0 +1,120 @@
+import json
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from citram_api.index.spatial import OfficeIndex, OfficeLocator
+
+
+CENTER = (40.4168, -3.7038)
+
+
+class Offices(object):
+    """
+    Bodies of GetOffices.php by office type, built from the offices of each type at the time of the request. The
+    requests fail while failing is set.
+    """
+
+    def __init__(self, **offices):
+        self.offices = offices
+        self.failing = False
+        self.requests = 0
+
+    def __call__(self, path):
+        self.requests += 1
+
+        if self.failing:
+            raise ValueError('Stand-in failure')
+
+        offices_type = parse_qs(urlsplit(path).query)['type'][0]
+        records = [{'codOffice': cod_office, 'type': offices_type,
+                    'coordinates': {'latitude': CENTER[0] + offset, 'longitude': CENTER[1]}}
+                   for cod_office, offset in self.offices.get(offices_type, [])]
+
+        return json.dumps({'offices': {'Office': records}}).encode('utf-8')
+
+
+def _cod_offices(response):
+    return [office['codOffice'] for office in response['offices']['Office']]
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        assert time.monotonic() < deadline, 'Timed out'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def locators():
+    started = []
+
+    yield started.append
+
+    for locator in started:
+        locator.stop()
+
+
+def test_queries_need_an_index(stand_in, locators):
+    stand_in(Offices(OFICINA=[('01_1', 0.001)], RECARGA=[('02_1', 0.0), ('02_2', 0.01)]))
+    locator = OfficeLocator(refresh_interval=3600)
+
+    with pytest.raises(RuntimeError):
+        locator.get_k_nearest_offices(CENTER[0], CENTER[1], 1)
+
+    locators(locator.start())
+
+    assert locator.refreshes == 1 and locator.refreshed_at is not None
+    assert _cod_offices(locator.get_k_nearest_offices(CENTER[0], CENTER[1], 2)) == ['02_1', '01_1']
+    assert _cod_offices(locator.get_k_nearest_offices(CENTER[0], CENTER[1], 5, offices_type='RECARGA')) == \
+        ['02_1', '02_2']
+    assert _cod_offices(locator.get_nearest_offices(CENTER[0], CENTER[1], 500)) == ['02_1', '01_1']
+
+
+def test_the_index_is_refreshed_in_the_background(stand_in, locators):
+    offices = Offices(OFICINA=[('01_1', 0.0)])
+    stand_in(offices)
+    locator = OfficeLocator(refresh_interval=0.05)
+    locators(locator.start())
+    first = locator.index
+
+    offices.offices['OFICINA'] = [('01_2', 0.0)]
+    _wait_for(lambda: _cod_offices(locator.get_k_nearest_offices(CENTER[0], CENTER[1], 5)) == ['01_2'])
+
+    assert locator.index is not first and locator.refreshes >= 2
+
+    locator.stop()
+    refreshes = locator.refreshes
+    time.sleep(0.15)
+
+    assert locator.refreshes == refreshes and locator.index is not None
+
+
+def test_failed_refreshes_keep_the_previous_index(stand_in, locators):
+    offices = Offices(OFICINA=[('01_1', 0.0)])
+    stand_in(offices)
+    locator = OfficeLocator(refresh_interval=0.05, retry_interval=0.05)
+    locators(locator.start())
+    index = locator.index
+
+    offices.failing = True
+    _wait_for(lambda: locator.failed_refreshes >= 2)
+
+    assert locator.index is index and locator.last_error is not None
+    assert _cod_offices(locator.get_k_nearest_offices(CENTER[0], CENTER[1], 5)) == ['01_1']
+
+    offices.failing = False
+    _wait_for(lambda: locator.index is not index)
+
+
+def test_an_initial_index_is_used_without_requesting(stand_in, locators):
+    offices = Offices()
+    stand_in(offices)
+    office = {'codOffice': '01_1', 'coordinates': {'latitude': CENTER[0], 'longitude': CENTER[1]}}
+    locator = OfficeLocator(refresh_interval=3600, index=OfficeIndex({'OFICINA': [office]}))
+    locators(locator.start())
+
+    assert offices.requests == 0 and locator.refreshes == 0
+    assert locator.get_k_nearest_offices(CENTER[0], CENTER[1], 1) == {'offices': {'Office': [office]}}
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from requests.adapters import BaseAdapter
+
+from citram_api.api.others import others
+from citram_api.api.others.others import _ThreadSessionZeepTransport
+from citram_api.utils.transport import Transport
+
+
+def test_card_client_threads_get_sessions_of_their_own():
+    transport = Transport()
+    zeep_transport = _ThreadSessionZeepTransport(transport, timeout=5, operation_timeout=5)
+
+    def sessions(_):
+        return zeep_transport.session, zeep_transport.session, transport.session
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(sessions, range(4)))
+
+    zeep_sessions = {id(first) for first, _, _ in results}
+
+    assert all(first is second for first, second, _ in results)
+    assert all(first is not caller for first, _, caller in results)
+    assert len(zeep_sessions) == len({id(caller) for _, _, caller in results})
+    # Every session is on the connection pools of the transport.
+    assert all(first.get_adapter('https://www.crtm.es/') is transport.session.get_adapter('https://www.crtm.es/')
+               for first, _, _ in results)
+
+
+def test_card_client_threads_get_the_zeep_configuration():
+    transport = Transport()
+    zeep_transport = _ThreadSessionZeepTransport(transport, timeout=5, operation_timeout=5)
+    file_adapter = BaseAdapter()
+    zeep_transport.session.mount('file://', file_adapter)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        session = executor.submit(lambda: zeep_transport.session).result()
+
+    assert session is not zeep_transport.session
+    assert session.headers['User-Agent'].startswith('Zeep/')
+    assert session.get_adapter('file:///tmp/card.wsdl') is file_adapter
+    assert session.get_adapter('https://www.crtm.es/') is transport.session.get_adapter('https://www.crtm.es/')
+
+
+def test_card_queries_share_one_executor(monkeypatch):
+    running = []
+    most_running = []
+    threads = set()
+    lock = threading.Lock()
+
+    def get_ttp_card_info(ttp_number):
+        with lock:
+            running.append(ttp_number)
+            most_running.append(len(running))
+            threads.add(threading.current_thread().name)
+
+        time.sleep(0.01)
+
+        with lock:
+            running.remove(ttp_number)
+
+        return ttp_number
+
+    monkeypatch.setattr(others, '_get_card_client', lambda: None)
+    monkeypatch.setattr(others, 'get_ttp_card_info', get_ttp_card_info)
+    ttp_numbers = ['00100000000{:02}'.format(i) for i in range(20)]
+
+    first = others.get_ttp_card_info_many(ttp_numbers, max_workers=3)
+    executor = others._get_card_executor()
+    second = others.get_ttp_card_info_many(ttp_numbers, max_workers=3)
+
+    assert first == second == ttp_numbers
+    assert max(most_running) <= 3
+    assert others._get_card_executor() is executor
+    assert all(thread.startswith('citram-card') for thread in threads)
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from citram_api.utils.custom_exceptions import DeadlineExceededException
+from citram_api.utils.deadline import deadline
+from citram_api.utils.realtime_cache import RealtimeCache
+
+
+URL = 'https://www.crtm.es/widgets/api/GetStopsTimes.php?codStop=4_276'
+
+
+def test_concurrent_requests_fetch_once():
+    cache = RealtimeCache()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+
+        return {'stopTimes': {}}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch(URL, fetch))) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    time.sleep(0.1)
+    release.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert cache.stats() == {'hits': 0, 'misses': 1, 'coalesced': 7, 'entries': 1}
+
+
+def test_concurrent_tasks_fetch_once():
+    cache = RealtimeCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+
+        return {'stopTimes': {}}
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_fetch_async(URL, fetch) for _ in range(8)))
+
+    results = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.stats()['coalesced'] == 7
+
+
+def test_responses_expire_and_errors_are_not_cached():
+    cache = RealtimeCache(ttl=0.05)
+
+    def fail():
+        raise ValueError('CRTM is down')
+
+    with pytest.raises(ValueError):
+        cache.get_or_fetch(URL, fail)
+
+    first = cache.get_or_fetch(URL, dict)
+
+    assert cache.get_or_fetch(URL, dict) is first
+
+    time.sleep(0.1)
+
+    assert cache.get_or_fetch(URL, dict) is not first
+    assert cache.stats()['misses'] == 3
+
+
+def test_waiters_give_up_at_their_deadline():
+    cache = RealtimeCache()
+    release = threading.Event()
+    owner = threading.Thread(target=cache.get_or_fetch, args=(URL, lambda: release.wait(5)))
+    owner.start()
+    time.sleep(0.05)
+
+    try:
+        with pytest.raises(DeadlineExceededException):
+            with deadline(0.1):
+                cache.get_or_fetch(URL, dict)
+    finally:
+        release.set()
+        owner.join()
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from citram_api.api.stops import stops
+from citram_api.utils import replay
+from citram_api.utils.transport import CATALOG_ENDPOINTS, Transport, get_transport, set_transport
+
+
+STOP = {'stops': {'Stop': {'codStop': '4_276', 'name': 'LAS TABLAS'}}}
+
+
+@pytest.fixture
+def overrides(stand_in):
+    _, transport = stand_in(json.dumps(STOP).encode('utf-8'), etag=True)
+
+    yield transport.url_overrides
+
+    replay.disable_archive()
+
+
+def test_conditional_responses_are_recorded_with_their_body(tmp_path, overrides):
+    path = str(tmp_path / 'crtm.archive')
+
+    replay.enable_recording(path, conditional_endpoints=CATALOG_ENDPOINTS, url_overrides=overrides)
+    stops.get_stops_by_cod_stop('4_276')
+    stops.get_stops_by_cod_stop('4_276')
+    replay.disable_archive()
+
+    # A new transport has nothing remembered, as in a new process.
+    replay.enable_replay(path, url_overrides=overrides)
+
+    assert stops.get_stops_by_cod_stop('4_276') == STOP
+    assert stops.get_stops_by_cod_stop('4_276') == STOP
+
+
+def test_disable_archive_restores_the_previous_transport(tmp_path):
+    previous = get_transport()
+    transport = Transport(read_timeout=1)
+    set_transport(transport)
+
+    try:
+        replay.enable_recording(str(tmp_path / 'a.archive'))
+        replay.enable_recording(str(tmp_path / 'b.archive'))
+        replay.disable_archive()
+
+        assert get_transport() is transport
+    finally:
+        set_transport(previous)
+
+
+def test_enabling_recording_again_writes_the_first_archive(tmp_path, overrides):
+    path = str(tmp_path / 'a.archive')
+
+    replay.enable_recording(path, url_overrides=overrides)
+    stops.get_stops_by_cod_stop('4_276')
+    replay.enable_recording(str(tmp_path / 'b.archive'), url_overrides=overrides)
+    replay.disable_archive()
+
+    replay.enable_replay(path, url_overrides=overrides)
+
+    assert stops.get_stops_by_cod_stop('4_276') == STOP
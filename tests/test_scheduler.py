@@ -0,0 +1,53 @@
+import threading
+import time
+
+from citram_api.utils.scheduler import BULK, REALTIME, Scheduler
+
+
+API = 'https://www.crtm.es/widgets/api/'
+
+
+def _saturate(scheduler, url, level, threads, stop):
+    def loop():
+        while not stop.is_set():
+            scheduler.acquire(url, level)
+
+    workers = [threading.Thread(target=loop, daemon=True) for _ in range(threads)]
+
+    for worker in workers:
+        worker.start()
+
+    return workers
+
+
+def test_bulk_endpoint_does_not_delay_realtime_of_another_endpoint():
+    scheduler = Scheduler(host_rate=10, host_burst=1)
+    stop = threading.Event()
+    workers = _saturate(scheduler, API + 'GetLinesInformation.php?activeDate=2020-01-01', BULK, 8, stop)
+
+    try:
+        time.sleep(0.3)  # Let the bulk requests queue up and drain the host budget.
+        waited = scheduler.acquire(API + 'GetStopsTimes.php?codStop=4_276', REALTIME)
+    finally:
+        stop.set()
+
+        for worker in workers:
+            worker.join()
+
+    # Eight bulk requests are queued, which would take 0.8 seconds to go out before it.
+    assert waited < 0.25
+    assert scheduler.stats()['GetLinesInformation.php']['bulk']['max_queued'] >= 4
+
+
+def test_endpoint_limit_does_not_hold_back_other_endpoints():
+    scheduler = Scheduler(host_rate=100, endpoint_rates={'GetStopsTimes.php': 1})
+    scheduler.acquire(API + 'GetStopsTimes.php?codStop=4_276')
+    waiter = threading.Thread(target=scheduler.acquire, args=(API + 'GetStopsTimes.php?codStop=4_276',), daemon=True)
+    waiter.start()
+    time.sleep(0.05)
+
+    started_at = time.monotonic()
+    scheduler.acquire(API + 'GetLines.php?mode=4', BULK)
+
+    assert time.monotonic() - started_at < 0.25
+    waiter.join()
@@ -0,0 +1,54 @@
+from citram_api.index import search
+from citram_api.index.search import StopSearchIndex
+
+
+STOPS = [
+    {'codStop': '4_1', 'name': 'TRES AGUAS', 'address': 'Av. de Móstoles 10', 'postCode': '28922', 'codMode': '4',
+     'codMunicipality': '4279'},
+    {'codStop': '8_2', 'name': 'ÁLAMO, EL-IGLESIA', 'address': 'Calle Mayor 1', 'postCode': '28607', 'codMode': '8',
+     'codMunicipality': '4276'},
+    {'codStop': '4_3', 'name': 'TRIBUNAL', 'address': 'Calle de Fuencarral 82', 'postCode': '28004', 'codMode': '4',
+     'codMunicipality': '4350'},
+    {'codStop': '8_4', 'name': 'TRES CANTOS', 'address': 'Av. de la Vega', 'postCode': '28760', 'codMode': '8',
+     'codMunicipality': '4411'},
+]
+
+
+def _cod_stops(results):
+    return [stop['codStop'] for _, stop in results]
+
+
+def test_words_match_exactly_by_prefix_and_without_accents():
+    index = StopSearchIndex(STOPS)
+
+    assert _cod_stops(index.search('tres aguas')) == ['4_1']
+    assert _cod_stops(index.search('tres agu')) == ['4_1']
+    assert _cod_stops(index.search('alamo')) == ['8_2']
+    assert _cod_stops(index.search('28004')) == ['4_3']
+    assert index.search('') == []
+
+
+def test_misspelled_words_are_matched_by_trigrams():
+    index = StopSearchIndex(STOPS)
+
+    assert _cod_stops(index.search('tribunla')) == ['4_3']
+
+
+def test_results_can_be_filtered_by_mode_and_municipality():
+    index = StopSearchIndex(STOPS)
+
+    assert _cod_stops(index.search('tres', modes=[8])) == ['8_4']
+    assert _cod_stops(index.search('tres', cod_municipalities=['4279'])) == ['4_1']
+    assert index.get_stops_by_custom_search('tres', modes=[4]) == {'stops': {'Stop': [STOPS[0]]}}
+
+
+def test_expansions_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(search, 'MAX_CACHED_EXPANSIONS', 3)
+    stops = [{'codStop': '4_{}'.format(i), 'name': 'P{}{}'.format(chr(65 + i % 26), 'X' * (i % 7 + 1))}
+             for i in range(26 * 7 * 2)]
+    index = StopSearchIndex(stops, max_expansions=2)
+
+    for prefix in ('P', 'PA', 'PB', 'PC', 'PD'):
+        assert len(index.search(prefix, limit=2)) == 2
+
+    assert list(index._expansions) == ['PB', 'PC', 'PD']
@@ -0,0 +1,88 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from citram_api.network.snapshot import NetworkCrawler, NetworkSnapshot
+
+
+COD_LINES = ['4__1___', '4__2___', '4__3___']
+
+
+class Network(object):
+    """
+    Bodies of a tiny network by requested path. The information of the lines in failing can't be requested.
+    """
+
+    def __init__(self):
+        self.failing = set()
+        self.requested = []
+
+    def __call__(self, path):
+        self.requested.append(path)
+        endpoint = urlsplit(path).path.rsplit('/', 1)[-1]
+        query = {key: values[0] for key, values in parse_qs(urlsplit(path).query).items()}
+
+        if endpoint == 'GetModes.php':
+            body = {'modes': {'Mode': {'codMode': '4', 'name': 'METRO'}}}
+        elif endpoint == 'GetMunicipalities.php':
+            body = {'municipalities': {'Municipality': [{'codMunicipality': '4279', 'name': 'ALCORCÓN'},
+                                                        {'codMunicipality': '4350', 'name': 'MADRID'}]}}
+        elif endpoint == 'GetLines.php':
+            body = {'lines': {'Line': [{'codLine': cod_line} for cod_line in COD_LINES]}}
+        elif endpoint == 'GetLinesInformation.php':
+            if query['codLine'] in self.failing:
+                raise ValueError('Stand-in failure')
+
+            stop = {'codStop': '4_{}'.format(query['codLine'][3]), 'name': 'STOP'}
+            body = {'lines': {'LineInformation': {'codLine': query['codLine'], 'itinerary': {
+                'Itinerary': {'codItinerary': query['codLine'] + '_IT_1', 'stops': {'StopInformation': stop}}}}}}
+        elif endpoint == 'GetLinesTimePlanning.php':
+            body = {'lines': {'LineTimePlanning': {'codLine': query['codLine']}}}
+        elif endpoint == 'GetStops.php':
+            body = {'stops': {'Stop': {'codStop': '8_' + query['codMunicipality']}}}
+        else:
+            body = {'offices': {'Office': {'codOffice': query.get('codmunicipality') or query.get('type')}}}
+
+        return json.dumps(body).encode('utf-8')
+
+
+def test_crawl_builds_the_whole_snapshot(stand_in, tmp_path):
+    stand_in(Network())
+
+    snapshot = NetworkCrawler(max_workers=4, requests_per_second=1000).crawl()
+    path = str(tmp_path / 'network.json.gz')
+    snapshot.save(path)
+    loaded = NetworkSnapshot.load(path)
+
+    assert sorted(loaded.line_info) == COD_LINES
+    assert sorted(loaded.timeplanning) == COD_LINES
+    assert sorted(loaded.stops) == ['4_1', '4_2', '4_3']
+    assert loaded.municipality_stops == {'4279': [{'codStop': '8_4279'}], '4350': [{'codStop': '8_4350'}]}
+    assert loaded.municipality_offices['4350'] == [{'codOffice': '4350'}]
+    assert loaded.offices == {'RECARGA': [{'codOffice': 'RECARGA'}], 'OFICINA': [{'codOffice': 'OFICINA'}]}
+    assert loaded.failed_lines == [] and loaded.failed_municipalities == []
+    assert loaded.to_dict() == snapshot.to_dict()
+
+
+def test_interrupted_crawl_resumes_from_the_checkpoint(stand_in, tmp_path):
+    network = Network()
+    network.failing.add('4__2___')
+    stand_in(network)
+    checkpoint_path = str(tmp_path / 'crawl.jsonl')
+
+    first = NetworkCrawler(max_workers=2, requests_per_second=1000, include_timeplanning=False,
+                           checkpoint_path=checkpoint_path).crawl()
+
+    assert first.failed_lines == ['4__2___']
+    assert sorted(first.line_info) == ['4__1___', '4__3___']
+
+    network.failing.clear()
+    network.requested.clear()
+    crawler = NetworkCrawler(max_workers=2, requests_per_second=1000, include_timeplanning=False,
+                             checkpoint_path=checkpoint_path)
+    second = crawler.crawl()
+
+    assert network.requested == ['/GetLinesInformation.php?activeItinerary=1&codLine=4__2___']
+    assert crawler.stats.resumed_lines == 2
+    assert sorted(second.line_info) == COD_LINES
+    assert second.created_at == first.created_at
+    assert not (tmp_path / 'crawl.jsonl').exists()
@@ -0,0 +1,71 @@
+import math
+import random
+
+from citram_api.index.spatial import GridIndex, OfficeIndex, StopIndex
+
+
+CENTER = (40.4168, -3.7038)
+
+
+def _records(number, seed=0):
+    rnd = random.Random(seed)
+
+    return [{'codStop': '8_{}'.format(i), 'codMode': '8' if i % 2 else '4', 'access': str(i % 3),
+             'coordinates': {'latitude': CENTER[0] + rnd.uniform(-0.05, 0.05),
+                             'longitude': CENTER[1] + rnd.uniform(-0.05, 0.05)}}
+            for i in range(number)]
+
+
+def _brute_force(index, latitude, longitude):
+    x, y = index._project(latitude, longitude)
+    distances = []
+
+    for record in index.records:
+        record_x, record_y = index._project(record['coordinates']['latitude'], record['coordinates']['longitude'])
+        distances.append((math.hypot(record_x - x, record_y - y), record['codStop']))
+
+    return sorted(distances)
+
+
+def test_within_and_nearest_match_a_brute_force_search():
+    index = GridIndex(_records(2000), cell_size=200)
+
+    for latitude, longitude in [CENTER, (40.45, -3.68), (40.5, -3.6)]:
+        expected = _brute_force(index, latitude, longitude)
+
+        assert [record['codStop'] for _, record in index.within(latitude, longitude, 750)] == \
+            [cod for distance, cod in expected if distance <= 750]
+        assert [record['codStop'] for _, record in index.nearest(latitude, longitude, 15)] == \
+            [cod for _, cod in expected[:15]]
+        assert [record['codStop'] for _, record in index.nearest(latitude, longitude, 15, max_distance=300)] == \
+            [cod for distance, cod in expected[:15] if distance <= 300]
+
+
+def test_records_without_coordinates_are_left_out():
+    index = GridIndex(_records(3) + [{'codStop': 'x'}, {'codStop': 'y', 'coordinates': {'latitude': 'N/A'}}])
+
+    assert len(index) == 3
+    assert GridIndex([]).nearest(*CENTER, k=3) == []
+
+
+def test_stop_index_filters_and_deduplicates():
+    records = _records(500)
+    index = StopIndex(records + records[:10])
+
+    nearest = index.get_k_nearest_stops(CENTER[0], CENTER[1], 20, modes=[8], access=True)['stops']['Stop']
+
+    assert len(index) == 500
+    assert len(nearest) == 20
+    assert all(stop['codMode'] == '8' and stop['access'] != '0' for stop in nearest)
+    assert index.get_nearest_stops(CENTER[0], CENTER[1], 50000)['stops']['Stop'][0] == \
+        index.get_k_nearest_stops(CENTER[0], CENTER[1], 1)['stops']['Stop'][0]
+
+
+def test_office_index_filters_by_requested_type():
+    office = {'codOffice': '1', 'coordinates': {'latitude': CENTER[0], 'longitude': CENTER[1]}}
+    other = {'codOffice': '2', 'coordinates': {'latitude': CENTER[0] + 0.001, 'longitude': CENTER[1]}}
+    index = OfficeIndex({'OFICINA': [office], 'RECARGA': [office, other]})
+
+    assert index.get_k_nearest_offices(CENTER[0], CENTER[1], 5, offices_type='OFICINA')['offices']['Office'] == \
+        [office]
+    assert index.get_k_nearest_offices(CENTER[0], CENTER[1], 5)['offices']['Office'] == [office, other]
@@ -0,0 +1,77 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from citram_api.realtime.stop_times import StopTimesTarget, StopTimesWatcher, watch_stop_times
+
+
+ACTUAL_DATE = '2020-01-02T01:35:27+01:00'
+
+
+def _response(*times, actual_date=ACTUAL_DATE):
+    return {'stopTimes': {'actualDate': actual_date, 'stop': {'codStop': '8_17491'},
+                          'times': {'Time': [{'line': {'codLine': '8__591___'}, 'direction': 1,
+                                              'destination': 'MADRID', 'time': time} for time in times]}}}
+
+
+class Arrivals(object):
+    """
+    Bodies of GetStopsTimes.php by stop, one per poll. The last one is repeated once they run out, and a stop
+    without bodies can't be requested.
+    """
+
+    def __init__(self, **responses):
+        self.responses = responses
+        self.polls = []
+
+    def __call__(self, path):
+        cod_stop = parse_qs(urlsplit(path).query)['codStop'][0]
+        self.polls.append(cod_stop)
+        responses = self.responses[cod_stop]
+
+        return json.dumps(responses.pop(0) if len(responses) > 1 else responses[0]).encode('utf-8')
+
+
+def test_the_next_poll_follows_the_first_arrival():
+    watcher = StopTimesWatcher([], min_interval=15, max_interval=300, fraction=0.5)
+
+    assert watcher.next_delay(_response('2020-01-02T01:37:27+01:00', '2020-01-02T01:55:00+01:00')) == 60
+    assert watcher.next_delay(_response('2020-01-02T01:35:40+01:00')) == 15
+    assert watcher.next_delay(_response('2020-01-02T03:00:00+01:00')) == 300
+    assert watcher.next_delay(_response()) == 300
+    assert watcher.next_delay(_response('tomorrow')) == 15
+    assert watcher.next_delay({}) == 300
+
+
+def test_only_changed_arrivals_are_yielded(stand_in):
+    arrivals = Arrivals(**{
+        '8_17491': [_response('2020-01-02T01:40:00+01:00', '2020-01-02T01:50:00+01:00'),
+                    _response('2020-01-02T01:40:00+01:00', '2020-01-02T01:50:00+01:00'),
+                    _response('2020-01-02T01:50:00+01:00', '2020-01-02T02:00:00+01:00')],
+        '4_276': [_response('2020-01-02T01:45:00+01:00')]})
+    stand_in(arrivals)
+    targets = [StopTimesTarget('8_17491', 'P', '8_17491'), ('4_276', 'P', '4_276')]
+
+    changes = list(watch_stop_times(targets, max_polls=6, min_interval=0, max_interval=0))
+
+    assert sorted(arrivals.polls) == ['4_276'] * 3 + ['8_17491'] * 3
+    assert [(change.cod_stop, len(change.added), len(change.removed)) for change in changes
+            if change.cod_stop == '4_276'] == [('4_276', 1, 0)]
+
+    first, last = [change for change in changes if change.cod_stop == '8_17491']
+
+    assert [time['time'] for time in first.added] == ['2020-01-02T01:40:00+01:00', '2020-01-02T01:50:00+01:00']
+    assert [time['time'] for time in last.added] == ['2020-01-02T02:00:00+01:00']
+    assert [time['time'] for time in last.removed] == ['2020-01-02T01:40:00+01:00']
+    assert len(last.times) == 2 and last.actual_date == ACTUAL_DATE and last.next_poll_in == 0
+
+
+def test_failed_polls_are_counted_and_retried(stand_in):
+    arrivals = Arrivals(**{'8_17491': [_response('2020-01-02T01:40:00+01:00')]})
+    stand_in(arrivals)
+    watcher = StopTimesWatcher([('8_17491', 'P', '8_17491'), ('4_276', 'P', '4_276')], min_interval=0,
+                               max_interval=0)
+
+    changes = list(watcher.watch(max_polls=4))
+
+    assert [change.cod_stop for change in changes] == ['8_17491']
+    assert watcher.requests == 4 and watcher.failures == 2
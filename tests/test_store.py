@@ -0,0 +1,30 @@
+from citram_api.index.store import IndexedStore
+from citram_api.network.snapshot import NetworkSnapshot
+
+
+def _stop(cod_stop, cod_municipality, post_code):
+    return {'codStop': cod_stop, 'codMode': '8', 'codMunicipality': cod_municipality, 'postCode': post_code}
+
+
+def _snapshot(municipality_stops):
+    municipalities = [{'codMunicipality': '4289', 'name': 'FUENLABRADA'},
+                      {'codMunicipality': '4350', 'name': 'MADRID'}]
+
+    return NetworkSnapshot([], municipalities, {}, {}, {}, municipality_stops=municipality_stops)
+
+
+def test_post_codes_are_answered_when_every_municipality_is_stored():
+    store = IndexedStore(_snapshot({'4289': [_stop('8_1', '4289', '28942')],
+                                    '4350': [_stop('8_2', '4350', '28942')]}), fallback=False)
+
+    assert [stop['codStop'] for stop in store.get_stops_by_zip_code(28942)['stops']['Stop']] == ['8_1', '8_2']
+    assert store.stats() == {'hits': 1, 'misses': 0}
+
+
+def test_post_codes_are_not_answered_by_a_partial_store():
+    # Madrid has stops in 28942 too, but it isn't in the store.
+    store = IndexedStore(_snapshot({'4289': [_stop('8_1', '4289', '28942')]}), fallback=False)
+
+    assert store.get_stops_by_zip_code(28942) is None
+    assert [stop['codStop'] for stop in store.get_stops_by_municipality(4289)['stops']['Stop']] == ['8_1']
+    assert store.stats() == {'hits': 1, 'misses': 1}
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from benchmarks.payloads import line_info_payload, stops_payload
+from citram_api.api.lines import lines
+from citram_api.api.stops import stops
+from citram_api.utils.streaming import iter_json_items
+
+
+def _chunks(body, size):
+    return (body[i:i + size] for i in range(0, len(body), size))
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 1 << 20])
+def test_items_are_the_same_whatever_the_chunk_size(size):
+    body = stops_payload(30)
+
+    assert list(iter_json_items(_chunks(body, size), 'Stop')) == json.loads(body)['stops']['Stop']
+
+
+@pytest.mark.parametrize('size', [1, 5, 1 << 20])
+def test_single_objects_scalars_and_nested_keys(size):
+    document = {'a': {'Stop': {'codStop': '4_1', 'Stop': [1, 2]}},
+                'b': {'Stop': 'not an object'},
+                'c': {'St\\u006fp': [{'codStop': 'ñ_2', 'delay': -12.5e-1}, {'codStop': '4_3', 'n': 1234567}]},
+                'd': {'Stop': []},
+                'e': {'text': '"Stop": {"codStop": "in a string"}'}}
+    body = json.dumps(document, ensure_ascii=False).replace('St\\\\u006fp', 'St\\u006fp').encode('utf-8')
+
+    assert list(iter_json_items(_chunks(body, size), 'Stop')) == [{'codStop': '4_1', 'Stop': [1, 2]},
+                                                                  {'codStop': 'ñ_2', 'delay': -1.25},
+                                                                  {'codStop': '4_3', 'n': 1234567}]
+
+
+def test_truncated_documents_raise():
+    body = stops_payload(3)
+
+    with pytest.raises(ValueError):
+        list(iter_json_items(_chunks(body[:len(body) // 2], 16), 'Stop'))
+
+
+def test_streamed_endpoints_yield_the_items_of_the_response(stand_in):
+    stand_in(stops_payload(50))
+
+    assert list(stops.iter_stops_by_municipality(4350)) == json.loads(stops_payload(50))['stops']['Stop']
+
+    stand_in(line_info_payload(4))
+    itineraries = json.loads(line_info_payload(4))['lines']['LineInformation']['itinerary']['Itinerary']
+
+    assert list(lines.iter_line_stops('8__591___')) == [stop for itinerary in itineraries
+                                                        for stop in itinerary['stops']['StopInformation']]
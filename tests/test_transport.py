@@ -0,0 +1,113 @@
+import copy
+import gc
+import json
+import pickle
+import threading
+import weakref
+
+import pytest
+
+from citram_api.api.stops import stops
+from citram_api.constants.hosts import Urls
+from citram_api.utils.transport import CATALOG_ENDPOINTS
+
+
+STOP = {'stops': {'Stop': {'codStop': '4_276', 'name': 'LAS TABLAS', 'lines': {'Line': {'codLine': '4__10___'}}}}}
+BODY = json.dumps(STOP).encode('utf-8')
+URL = Urls.CITRAM_WIDGET_SERVICE.value + '/GetStops.php?codStop=4_276'
+
+
+@pytest.fixture
+def transport(stand_in):
+    _, transport = stand_in(BODY, etag=True, conditional_endpoints=CATALOG_ENDPOINTS)
+
+    return transport
+
+
+def test_conditional_get_results_are_read_only(transport):
+    first = stops.get_stops_by_cod_stop('4_276')
+    second = stops.get_stops_by_cod_stop('4_276')
+
+    assert transport.stats()['not_modified'] == 1
+    assert transport.stats()['decodes'] == 1
+    assert transport.stats()['decodes_avoided'] == 1
+    assert second is first
+    assert second == STOP
+
+    with pytest.raises(TypeError):
+        first['stops']['Stop']['name'] = 'CHANGED'
+
+    with pytest.raises(TypeError):
+        first['stops'].pop('Stop')
+
+    assert second == STOP
+
+
+def test_read_only_results_can_be_copied_and_pickled(transport):
+    result = stops.get_stops_by_cod_stop('4_276')
+
+    copied = copy.deepcopy(result)
+    copied['stops']['Stop']['lines'] = []
+
+    assert type(copied) is dict and type(copied['stops']['Stop']) is dict
+    assert result == STOP
+    assert pickle.loads(pickle.dumps(result)) == STOP
+    assert json.loads(json.dumps(result)) == STOP
+
+
+def test_unchanged_body_is_not_decoded_again(stand_in):
+    _, transport = stand_in(BODY, conditional_endpoints=CATALOG_ENDPOINTS)
+
+    first = transport.get_json(URL)
+    second = transport.get_json(URL)
+
+    assert second is first
+    assert transport.stats()['not_modified'] == 0
+    assert transport.stats()['decodes'] == 1
+    assert transport.stats()['decodes_avoided'] == 1
+
+
+def test_changed_body_is_decoded(stand_in):
+    bodies = iter([STOP, dict(STOP, changed=True)])
+    _, transport = stand_in(lambda path: json.dumps(next(bodies)).encode('utf-8'), etag=True,
+                            conditional_endpoints=CATALOG_ENDPOINTS)
+
+    transport.get_json(URL)
+    second = transport.get_json(URL)
+
+    assert second == dict(STOP, changed=True)
+    assert transport.stats()['decodes'] == 2
+    assert transport.stats()['decodes_avoided'] == 0
+
+
+def test_conditional_get_is_opt_in(stand_in):
+    _, transport = stand_in(BODY, etag=True)
+
+    transport.get_json(URL)
+    transport.get_json(URL)
+
+    assert transport.stats()['not_modified'] == 0
+    assert transport.stats()['decodes'] == 2
+    assert transport.stats()['decodes_avoided'] == 0
+
+
+def test_sessions_of_finished_threads_are_released(transport):
+    sessions = []
+
+    def request():
+        stops.get_stops_by_cod_stop('4_276')
+        sessions.append(weakref.ref(transport.session))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    gc.collect()
+
+    assert len(sessions) == 8
+    assert all(session() is None for session in sessions)
+    assert stops.get_stops_by_cod_stop('4_276') == STOP